@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Cached BloxOne Threat Defense application catalog
+
+    The catalog (/api/acs/v1/apps) is cached on disk per CSP URL for
+    CATALOG_TTL seconds. Once stale it is refreshed with a conditional
+    request (If-None-Match/If-Modified-Since), so an unchanged catalog
+    is not downloaded again. Lookups use a hashed index of normalised
+    names, matching case insensitively, ignoring spaces and punctuation,
+    and including common aliases.
+
+ Requirements:
+   Python3 with requests module
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.parse
+import requests
+import b1_metrics
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+CATALOG_TTL = 24 * 60 * 60
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 
+                         'bloxone_automation_tools')
+
+# In process catalogs keyed by CSP URL
+_CATALOGS = {}
+_LOCK = threading.Lock()
+
+
+def normalise(name):
+    '''
+    Normalise an app name for lookup, case folded with whitespace
+    and punctuation removed
+
+    Parameters:
+        name (str): App name
+
+    Returns:
+        str: Index key
+    '''
+    return re.sub(r'[\W_]+', '', str(name).casefold())
+
+
+class AppCatalog:
+    '''
+    Hashed index of the supported application names
+    '''
+
+    def __init__(self, names=[], aliases=None):
+        '''
+        Parameters:
+            names (list): App names from the catalog
+            aliases (dict): Optional alternative names, mapping alias to
+                            catalog name, e.g. app_aliases in filters.yml
+        '''
+        self.names = list(names)
+        self.index = {}
+        self.aliases = {}
+        for name in self.names:
+            self.index.setdefault(normalise(name), name)
+        for alias, name in (aliases or {}).items():
+            canonical = self.index.get(normalise(name))
+            if canonical:
+                self.aliases.setdefault(normalise(alias), canonical)
+            else:
+                log.warning(f'--- App alias {alias}: {name} not in catalog')
+
+        return
+
+
+    def lookup(self, name):
+        '''
+        Catalog name for name
+
+        Parameters:
+            name (str): App name, in any case or an alias
+
+        Returns:
+            str: App name as known in the catalog or None
+        '''
+        key = normalise(name)
+        canonical = self.index.get(key)
+        if not canonical:
+            canonical = self.aliases.get(key)
+            if canonical:
+                log.info(f'App {name} substituted with {canonical} '
+                         '(app_aliases)')
+
+        return canonical
+
+
+    def __contains__(self, name):
+        key = normalise(name)
+        return key in self.index or key in self.aliases
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+def cache_filename(url, cache_dir=CACHE_DIR):
+    '''
+    Cache filename for the catalog of the CSP url
+
+    Returns:
+        str: filename
+    '''
+    host = urllib.parse.urlsplit(url).netloc or url
+    host = re.sub(r'[^\w.-]+', '_', host)
+
+    return os.path.join(cache_dir, f'apps-{host}.json')
+
+
+def read_cache(filename):
+    '''
+    Read a cached catalog
+
+    Returns:
+        dict: Cache entry or None
+    '''
+    cache = None
+    try:
+        with open(filename, 'r') as f:
+            cache = json.load(f)
+        if not isinstance(cache.get('names'), list):
+            cache = None
+    except (OSError, ValueError, AttributeError):
+        cache = None
+
+    return cache
+
+
+def write_cache(filename, cache):
+    '''
+    Atomically write a cached catalog, failures are logged and ignored
+    '''
+    tmp = f'{filename}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, filename)
+    except (OSError, TypeError, ValueError) as err:
+        log.debug(f'Unable to write app catalog cache {filename}: {err}')
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+    return
+
+
+def fetch(client, cache=None, governor=None, transport=None):
+    '''
+    Request the catalog, conditionally if cache has an ETag or
+    Last-Modified value
+
+    Parameters:
+        client (obj): bloxone client object
+        cache (dict): Current cache entry
+        governor (obj): b1_ratelimit.RateGovernor
+        transport (obj): b1_transport.Transport for pooled connections
+
+    Returns:
+        response object
+    '''
+    url = f'{client.base_url}/api/acs/v1/apps?_fields=name'
+    headers = dict(client.headers)
+    if cache and cache.get('etag'):
+        headers['If-None-Match'] = cache['etag']
+    if cache and cache.get('last_modified'):
+        headers['If-Modified-Since'] = cache['last_modified']
+
+    def get(url):
+        if transport:
+            return transport.request('GET', url, headers=headers)
+        return requests.request('GET', url, headers=headers)
+
+    get = functools.partial(b1_metrics.timed_call, get, 'GET', 
+                            b1_metrics.METRICS)
+    if governor:
+        response = governor.request(get, url)
+    else:
+        response = get(url)
+
+    return response
+
+
+def stale(cache, filename):
+    '''
+    Cache entry to use when the catalog cannot be retrieved
+
+    Returns:
+        dict: Stale cache entry, or an empty catalog
+    '''
+    if cache:
+        log.warning('Using stale app catalog from {}'.format(filename))
+        # Do not treat as fresh
+        cache = dict(cache, fetched=0)
+    else:
+        cache = { 'names': [] }
+
+    return cache
+
+
+def refresh(client, cache, filename, governor=None, transport=None):
+    '''
+    Refresh the catalog using a conditional request, falling back to
+    the cached catalog if the request fails
+
+    Returns:
+        dict: Cache entry
+    '''
+    try:
+        response = fetch(client, cache, governor, transport)
+    except requests.exceptions.RequestException as err:
+        log.debug(f'App catalog request failed: {err}')
+        response = None
+    if response is None:
+        log.warning(f'--- Could not get support apps')
+        cache = stale(cache, filename)
+    elif response.status_code == 304 and cache:
+        log.info('App catalog unchanged')
+        cache['fetched'] = time.time()
+        write_cache(filename, cache)
+    elif response.status_code in [ 200 ]:
+        try:
+            names = [ app.get('name') for app in 
+                      response.json().get('results') or [] 
+                      if app.get('name') ]
+        except (ValueError, AttributeError) as err:
+            log.warning(f'--- Invalid app catalog response: {err}')
+            names = None
+        if names is None:
+            cache = stale(cache, filename)
+        else:
+            cache = { 'url': client.base_url, 
+                      'fetched': time.time(),
+                      'etag': response.headers.get('ETag', ''),
+                      'last_modified': response.headers.get('Last-Modified', 
+                                                            ''),
+                      'names': names }
+            log.info(f'App catalog retrieved, {len(names)} apps')
+            write_cache(filename, cache)
+    else:
+        log.warning(f'--- Could not get support apps')
+        log.debug(f'Return code: {response.status_code}')
+        log.warning(f'Return body: {response.text}')
+        cache = stale(cache, filename)
+
+    return cache
+
+
+def get_catalog(client, ttl=CATALOG_TTL, cache_dir=CACHE_DIR, governor=None,
+                transport=None, aliases=None):
+    '''
+    Get the application catalog, from memory, the disk cache while
+    fresh, otherwise refreshed from the API
+
+    Parameters:
+        client (obj): bloxone client object
+        ttl (int): Seconds before the cached catalog is refreshed
+        cache_dir (str): Cache directory
+        governor (obj): b1_ratelimit.RateGovernor
+        transport (obj): b1_transport.Transport for pooled connections
+        aliases (dict): Optional alternative app names, alias: name
+
+    Returns:
+        AppCatalog object, empty if the catalog could not be retrieved
+    '''
+    url = client.base_url
+    filename = cache_filename(url, cache_dir)
+    with _LOCK:
+        entry = _CATALOGS.get(url)
+        if not entry or time.time() - entry[0].get('fetched', 0) > ttl:
+            cache = read_cache(filename)
+            if cache and time.time() - cache.get('fetched', 0) <= ttl:
+                log.debug(f'Using cached app catalog {filename}')
+            else:
+                cache = refresh(client, cache, filename, governor, transport)
+            entry = ( cache, AppCatalog(cache.get('names', [])) )
+            if cache.get('fetched'):
+                _CATALOGS[url] = entry
+
+    catalog = entry[1]
+    if aliases:
+        catalog = AppCatalog(catalog.names, aliases)
+
+    return catalog
+
+
+def clear():
+    '''
+    Clear the in process catalogs
+    '''
+    with _LOCK:
+        _CATALOGS.clear()
+
+    return
+
@@ -0,0 +1,889 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    asyncio provisioning backend for the BloxOne DDI automation demo
+
+    Creates the same objects as the serial create_demo() path, but issues
+    the /ipam and /dns create calls as coroutines over a small pool of
+    keep-alive HTTP/1.1 connections, bounded by a concurrency semaphore.
+
+ Requirements:
+   Python3 with asyncio, ssl and bloxone modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import asyncio
+import collections
+import ipaddress
+import json
+import logging
+import random
+import ssl
+import time
+import urllib.parse
+import urllib.request
+import bloxone
+import b1_bodies
+import b1_metrics
+import b1_planner
+import b1_ratelimit
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+
+class AsyncResponse:
+    '''
+    Minimal response object mirroring the parts of requests.Response
+    used by the automation tools
+    '''
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+        return
+
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncB1DDI:
+    '''
+    asyncio wrapper for the BloxOne DDI API using a pool of keep-alive
+    HTTP/1.1 connections
+    '''
+
+    def __init__(self, b1ini, concurrency=10, manifest=None, journal=None,
+                 governor=None, allocation='client'):
+        '''
+        Read bloxone ini file and set attributes
+
+        Parameters:
+            b1ini (str): Name of inifile for bloxone module
+            concurrency (int): Maximum number of in flight requests
+            manifest (obj): Manifest object to record created objects
+            journal (obj): Journal object of completed steps
+            governor (obj): b1_ratelimit.RateGovernor for rate limits,
+                            concurrency and retry/backoff
+            allocation (str): IP reservation allocation, client or server
+        '''
+        # Use the bloxone module to read and verify the inifile
+        b1ddi = bloxone.b1ddi(b1ini)
+        self.ddi_url = b1ddi.ddi_url
+        self.headers = b1ddi.headers
+        self.return_codes_ok = b1ddi.return_codes_ok
+
+        url = urllib.parse.urlsplit(self.ddi_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.base_path = url.path
+        if ( urllib.request.getproxies().get(self.scheme) and 
+             not urllib.request.proxy_bypass(self.host) ):
+            log.warning(f'--- {self.scheme.upper()}_PROXY is not supported '
+                        'by the async backend, connecting directly')
+
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.manifest = manifest
+        self.journal = journal
+        self.governor = governor
+        self.allocation = allocation
+        self._idle = []
+        self._waiters = collections.deque()
+
+        return
+
+
+    async def _connect(self):
+        '''
+        Open a new connection to the API host
+        '''
+        if self.scheme == 'https':
+            context = ssl.create_default_context()
+            conn = await asyncio.open_connection(self.host, self.port,
+                                                 ssl=context)
+        else:
+            conn = await asyncio.open_connection(self.host, self.port)
+
+        return conn
+
+
+    async def _read_response(self, reader):
+        '''
+        Read and parse an HTTP/1.1 response
+
+        Returns:
+            tuple: (AsyncResponse, keep_alive)
+        '''
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by server')
+        status_code = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            content = b''.join(chunks)
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        else:
+            content = await reader.read()
+            headers['connection'] = 'close'
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+
+        return AsyncResponse(status_code, headers, content), keep_alive
+
+
+    async def request(self, method, objpath, body='', **params):
+        '''
+        Make an API call, applying the rate limit and concurrency limit
+        of the rate governor, if set, and retrying throttled requests 
+        with backoff
+
+        Parameters:
+            method (str): HTTP method
+            objpath (str): Swagger object path
+            body (str): JSON formatted data payload
+            params: Query parameters
+
+        Returns:
+            AsyncResponse object
+        '''
+        if not self.governor:
+            return await self._request(method, objpath, body, **params)
+
+        attempt = 0
+        while True:
+            limiter = await self._acquire(objpath)
+            started = time.monotonic()
+            try:
+                response = await self._request(method, objpath, body, **params)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if attempt >= self.governor.max_retries:
+                    raise
+                response = None
+            else:
+                if not b1_ratelimit.retryable(method, response.status_code):
+                    if response.status_code not in b1_ratelimit.RETRY_CODES:
+                        limiter.increase()
+                    break
+                if response.status_code == 429:
+                    limiter.decrease(started)
+                    self.governor.throttled += 1
+            finally:
+                self._release(limiter)
+
+            if attempt >= self.governor.max_retries:
+                log.warning(f'--- Giving up after {attempt} retries: {objpath}')
+                break
+            wait = self.governor.delay(attempt, response)
+            status = response.status_code if response is not None else 'error'
+            log.debug(f'Retrying {objpath} in {wait:0.2f}S ({status})')
+            self.governor.retries += 1
+            attempt += 1
+            await asyncio.sleep(wait)
+
+        return response
+
+
+    async def _acquire(self, objpath):
+        '''
+        Wait for a token and a concurrency slot from the governor for
+        the API family of objpath
+
+        Returns:
+            b1_ratelimit.AIMDLimiter holding the slot
+        '''
+        bucket, limiter = self.governor.family(self.base_path + objpath)
+        wait = bucket.take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = bucket.take()
+        while not limiter.try_acquire():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+        return limiter
+
+
+    def _release(self, limiter):
+        '''
+        Release a concurrency slot and wake any waiting requests
+        '''
+        limiter.release()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+        return
+
+
+    def _pooled(self):
+        '''
+        Take an idle connection from the pool, discarding any closed 
+        by the server
+
+        Returns:
+            tuple: (reader, writer), or (None, None) if none are idle
+        '''
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+            else:
+                return reader, writer
+
+        return None, None
+
+
+    async def _request(self, method, objpath, body='', **params):
+        '''
+        Make a single API call, reusing an idle connection where possible
+        '''
+        path = self.base_path + objpath
+        if params:
+            path += '?' + urllib.parse.urlencode(params,
+                                                 quote_via=urllib.parse.quote)
+        payload = body.encode() if body else b''
+        head = ( f'{method} {path} HTTP/1.1\r\n'
+                 f'Host: {self.host}\r\n'
+                 f'Authorization: {self.headers["Authorization"]}\r\n'
+                 'Content-Type: application/json\r\n'
+                 f'Content-Length: {len(payload)}\r\n'
+                 'Connection: keep-alive\r\n\r\n' )
+
+        async with self.semaphore:
+            start = time.perf_counter()
+            # Retry once on a fresh connection if a pooled one has gone 
+            # stale, unless a request that is not idempotent was sent
+            for attempt in range(2):
+                reader, writer = self._pooled()
+                pooled = reader is not None
+                if not pooled:
+                    reader, writer = await self._connect()
+                sent = False
+                try:
+                    writer.write(head.encode() + payload)
+                    await writer.drain()
+                    sent = True
+                    response, keep_alive = await self._read_response(reader)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if ( attempt or not pooled or ( sent and method not in
+                         b1_ratelimit.IDEMPOTENT_METHODS ) ):
+                        b1_metrics.METRICS.record(method, path, 0, 
+                            len(payload), 0, time.perf_counter() - start)
+                        raise
+            b1_metrics.METRICS.record(method, path, response.status_code,
+                                      len(payload), len(response.content),
+                                      time.perf_counter() - start)
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+
+        log.debug(f'{method} {path}: {response.status_code}')
+
+        return response
+
+
+    async def create(self, objpath, body=''):
+        return await self.request('POST', objpath, body=body)
+
+
+    async def get(self, objpath, **params):
+        return await self.request('GET', objpath, **params)
+
+
+    async def next_available_ip(self, objpath, id, count=1):
+        '''
+        Allocate the next available IPs in a subnet or range, adding 
+        the addresses created to the manifest
+
+        Returns:
+            AsyncResponse object
+        '''
+        id = str(id).rsplit('/', 1)[-1]
+        with b1_metrics.phase(b1_metrics.OBJPATH_PHASES['/ipam/address']):
+            response = await self.request('POST', 
+                                          f'{objpath}/{id}/nextavailableip',
+                                          count=count)
+        if response.status_code in self.return_codes_ok and self.manifest:
+            for obj in response.json().get('results') or []:
+                if obj.get('id'):
+                    self.manifest.record('/ipam/address', obj)
+
+        return response
+
+
+    async def get_id(self, objpath, *, key="", value="", include_path=False):
+        '''
+        Get object id using key/value pair
+
+        Returns:
+            id (str): object id or ""
+        '''
+        id = ''
+        response = await self.get(objpath,
+                                  _filter=f'{key}=="{value}"',
+                                  _fields=f'{key},id')
+        if response.status_code in self.return_codes_ok:
+            results = response.json().get('results')
+            if results:
+                id = results[0]['id']
+                if not include_path:
+                    id = id.rsplit('/', 1)[1]
+
+        return id
+
+
+    async def close(self):
+        '''
+        Close all pooled connections
+        '''
+        while self._idle:
+            reader, writer = self._idle.pop()
+            writer.close()
+
+        return
+
+
+def created_object(response):
+    '''
+    Extract object from a B1DDI create response
+    '''
+    obj = {}
+    try:
+        obj = response.json().get('result', {})
+    except ValueError:
+        log.debug(f'Unable to decode response: {response.text}')
+
+    return obj
+
+
+async def existing_id(b1ddi, objpath, body):
+    '''
+    Find the id of an object matching a create body, e.g. after a 409
+
+    Returns:
+        id (str): Object id (including path) or ''
+    '''
+    id = ''
+    filter = b1_bodies.identity_filter(objpath, body)
+    if filter:
+        response = await b1ddi.get(objpath, _filter=filter, _fields='id')
+        if response.status_code in b1ddi.return_codes_ok:
+            results = response.json().get('results')
+            if results:
+                id = results[0].get('id', '')
+
+    return id
+
+
+async def create_object(b1ddi, objpath, body, description, step=''):
+    '''
+    Create object and log outcome, skipping steps already recorded
+    in the journal. When resuming, an object that already exists (409)
+    is treated as created, as in the serial create_step()
+
+    Parameters:
+        b1ddi (obj): AsyncB1DDI object
+        objpath (str): Swagger object path
+        body (str): JSON formatted data payload
+        description (str): Object description for logging
+        step (str): Journal step key
+
+    Returns:
+        id (str): Object id (including path) or ''
+    '''
+    id = ''
+    if step and b1ddi.journal and b1ddi.journal.completed(step):
+        log.info(f'~~~~ {description} already created, skipping')
+        return ( b1ddi.journal.object_id(step) or
+                 await existing_id(b1ddi, objpath, body) )
+
+    log.debug("Body:{}".format(body))
+    with b1_metrics.phase(b1_metrics.OBJPATH_PHASES.get(objpath, objpath)):
+        response = await b1ddi.create(objpath, body=body)
+    if response.status_code in b1ddi.return_codes_ok:
+        log.info(f'+++ {description} created')
+        obj = created_object(response)
+        id = obj.get('id', '')
+        if id and b1ddi.manifest:
+            b1ddi.manifest.record(objpath, obj)
+        if step and b1ddi.journal:
+            b1ddi.journal.record(step, id)
+    else:
+        if ( response.status_code == 409 and step and b1ddi.journal and
+             b1ddi.journal.steps ):
+            id = await existing_id(b1ddi, objpath, body)
+        if id:
+            log.info(f'~~~~ {description} already exists, resuming')
+            b1ddi.journal.record(step, id)
+        else:
+            log.warning(f'--- {description} not created')
+            log.debug("Return code: {}".format(response.status_code))
+            log.debug("Return body: {}".format(response.text))
+
+    return id
+
+
+async def allocate_reservations(b1ddi, network, subnet_id, no_of_ips):
+    '''
+    Reserve the IPs for a subnet server side using next available IP,
+    the addresses are not tagged as the action does not take a body
+
+    Returns:
+        bool: True if successful, None if no IPs could be allocated and
+              the client side allocation should be used
+    '''
+    status = None
+    step = f'/ipam/subnet/{network}/nextavailableip'
+    if b1ddi.journal and b1ddi.journal.completed(step):
+        log.info(f'~~~~ {step} already complete, skipping')
+        return True
+    if not subnet_id:
+        log.warning(f'--- Subnet id for {network} not found, allocating '
+                    'client side')
+        return None
+
+    count = b1_planner.reservation_total(network, no_of_ips)
+    allocated = 0
+    while allocated < count:
+        response = await b1ddi.next_available_ip('/ipam/subnet', subnet_id,
+                                                 count=count - allocated)
+        if response.status_code not in b1ddi.return_codes_ok:
+            log.debug("Return code: {}".format(response.status_code))
+            log.debug("Return body: {}".format(response.text))
+            break
+        addresses = response.json().get('results') or []
+        if not addresses:
+            break
+        allocated += len(addresses)
+
+    if allocated == count:
+        log.info(f'+++ {count} IPs allocated in {network}')
+        if b1ddi.journal:
+            b1ddi.journal.record(step)
+        status = True
+    elif allocated:
+        log.warning(f'--- Only {allocated} of {count} IPs allocated in '
+                    f'{network}')
+        status = False
+    else:
+        log.warning(f'--- Next available IP failed for {network}, '
+                    'allocating client side')
+
+    return status
+
+
+async def run_bounded(coroutines, limit):
+    '''
+    Run coroutines taken from an iterator with at most limit in flight,
+    so that memory does not grow with the number of objects
+
+    Parameters:
+        coroutines (iter): Iterator yielding coroutines
+        limit (int): Maximum number of coroutines in flight
+
+    Returns:
+        tuple: (succeeded, total) number of true results and coroutines
+    '''
+    succeeded = 0
+    total = 0
+    pending = set()
+
+    try:
+        for coroutine in coroutines:
+            if len(pending) >= limit:
+                done, pending = await asyncio.wait(pending, 
+                                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    total += 1
+                    if task.result():
+                        succeeded += 1
+            pending.add(asyncio.ensure_future(coroutine))
+        while pending:
+            done, pending = await asyncio.wait(pending,
+                                    return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                total += 1
+                if task.result():
+                    succeeded += 1
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return succeeded, total
+
+
+async def populate_network(b1ddi, config, space, network, templates,
+                           ipv6=False, subnet_id=''):
+    '''
+    Create DHCP Range and IP reservations concurrently using the
+    precompiled templates from b1_bodies.ipam_templates(), or with 
+    next available IP on the subnet if server side allocation is set
+
+    Returns:
+        status (bool): True if successful
+    '''
+    start_ip, end_ip = [ str(ip) for ip in b1_planner.dhcp_range(network) ]
+
+    tasks = []
+    body = templates['/ipam/range'].build(start_ip, end_ip)
+    tasks.append(create_object(b1ddi, '/ipam/range', body,
+                               f'Range {start_ip}-{end_ip}',
+                               step=f'/ipam/range/{start_ip}-{end_ip}'))
+
+    allocated = None
+    if b1ddi.allocation == 'server':
+        allocated = await allocate_reservations(b1ddi, network, subnet_id,
+                                                config['no_of_ips'])
+    if allocated is None:
+        reservation = templates['/ipam/address']
+        for ip in b1_planner.iter_reservations(network, config['no_of_ips']):
+            address = str(ip)
+            body = reservation.build(address)
+            tasks.append(create_object(b1ddi, '/ipam/address', body,
+                                       f'IP {address}',
+                                       step=f'/ipam/address/{address}'))
+
+    results = await asyncio.gather(*tasks)
+
+    return all(results) and allocated is not False
+
+
+async def create_subnet(b1ddi, config, space, subnet, comment, templates,
+                        ipv6=False):
+    '''
+    Create subnet then populate with range and reservations
+
+    Returns:
+        status (bool): True if successful
+    '''
+    status = False
+    address = str(subnet.network_address)
+    cidr = str(subnet.prefixlen)
+    body = templates['/ipam/subnet'].build(address, cidr, comment)
+    subnet_id = await create_object(b1ddi, '/ipam/subnet', body,
+                                    f'Subnet {address}/{cidr}',
+                                    step=f'/ipam/subnet/{address}/{cidr}')
+    if subnet_id:
+        status = await populate_network(b1ddi, config, space, subnet,
+                                        templates, ipv6=ipv6,
+                                        subnet_id=subnet_id)
+
+    return status
+
+
+async def create_networks(b1ddi, config, space, tag_body, ipv6=False):
+    '''
+    Create address block and all subnets concurrently
+
+    Returns:
+        status (bool): True if successful
+    '''
+    status = False
+    net_comments = config['net_comments'].split(',')
+
+    if ipv6:
+        base_net = config.get('ipv6_prefix') or '2001:db8::'
+        cidr = '32'
+        new_prefix = 64
+        nets = int(config['no_of_networks'])
+    else:
+        base_net = config['base_net']
+        cidr = config['container_cidr']
+        new_prefix = int(config['cidr'])
+        nets = int(config['no_of_networks'])
+
+    body = b1_bodies.BodyTemplate((), tag_body, address=base_net, cidr=cidr,
+                                  space=space,
+                                  comment="Internal Address Allocation"
+                                  ).build()
+    if await create_object(b1ddi, '/ipam/address_block', body,
+                           f'Address block {base_net}/{cidr}',
+                           step=f'/ipam/address_block/{base_net}/{cidr}'):
+        network = ipaddress.ip_network(base_net + '/' + cidr)
+        available = b1_planner.subnet_count(network, new_prefix)
+        if available < nets:
+            log.warning("Address block only supports {} subnets"
+                        .format(available))
+            nets = available
+        log.info("~~~~ Creating {} subnets ~~~~".format(nets))
+
+        templates = b1_bodies.ipam_templates(space, tag_body)
+        subnets = ( create_subnet(b1ddi, config, space, subnet,
+                        net_comments[random.randrange(0,len(net_comments))],
+                        templates, ipv6=ipv6)
+                    for subnet in b1_planner.iter_subnets(network, 
+                                                          new_prefix, nets) )
+        provisioned, total = await run_bounded(subnets, b1ddi.concurrency)
+        log.info("~~~~ {} of {} subnets provisioned ~~~~"
+                 .format(provisioned, total))
+        status = provisioned > 0
+
+    return status
+
+
+async def create_dns(b1ddi, config, space, tag_body, ipv6=False):
+    '''
+    Create DNS view, forward and reverse zones and records
+
+    Returns:
+        status (bool): True if successful
+    '''
+    status = False
+
+    log.info("---- Create DNS View ----")
+    step = '/dns/view/' + config['dns_view']
+    view = ''
+    if not ( b1ddi.journal and b1ddi.journal.completed(step) ):
+        view = await b1ddi.get_id('/dns/view', key="name", 
+                                  value=config['dns_view'], include_path=True)
+        if view and b1ddi.journal and b1ddi.journal.steps:
+            # Created by the interrupted run before the step was recorded
+            log.info("DNS View {} already exists, resuming"
+                     .format(config['dns_view']))
+            b1ddi.journal.record(step, view)
+        elif view:
+            log.warning("DNS View {} already exists"
+                        .format(config['dns_view']))
+            return status
+
+    if space:
+        body = b1_bodies.BodyTemplate((), tag_body, name=config['dns_view'],
+                                      ip_spaces=[ space ]).build()
+    else:
+        body = b1_bodies.BodyTemplate((), tag_body,
+                                      name=config['dns_view']).build()
+    if not view:
+        view = await create_object(b1ddi, '/dns/view', body,
+                                   f"DNS View {config['dns_view']}", 
+                                   step=step)
+    if not view:
+        return status
+
+    log.info("---- Create Forward & Reverse Zones ----")
+    nsg = await b1ddi.get_id('/dns/auth_nsg', key="name", value=config['nsg'],
+                             include_path=True)
+    if not nsg:
+        log.warning("NSG {} not found. Cannot create zones."
+                    .format(config['nsg']))
+        return status
+
+    zone = config['dns_domain']
+    r_network = bloxone.utils.reverse_labels(config['base_net'])
+    r_network = bloxone.utils.get_domain(r_network, no_of_labels=2)
+    r_zone = r_network + '.in-addr.arpa.'
+    zone_template = b1_bodies.BodyTemplate(('fqdn',), tag_body, view=view,
+                                           nsgs=[ nsg ], primary_type='cloud')
+    zone_ids = await asyncio.gather(*[
+        create_object(b1ddi, '/dns/auth_zone', zone_template.build(fqdn),
+                      f'Zone {fqdn}', step=f'/dns/auth_zone/{fqdn}')
+        for fqdn in (zone, r_zone) ])
+    zone_id = zone_ids[0]
+
+    if zone_id:
+        network = ipaddress.ip_network(config['base_net'] + '/' + config['cidr'])
+        if int(config['no_of_records']) > int(network.num_addresses) - 2:
+            network = ipaddress.ip_network(config['base_net'] + '/'
+                                           + config['container_cidr'])
+        no_of_records = min(int(config['no_of_records']),
+                            int(network.num_addresses) - 2)
+        # PTRs only for addresses in the reverse zone
+        networks = [ (network, 'A', True) ]
+        ptr_network = b1_planner.reverse_network(config['base_net'])
+        if ipv6:
+            # No ip6.arpa zone is created so AAAA records have no PTR
+            prefix = config.get('ipv6_prefix') or '2001:db8::'
+            networks.append((ipaddress.ip_network(prefix + '/64'),
+                             'AAAA', False))
+
+        def records():
+            for network, rtype, create_ptr in networks:
+                template = b1_bodies.record_template(zone_id, rtype, 
+                                                     create_ptr, tag_body)
+                no_ptr = b1_bodies.record_template(zone_id, rtype, False,
+                                                   tag_body)
+                addresses = b1_planner.iter_hosts(network, no_of_records)
+                for n, ip in enumerate(addresses, start=1):
+                    hostname = "host" + str(n)
+                    address = str(ip)
+                    if ip in ptr_network:
+                        body = template.build(hostname, { "address": address })
+                    else:
+                        body = no_ptr.build(hostname, { "address": address })
+                    yield create_object(b1ddi, '/dns/record', body,
+                                        f'Record {hostname}.{zone}',
+                        step=f'/dns/record/{zone}/{hostname}/{address}')
+
+        record_count, no_of_records = await run_bounded(records(),
+                                                        b1ddi.concurrency)
+        if record_count == no_of_records:
+            log.info("+++ Successfully created {} DNS Records"
+                     .format(record_count))
+            status = True
+        else:
+            log.info("--- Only {} DNS Records created".format(record_count))
+    else:
+        log.warning("--- Unable to add records to zone {}".format(zone))
+
+    return status
+
+
+async def _create_demo(b1ini, config, ipv6, concurrency, tag_body, manifest,
+                       journal, governor, allocation):
+    '''
+    Coroutine implementing create_demo
+    '''
+    exitcode = 0
+    b1ddi = AsyncB1DDI(b1ini, concurrency=concurrency, manifest=manifest,
+                       journal=journal, governor=governor, 
+                       allocation=allocation)
+
+    try:
+        log.info("---- Create IP Space ----")
+        populate = True
+        step = '/ipam/ip_space/' + config['ip_space']
+        body = b1_bodies.BodyTemplate((), tag_body,
+                                      name=config['ip_space']).build()
+        if journal and journal.completed(step):
+            log.info("IP Space {} already created, resuming"
+                     .format(config['ip_space']))
+            space = ( journal.object_id(step) or 
+                      await existing_id(b1ddi, '/ipam/ip_space', body) )
+        else:
+            space = await b1ddi.get_id('/ipam/ip_space', key="name",
+                                       value=config['ip_space'],
+                                       include_path=True)
+            if not space:
+                space = await create_object(b1ddi, '/ipam/ip_space', body,
+                                            f"IP_Space {config['ip_space']}",
+                                            step=step)
+            elif journal and journal.steps:
+                # Created by the interrupted run before the step was recorded
+                log.info("IP Space {} already exists, resuming"
+                         .format(config['ip_space']))
+                journal.record(step, space)
+            else:
+                # Not populated, but still linked to the DNS view
+                log.warning("IP Space {} already exists"
+                            .format(config['ip_space']))
+                populate = False
+
+        if space and populate:
+            # IPv4 and IPv6 networks are independent of each other
+            tasks = [ create_networks(b1ddi, config, space, tag_body) ]
+            if ipv6:
+                tasks.append(create_networks(b1ddi, config, space, tag_body,
+                                             ipv6=True))
+            if not all(await asyncio.gather(*tasks)):
+                log.error("--- Failed to create networks in {}"
+                          .format(config['ip_space']))
+                exitcode = 1
+        else:
+            exitcode = 1
+
+        if await create_dns(b1ddi, config, space, tag_body, ipv6=ipv6):
+            log.info("+++ Successfully Populated DNS View")
+        else:
+            log.error("--- Failed to create zones in {}"
+                      .format(config['dns_view']))
+            exitcode = 1
+
+    finally:
+        await b1ddi.close()
+
+    return exitcode
+
+
+def create_demo(b1ini, config, tag_body, ipv6=False, concurrency=10,
+                manifest=None, journal=None, governor=None, 
+                allocation='client'):
+    '''
+    Create the demo data using the asyncio backend
+
+    Parameters:
+        b1ini (str): Name of inifile for bloxone module
+        config (obj): ini config object
+        tag_body (str): JSON tag string to append to body
+        ipv6 (bool): Build IPv6 networks
+        concurrency (int): Maximum number of in flight requests
+        manifest (obj): Manifest object to record created objects
+        journal (obj): Journal object of completed steps
+        governor (obj): b1_ratelimit.RateGovernor for retry/backoff
+        allocation (str): IP reservation allocation, client or server
+
+    Returns:
+        exitcode (int): 0 if successful
+    '''
+    log.info(f'Using asyncio backend with concurrency {concurrency}')
+
+    return asyncio.run(_create_demo(b1ini, config, ipv6, concurrency,
+                                    tag_body, manifest, journal, governor,
+                                    allocation))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Precompiled JSON request body builders for the BloxOne APIs
+
+    The static members of a request body (space, zone, tags,
+    inheritance etc.) are serialised once when a BodyTemplate is
+    created, each body is then built by encoding only the fields that
+    change, e.g. the address of an IP reservation. Values are always
+    properly JSON encoded, using orjson when installed.
+
+ Requirements:
+   Python3 with json module, optionally orjson
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fields identifying an existing object, used to find the id of an
+# object that already exists (409) when resuming an interrupted run
+IDENTITY_FIELDS = { '/ipam/ip_space': ( 'name', ),
+                    '/ipam/address_block': ( 'address', 'space' ),
+                    '/ipam/subnet': ( 'address', 'space' ),
+                    '/ipam/range': ( 'start', 'space' ),
+                    '/ipam/address': ( 'address', 'space' ),
+                    '/dns/view': ( 'name', ),
+                    '/dns/auth_zone': ( 'fqdn', 'view' ),
+                    '/dns/record': ( 'name_in_zone', 'zone', 'type' ) }
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _json_encode(value):
+    '''
+    JSON encode a value, plain strings that need no escaping are
+    quoted directly without calling json.dumps()
+    '''
+    if ( value.__class__ is str and value.isprintable() 
+         and '"' not in value and '\\' not in value ):
+        return '"' + value + '"'
+
+    return _json_dumps(value)
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj).decode()
+
+
+def set_encoder(name=''):
+    '''
+    Select the JSON encoder used by dumps(), encode() and templates
+
+    Parameters:
+        name (str): 'orjson' or 'json', defaults to orjson if installed
+
+    Returns:
+        str: Name of the encoder selected
+    '''
+    global dumps, encode, ENCODER
+    if name != 'json' and orjson:
+        dumps = encode = _orjson_dumps
+        ENCODER = 'orjson'
+    else:
+        dumps = _json_dumps
+        encode = _json_encode
+        ENCODER = 'json'
+
+    return ENCODER
+
+
+# Default to orjson when installed
+set_encoder()
+
+
+def fragment(key, value):
+    '''
+    Serialise a single "key":value member for use in a template
+
+    Parameters:
+        key (str): Member name
+        value (any): JSON serialisable value
+
+    Returns:
+        str: JSON member string, e.g. "tags":{...}
+    '''
+    return dumps(key) + ':' + dumps(value)
+
+
+class BodyTemplate:
+    '''
+    JSON object body with fixed members serialised once
+    '''
+
+    def __init__(self, fields, *fragments, **static):
+        '''
+        Parameters:
+            fields (tuple): Names of the fields passed to build(), in order
+            fragments (str): Pre-serialised "key":value members, e.g. the
+                             tag body from create_tag_body()
+            static (dict): Fixed members, serialised once
+        '''
+        self.fields = tuple(fields)
+        self._keys = [ dumps(field) + ':' for field in self.fields ]
+        members = [ fragment(k, v) for k, v in static.items() ]
+        members.extend(f for f in fragments if f)
+        tail = ','.join(members)
+        if self.fields and tail:
+            self._tail = ',' + tail + '}'
+        else:
+            self._tail = tail + '}'
+        if len(self._keys) == 1:
+            self._prefix = '{' + self._keys[0]
+            # Quoted prefix and suffix for plain string values
+            self._open = self._prefix + '"'
+            self._close = '"' + self._tail
+            self.build = self._build_one
+
+        return
+
+
+    def build(self, *values):
+        '''
+        Build a body from the values of the variable fields
+
+        Parameters:
+            values: Field values in the order given by fields
+
+        Returns:
+            str: JSON body
+        '''
+        return ( '{' + ','.join([ key + encode(value) 
+                                  for key, value in zip(self._keys, values) ])
+                 + self._tail )
+
+
+    def _build_one(self, value):
+        '''
+        build() for templates with a single variable field, plain
+        strings that need no escaping are inserted directly
+        '''
+        if ( value.__class__ is str and value.isprintable() 
+             and '"' not in value and '\\' not in value ):
+            return self._open + value + self._close
+
+        return self._prefix + encode(value) + self._tail
+
+
+    def __call__(self, *values):
+        return self.build(*values)
+
+
+def ipam_templates(space, tag_body=''):
+    '''
+    Precompile the subnet, range and IP reservation body templates
+    for an IP Space
+
+    Parameters:
+        space (str): IP Space id (including path)
+        tag_body (str): JSON tag string from create_tag_body()
+
+    Returns:
+        dict: BodyTemplate objects keyed by objpath
+    '''
+    templates = {
+        '/ipam/subnet': BodyTemplate(('address', 'cidr', 'comment'),
+                                     tag_body, space=space),
+        '/ipam/range': BodyTemplate(('start', 'end'), tag_body, space=space),
+        '/ipam/address': BodyTemplate(('address',), tag_body, space=space) }
+
+    return templates
+
+
+def identity_filter(objpath, body):
+    '''
+    Build a _filter matching the object described by a create body
+
+    Parameters:
+        objpath (str): Swagger object path
+        body (str): JSON formatted data payload
+
+    Returns:
+        str: _filter expression, or '' if objpath is not supported
+    '''
+    fields = IDENTITY_FIELDS.get(objpath)
+    if not fields:
+        return ''
+    data = json.loads(body) if isinstance(body, str) else body
+    terms = [ f'{field}=="{data[field]}"' for field in fields 
+              if data.get(field) not in [ None, '' ] ]
+
+    return ' and '.join(terms)
+
+
+def record_template(zone_id, rtype='A', create_ptr=True, tag_body=''):
+    '''
+    Precompile a host record body template for a zone
+
+    Parameters:
+        zone_id (str): Zone id (including path)
+        rtype (str): Record type, A or AAAA
+        create_ptr (bool): Request creation of the PTR record
+        tag_body (str): JSON tag string from create_tag_body()
+
+    Returns:
+        BodyTemplate with fields name_in_zone and rdata
+    '''
+    return BodyTemplate(('name_in_zone', 'rdata'), tag_body,
+                        zone=zone_id, type=rtype,
+                        options={ 'create_ptr': create_ptr },
+                        inheritance_sources={ 'ttl': { 'action': 'inherit' } })
@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Streaming bulk import of custom list items for BloxOne Threat Defense
+
+    Reads domains from text, CSV or gzip compressed files a line at a
+    time, normalises, validates and de-duplicates them, and uploads them
+    to a named list in chunks sized to the API payload limit: the first
+    chunk creates the list and the remainder are added with PATCH
+    requests. Memory use is bounded by one chunk plus a 64 bit hash of
+    each unique item, 16-32 bytes per item in a compact hash table, 
+    rather than the size of the file.
+
+    Network lists are built from files of IPv4 and IPv6 prefixes, which
+    are aggregated to the smallest set of prefixes covering the same
+    addresses before upload.
+
+ Requirements:
+   Python3 with csv, gzip, hashlib and ipaddress modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import csv
+import gzip
+import array
+import hashlib
+import io
+import ipaddress
+import logging
+import re
+import time
+import bloxone
+import b1_bodies
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+# Request size limits for list items, kept below the API payload limit
+MAX_PAYLOAD = 1024 * 1024
+MAX_ITEMS = 20000
+# Size of the JSON for each item, excluding the item itself, when
+# added as {"item":"","description":""},
+ITEM_OVERHEAD = 30
+
+# Number of rejected lines logged
+MAX_REJECTED_LOG = 10
+
+CSV_COLUMNS = [ 'domain', 'fqdn', 'hostname', 'host', 'item', 'name' ]
+NETWORK_CSV_COLUMNS = [ 'prefix', 'network', 'cidr', 'subnet', 'address', 
+                        'item' ]
+HOSTS_ADDRESSES = [ '0.0.0.0', '127.0.0.1', '::', '::1' ]
+URL_PREFIX = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+URL_CHARS = re.compile(r'[/:?#@]')
+
+# Compiled once for all imports
+HOST_REGEX, URL_REGEX = bloxone.utils.buildregex()
+
+
+class ImportStats:
+    '''
+    Counters for an import
+    '''
+
+    def __init__(self):
+        self.lines = 0
+        self.items = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.requests = 0
+        self.start = time.perf_counter()
+
+        return
+
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.start
+
+
+    def reject(self, filename, lineno, line, reason):
+        '''
+        Count a rejected line, logging the first few
+        '''
+        self.rejected += 1
+        if self.rejected <= MAX_REJECTED_LOG:
+            log.warning(f'--- {filename}:{lineno} rejected, {reason}: '
+                        f'{line.strip()[:80]}')
+        elif self.rejected == MAX_REJECTED_LOG + 1:
+            log.warning('--- Further rejected lines not logged')
+
+        return
+
+
+    def log_summary(self, name, logger=None):
+        '''
+        Log the import rate and counts
+        '''
+        logger = logger or log
+        seconds = self.seconds
+        rate = self.items / seconds if seconds else 0
+        logger.info(f'{name}: {self.items} items imported from {self.lines} '
+                    f'lines in {seconds:0.2f}S ({rate:0.0f} items/sec), '
+                    f'{self.requests} requests, {self.duplicates} duplicates, '
+                    f'{self.rejected} lines rejected')
+
+        return
+
+
+class Deduplicator:
+    '''
+    Remember items seen using a 64 bit hash of each item, held in an
+    open addressing table of unsigned 64 bit integers. The table is 
+    kept at most half full, so uses 16-32 bytes per item, briefly up to
+    48 while growing, compared to 60-90 bytes for a set of ints.
+    '''
+
+    def __init__(self, size=1024):
+        '''
+        Parameters:
+            size (int): Initial table size, a power of 2
+        '''
+        self.count = 0
+        self._table = array.array('Q', bytes(8 * size))
+        self._mask = size - 1
+
+        return
+
+
+    def add(self, item):
+        '''
+        Returns:
+            bool: True if the item has not been seen before
+        '''
+        key = int.from_bytes(hashlib.blake2b(item.encode(), 
+                                             digest_size=8).digest(), 'big')
+        # 0 marks an empty slot
+        key = key or 1
+        table = self._table
+        slot = key & self._mask
+        while table[slot]:
+            if table[slot] == key:
+                return False
+            slot = (slot + 1) & self._mask
+        table[slot] = key
+        self.count += 1
+        if self.count * 2 > len(table):
+            self._grow()
+
+        return True
+
+
+    def _grow(self):
+        '''
+        Double the table size and reinsert the hashes
+        '''
+        old = self._table
+        self._table = array.array('Q', bytes(16 * len(old)))
+        self._mask = len(self._table) - 1
+        for key in old:
+            if key:
+                slot = key & self._mask
+                while self._table[slot]:
+                    slot = (slot + 1) & self._mask
+                self._table[slot] = key
+
+        return
+
+
+def open_lines(filename):
+    '''
+    Read a text file a line at a time, gzip compressed files are 
+    detected and decompressed
+
+    Parameters:
+        filename (str): Filename
+
+    Yields:
+        str: line
+    '''
+    with open(filename, 'rb') as raw:
+        compressed = raw.read(2) == b'\x1f\x8b'
+    if compressed:
+        stream = io.TextIOWrapper(gzip.open(filename, 'rb'), encoding='utf-8',
+                                  errors='replace', newline='')
+    else:
+        stream = open(filename, 'r', encoding='utf-8', errors='replace',
+                      newline='')
+    with stream:
+        yield from stream
+
+    return
+
+
+def iter_values(filename, columns=CSV_COLUMNS):
+    '''
+    Yield the candidate item from each line of a text or CSV file. CSV
+    files use the first of columns found in the header, by default the
+    domain (fqdn, hostname, item or name) column, otherwise the first 
+    column. Text files may contain comments and hosts file entries, 
+    e.g. 0.0.0.0 example.com
+
+    Parameters:
+        filename (str): Text or CSV file, optionally gzip compressed
+        columns (list): CSV header names to look for
+
+    Yields:
+        tuple: (line number, line, value), value is None if the line
+               has more than one field
+    '''
+    name = filename.casefold()
+    if name.endswith('.gz'):
+        name = name[:-3]
+
+    if name.endswith('.csv'):
+        column = 0
+        for lineno, row in enumerate(csv.reader(open_lines(filename)), 1):
+            if not row:
+                continue
+            if lineno == 1:
+                header = [ field.strip().casefold() for field in row ]
+                matches = [ c for c in columns if c in header ]
+                if matches:
+                    column = header.index(matches[0])
+                    continue
+            line = ','.join(row)
+            if line.lstrip().startswith('#'):
+                continue
+            value = row[column] if column < len(row) else ''
+            yield lineno, line, value
+    else:
+        for lineno, line in enumerate(open_lines(filename), 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) > 1 and fields[0] in HOSTS_ADDRESSES:
+                fields = fields[1:]
+            yield lineno, line, fields[0] if len(fields) == 1 else None
+
+    return
+
+
+def normalise(value):
+    '''
+    Normalise a domain: lower case, without any URL scheme, path or
+    port, leading wildcard label or trailing dot, IDNs are encoded
+
+    Parameters:
+        value (str): Domain, host name or URL
+
+    Returns:
+        str
+    '''
+    domain = value.strip()
+    if URL_CHARS.search(domain):
+        domain = URL_PREFIX.sub('', domain)
+        domain = re.split(r'[/?#]', domain, 1)[0]
+        domain = domain.rsplit('@', 1)[-1].split(':', 1)[0]
+    domain = domain.casefold().strip('.')
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    if not domain.isascii():
+        try:
+            domain = domain.encode('idna').decode()
+        except UnicodeError:
+            domain = ''
+
+    return domain
+
+
+def valid_domain(domain):
+    '''
+    Validate a normalised domain using the bloxone host name regex
+    '''
+    return ( 0 < len(domain) <= 253 and 
+             bloxone.utils.validate_fqdn(domain, HOST_REGEX) )
+
+
+def iter_domains(filename, stats=None):
+    '''
+    Stream the unique valid domains from a file
+
+    Parameters:
+        filename (str): Text or CSV file, optionally gzip compressed
+        stats (obj): ImportStats object
+
+    Yields:
+        str: domain
+    '''
+    stats = stats or ImportStats()
+    seen = Deduplicator()
+    for lineno, line, value in iter_values(filename):
+        stats.lines += 1
+        if value is None:
+            stats.reject(filename, lineno, line, 'unexpected fields')
+            continue
+        domain = normalise(value)
+        if not valid_domain(domain):
+            stats.reject(filename, lineno, line, 'invalid domain')
+        elif seen.add(domain):
+            yield domain
+        else:
+            stats.duplicates += 1
+
+    return
+
+
+def parse_prefix(value):
+    '''
+    Parse an IPv4 or IPv6 address or prefix, any host bits are ignored
+
+    Parameters:
+        value (str): Address or prefix, e.g. 192.0.2.1 or 2001:db8::/32
+
+    Returns:
+        ipaddress network object, or None if invalid
+    '''
+    try:
+        network = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        network = None
+
+    return network
+
+
+def iter_prefixes(filename, stats=None):
+    '''
+    Stream the valid prefixes from a file
+
+    Parameters:
+        filename (str): Text or CSV file, optionally gzip compressed
+        stats (obj): ImportStats object
+
+    Yields:
+        ipaddress network object
+    '''
+    stats = stats or ImportStats()
+    for lineno, line, value in iter_values(filename, 
+                                           columns=NETWORK_CSV_COLUMNS):
+        stats.lines += 1
+        if value is None:
+            stats.reject(filename, lineno, line, 'unexpected fields')
+            continue
+        network = parse_prefix(value)
+        if network:
+            yield network
+        else:
+            stats.reject(filename, lineno, line, 'invalid prefix')
+
+    return
+
+
+def aggregate(networks):
+    '''
+    Collapse networks to the smallest list of prefixes covering the 
+    same addresses, duplicate and overlapping prefixes are removed and
+    adjacent prefixes merged
+
+    Parameters:
+        networks (iter): ipaddress network objects, IPv4 and/or IPv6
+
+    Returns:
+        list of prefixes as strings, IPv4 first
+    '''
+    by_version = { 4: [], 6: [] }
+    for network in networks:
+        by_version[network.version].append(network)
+
+    return [ str(network) for version in [ 4, 6 ] 
+             for network in ipaddress.collapse_addresses(by_version[version]) ]
+
+
+def network_list_name(name, number):
+    '''
+    Name of each network list of a chunked import: name, name-2, ...
+    '''
+    return name if number == 1 else f'{name}-{number}'
+
+
+def iter_chunks(items, max_payload=MAX_PAYLOAD, max_items=MAX_ITEMS):
+    '''
+    Group items into chunks with a JSON size below max_payload
+
+    Parameters:
+        items (iter): Strings
+        max_payload (int): Maximum bytes of items per chunk
+        max_items (int): Maximum items per chunk
+
+    Yields:
+        list
+    '''
+    chunk = []
+    size = 0
+    for item in items:
+        length = len(item) + ITEM_OVERHEAD
+        if chunk and ( size + length > max_payload or 
+                       len(chunk) >= max_items ):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(item)
+        size += length
+    if chunk:
+        yield chunk
+
+    return
+
+
+def partial(name, stats):
+    '''
+    Warn that a custom list was left on the server with only part of
+    the items from the file
+    '''
+    log.warning(f'--- Custom list {name} remains with only {stats.items} '
+                'items, remove it with --remove before retrying')
+
+    return
+
+
+def import_custom_list(b1tdc, name, filename, tags=None, 
+                       description='Custom list'):
+    '''
+    Create a custom list from a file of domains, using one create and
+    as many PATCH requests as needed
+
+    Parameters:
+        b1tdc (obj): bloxone.b1tdc object
+        name (str): Custom list name
+        filename (str): Text or CSV file, optionally gzip compressed
+        tags (dict): Tags for the list
+        description (str): List description
+
+    Returns:
+        id of the list created, or None on failure. If adding items
+        fails after the list is created, the partial list remains and
+        a warning is logged
+    '''
+    id = None
+    stats = ImportStats()
+    log.info(f'Importing custom list {name} from {filename}')
+
+    try:
+        chunks = iter_chunks(iter_domains(filename, stats))
+        first = next(chunks, [])
+        body = { 'name': name,
+                 'type': 'custom_list',
+                 'confidence_level': 'HIGH',
+                 'description': description,
+                 'items': first }
+        if tags:
+            body['tags'] = tags
+        response = b1tdc.create('/named_lists', body=b1_bodies.dumps(body))
+        stats.requests += 1
+        if response.status_code in b1tdc.return_codes_ok:
+            id = response.json()['results']['id']
+            stats.items += len(first)
+        else:
+            log.warning(f'--- Custom list {name} not created')
+            log.debug(f'Return code: {response.status_code}')
+            log.warning(f'Return body: {response.text}')
+
+        while id:
+            chunk = next(chunks, None)
+            if not chunk:
+                break
+            body = { 'inserted_items_described': 
+                     [ { 'item': item, 'description': '' } 
+                       for item in chunk ] }
+            response = b1tdc.update('/named_lists', id=id, 
+                                    body=b1_bodies.dumps(body))
+            stats.requests += 1
+            if response.status_code in b1tdc.return_codes_ok:
+                stats.items += len(chunk)
+                log.debug(f'{stats.items} items added to {name}')
+            else:
+                log.warning(f'--- Failed to add {len(chunk)} items to {name}')
+                log.debug(f'Return code: {response.status_code}')
+                log.warning(f'Return body: {response.text}')
+                partial(name, stats)
+                id = None
+    except OSError as err:
+        log.error(f'--- Unable to read {filename}: {err}')
+        if id:
+            partial(name, stats)
+        id = None
+
+    stats.log_summary(name)
+
+    return id
+
+
+def import_network_lists(b1tdc, name, filename, extra=[],
+                         description='Network list'):
+    '''
+    Create network lists from a file of IPv4 and IPv6 prefixes. The
+    prefixes are aggregated and, if they do not fit in a single list,
+    split across name, name-2, ... with one create per list
+
+    Parameters:
+        b1tdc (obj): bloxone.b1tdc object
+        name (str): Network list name
+        filename (str): Text or CSV file, optionally gzip compressed
+        extra (list): Additional prefixes, invalid prefixes are ignored
+        description (str): List description
+
+    Returns:
+        list of ids of the lists created, or None on failure
+    '''
+    ids = []
+    stats = ImportStats()
+    log.info(f'Importing network list {name} from {filename}')
+
+    try:
+        networks = list(iter_prefixes(filename, stats))
+    except OSError as err:
+        log.error(f'--- Unable to read {filename}: {err}')
+        networks = []
+        ids = None
+    networks += [ n for n in map(parse_prefix, extra) if n ]
+
+    items = aggregate(networks)
+    log.info(f'{name}: {len(networks)} prefixes aggregated to '
+             f'{len(items)} items')
+    if ids is not None and not items:
+        log.warning(f'--- No valid prefixes for network list {name}')
+        ids = None
+
+    number = 0
+    for chunk in iter_chunks(items) if ids is not None else []:
+        number += 1
+        list_name = network_list_name(name, number)
+        body = { 'description': description,
+                 'items': chunk,
+                 'name': list_name }
+        response = b1tdc.create('/network_lists', body=b1_bodies.dumps(body))
+        stats.requests += 1
+        if response.status_code in b1tdc.return_codes_ok:
+            ids.append(response.json()['results']['id'])
+            stats.items += len(chunk)
+            log.debug(f'Network list {list_name} created, {len(chunk)} items')
+        else:
+            log.warning(f'--- Network list {list_name} not created')
+            log.debug(f'Return code: {response.status_code}')
+            log.warning(f'Return body: {response.text}')
+            ids = None
+            break
+
+    stats.log_summary(name)
+
+    return ids
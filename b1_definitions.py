@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Cached loader for the B1TD policy and filter definition YAML files
+
+    Each file is parsed once per process. The parsed definitions, plus
+    the rule lists pre-computed per policy level and action, are kept
+    in a JSON cache file alongside the YAML file (.<file>.cache.json),
+    keyed by the modification time and size of the YAML file, so later
+    runs and fan-out worker processes skip YAML parsing entirely.
+
+ Requirements:
+   Python3 with json and yaml modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import json
+import logging
+import os
+import threading
+import yaml
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+POLICY_ACTIONS = [ 'action_block', 
+                   'action_redirect', 
+                   'action_log',
+                   'action_allow' ]
+FILTER_ACTIONS = POLICY_ACTIONS + [ 'action_allow_with_local_resolution' ]
+
+# In process cache, (stamp, definitions) keyed by absolute filename
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def compile_policies(policies):
+    '''
+    Pre-compute the threat feed rules for each policy level
+
+    Parameters:
+        policies (dict): Parsed policy definitions
+
+    Returns:
+        dict: levels - rules by action for each level, e.g. 'medium',
+              unsupported - unsupported actions for each level
+    '''
+    levels = {}
+    unsupported = {}
+    for name, actions in (policies or {}).items():
+        if not name.startswith('policy_'):
+            continue
+        level = name[len('policy_'):]
+        levels[level] = {}
+        unsupported[level] = []
+        for action, feeds in (actions or {}).items():
+            if action in POLICY_ACTIONS:
+                levels[level][action] = [ { 'action': action,
+                                            'data': feed.get('name'),
+                                            'type': feed.get('type') }
+                                          for feed in feeds or [] ]
+            else:
+                unsupported[level].append(action)
+
+    return { 'levels': levels, 'unsupported': unsupported }
+
+
+def compile_filters(filters):
+    '''
+    Pre-compute the filter rules by action, without the customer prefix
+
+    Parameters:
+        filters (dict): Parsed filter definitions
+
+    Returns:
+        dict: rules - list of (name, type) by action,
+              unsupported - list of unsupported actions
+    '''
+    rules = {}
+    unsupported = []
+    for filter_type, items in (filters or {}).items():
+        # Other sections, e.g. app_aliases, are not filters
+        if not filter_type.endswith('_filters'):
+            continue
+        type = filter_type[:-1]
+        for item in items or []:
+            action = item.get('action')
+            if action in FILTER_ACTIONS:
+                rules.setdefault(action, []).append([ item.get('name'), type ])
+            else:
+                unsupported.append(action)
+
+    return { 'rules': rules, 'unsupported': unsupported }
+
+
+COMPILERS = { 'policies': compile_policies,
+              'filters': compile_filters }
+
+
+def cache_filename(cfg):
+    '''
+    Name of the compiled cache file for cfg
+
+    Parameters:
+        cfg (str): YAML filename
+
+    Returns:
+        str: filename
+    '''
+    path = os.path.abspath(cfg)
+
+    return os.path.join(os.path.dirname(path), 
+                        '.' + os.path.basename(path) + '.cache.json')
+
+
+def read_cache(cfg, kind, stamp):
+    '''
+    Read the compiled cache file if it matches stamp
+
+    Returns:
+        dict: definitions or None
+    '''
+    definitions = None
+    filename = cache_filename(cfg)
+    try:
+        with open(filename, 'r') as f:
+            cache = json.load(f)
+        if ( cache.get('version') == CACHE_VERSION and
+             cache.get('kind') == kind and
+             cache.get('stamp') == list(stamp) ):
+            definitions = cache['definitions']
+            log.debug(f'Using compiled definitions from {filename}')
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return definitions
+
+
+def write_cache(cfg, kind, stamp, definitions):
+    '''
+    Atomically write the compiled cache file, failures are ignored,
+    e.g. for a read only directory
+    '''
+    filename = cache_filename(cfg)
+    tmp = f'{filename}.{os.getpid()}.tmp'
+    cache = { 'version': CACHE_VERSION, 'kind': kind, 
+              'source': os.path.abspath(cfg), 'stamp': list(stamp),
+              'definitions': definitions }
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, filename)
+    except (OSError, TypeError, ValueError) as err:
+        log.debug(f'Unable to write definitions cache {filename}: {err}')
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return
+
+
+def load(cfg, kind):
+    '''
+    Load the parsed and compiled definitions from cfg, using the
+    in process cache, then the compiled cache file, before parsing
+    the YAML file
+
+    Parameters:
+        cfg (str): YAML filename
+        kind (str): Definition type [ policies, filters ]
+
+    Returns:
+        dict: data - parsed YAML, compiled - pre-computed rules
+
+    Raises:
+        FileNotFoundError, yaml.YAMLError
+    '''
+    path = os.path.abspath(cfg)
+    try:
+        st = os.stat(path)
+    except OSError:
+        log.error('No such file {}'.format(cfg))
+        raise FileNotFoundError(f'YAML policy file "{cfg}" not found.')
+    stamp = ( st.st_mtime_ns, st.st_size )
+
+    with _LOCK:
+        cached = _CACHE.get((path, kind))
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        definitions = read_cache(path, kind, stamp)
+        if definitions is None:
+            log.debug(f'Parsing {cfg}')
+            try:
+                with open(path, 'r') as f:
+                    data = yaml.safe_load(f)
+            except yaml.YAMLError as err:
+                log.error(err)
+                raise
+            definitions = { 'data': data, 
+                            'compiled': COMPILERS[kind](data) }
+            write_cache(path, kind, stamp, definitions)
+        _CACHE[(path, kind)] = ( stamp, definitions )
+
+    return definitions
+
+
+def clear():
+    '''
+    Clear the in process cache
+    '''
+    with _LOCK:
+        _CACHE.clear()
+
+    return
+
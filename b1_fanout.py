@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Multi-customer fan-out for the BloxOne automation demo
+
+    Runs the B1DDI and/or B1TD demo for many customers, taken from a
+    directory or glob of demo ini files and/or multiple [B1_POV*]
+    sections within an ini file, using a pool of processes. Each
+    customer logs to its own <customer>-<app>.log file and a combined
+    summary is logged once all customers are complete.
+
+ Requirements:
+   Python3 with concurrent.futures, glob and configparser modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import concurrent.futures
+import configparser
+import glob
+import logging
+import os
+import re
+import time
+import traceback
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+SECTION_PREFIX = 'B1_POV'
+
+
+def find_configs(paths):
+    '''
+    Expand directories, globs and filenames into a list of ini files
+
+    Parameters:
+        paths (list): Directories, glob patterns or ini filenames
+
+    Returns:
+        list: Sorted, de-duplicated list of ini filenames
+    '''
+    inifiles = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, '*.ini'))
+        else:
+            matches = glob.glob(path) or [ path ]
+        for match in sorted(matches):
+            if match not in inifiles:
+                inifiles.append(match)
+
+    return inifiles
+
+
+def find_sections(inifile):
+    '''
+    Names of the demo sections in inifile, i.e. those starting
+    with B1_POV, e.g. [B1_POV], [B1_POV_acme]
+
+    Parameters:
+        inifile (str): ini filename
+
+    Returns:
+        list: Section names
+    '''
+    cfg = configparser.ConfigParser()
+    try:
+        cfg.read(inifile)
+    except configparser.Error as err:
+        log.error(f'--- {inifile}: {err}')
+    
+    return [ s for s in cfg.sections() if s.startswith(SECTION_PREFIX) ]
+
+
+def find_jobs(paths, apps):
+    '''
+    Build the list of customer jobs
+
+    Parameters:
+        paths (list): Directories, glob patterns or ini filenames
+        apps (list): BloxOne Applications [ b1ddi, b1td ]
+
+    Returns:
+        list: (inifile, section, app) tuples
+    '''
+    jobs = []
+    for inifile in find_configs(paths):
+        sections = find_sections(inifile)
+        if not sections:
+            log.warning(f'--- No {SECTION_PREFIX} sections found in {inifile}')
+        for section in sections:
+            for app in apps:
+                jobs.append((inifile, section, app))
+
+    return jobs
+
+
+def customer_logger(filename, debug=False):
+    '''
+    Direct all logging in this process to filename
+
+    Parameters:
+        filename (str): Log filename
+        debug (bool): Enable debug messages
+    '''
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    handler = logging.FileHandler(filename, mode='w')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: '
+                                           '%(message)s'))
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+
+    return
+
+
+def exit_code(status):
+    '''
+    Convert an application result to a process exit code
+
+    Parameters:
+        status (int/bool): Exit code, or True/False for success/failure
+
+    Returns:
+        exitcode (int): 0 if successful
+    '''
+    if isinstance(status, bool) or status is None:
+        exitcode = 0 if status else 1
+    else:
+        exitcode = int(status)
+
+    return exitcode
+
+
+def run_customer(inifile, section, app, options):
+    '''
+    Run the demo for one customer, executed in a worker process
+
+    Parameters:
+        inifile (str): Demo ini filename
+        section (str): Demo section within inifile
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        options (dict): Run options from the command line: remove, ipv6,
+                        workers, backend, window, rate, http2, allocate,
+                        metrics, debug, logdir
+
+    Returns:
+        dict: Result summary for the customer
+    '''
+    import b1_metrics
+    import b1_ratelimit
+    import b1_transport
+    import bloxone_automation_tools as tools
+
+    result = { 'inifile': inifile, 'section': section, 'app': app,
+               'customer': '', 'exitcode': 1, 'seconds': 0, 'calls': 0,
+               'errors': 0, 'logfile': '', 'error': '' }
+    start_timer = time.perf_counter()
+
+    config = tools.read_demo_ini(inifile, app=app, section=section)
+    customer = config.get('customer') or section
+    result['customer'] = customer
+    name = re.sub(r'[^\w.-]+', '_', customer)
+    result['logfile'] = os.path.abspath(os.path.join(options.get('logdir', ''),
+                                                     f'{name}-{app}.log'))
+    customer_logger(result['logfile'], debug=options.get('debug'))
+    tools.log.setLevel(logging.DEBUG if options.get('debug') else logging.INFO)
+    tools.log.info(f'~~~~ Fan-out: {customer} {app} from {inifile} '
+                   f'[{section}] ~~~~')
+
+    # Per process state
+    b1_metrics.METRICS = b1_metrics.Metrics()
+    tools.GOVERNOR = b1_ratelimit.RateGovernor(rate=options.get('rate', 0),
+                                max_concurrency=options.get('workers', 1))
+    tools.TRANSPORT = b1_transport.Transport(pool_size=options.get('workers', 1),
+                                             http2=options.get('http2', False))
+    tools.ALLOCATION = options.get('allocate', 'client')
+    b1inifile = config.get('b1inifile') or inifile
+
+    try:
+        if not config:
+            tools.log.error(f'No config found in {inifile} [{section}]')
+            exitcode = 2
+        elif app == 'b1ddi':
+            exitcode = tools.b1ddi_automation_demo(b1inifile, 
+                                            config=config,
+                                            ipv6=options.get('ipv6', False),
+                                            remove=options.get('remove', False),
+                                            workers=options.get('workers', 1),
+                                            backend=options.get('backend', 
+                                                                'serial'),
+                                            window=options.get('window', 0))
+        else:
+            exitcode = tools.b1td_pov(b1inifile, config=config,
+                                      remove=options.get('remove', False),
+                                      workers=options.get('workers', 1))
+    except Exception as err:
+        tools.log.error(f'--- {customer} {app} failed: {err}')
+        tools.log.debug(traceback.format_exc())
+        result['error'] = str(err)
+        exitcode = 1
+
+    summary = b1_metrics.METRICS.summary()
+    b1_metrics.METRICS.log_summary(logger=tools.log)
+    tools.TRANSPORT.log_summary(logger=tools.log)
+    tools.TRANSPORT.close()
+    if options.get('metrics'):
+        stem, ext = os.path.splitext(options['metrics'])
+        b1_metrics.METRICS.export(f'{stem}-{name}-{app}{ext}')
+
+    result['exitcode'] = exit_code(exitcode)
+    result['calls'] = sum(e['count'] for e in summary['endpoints'])
+    result['errors'] = sum(e['count'] for e in summary['endpoints']
+                           if not 200 <= e['status'] < 300)
+    result['seconds'] = round(time.perf_counter() - start_timer, 3)
+
+    return result
+
+
+def log_results(results, elapsed):
+    '''
+    Log the combined summary table
+
+    Parameters:
+        results (list): Result dicts from run_customer()
+        elapsed (float): Wall time in seconds
+    '''
+    log.info('~~~~ Fan-out summary ~~~~')
+    log.info(f"{'Customer':<24}{'App':<7}{'Status':<8}{'Time (s)':>10}"
+             f"{'Calls':>8}{'Errors':>8}  Log")
+    for r in sorted(results, key=lambda r: (r['customer'], r['app'])):
+        status = 'OK' if r['exitcode'] == 0 else f"FAIL({r['exitcode']})"
+        log.info(f"{r['customer'][:23]:<24}{r['app']:<7}{status:<8}"
+                 f"{r['seconds']:>10.2f}{r['calls']:>8}{r['errors']:>8}  "
+                 f"{r['logfile']}")
+    failed = [ r for r in results if r['exitcode'] ]
+    slowest = max([ r['seconds'] for r in results ] or [ 0 ])
+    log.info(f'~~~~ {len(results) - len(failed)} of {len(results)} customer '
+             f'runs succeeded in {elapsed:0.2f}S (slowest {slowest:0.2f}S, '
+             f'sequential {sum(r["seconds"] for r in results):0.2f}S) ~~~~')
+    for r in failed:
+        log.warning(f"--- {r['customer']} {r['app']} failed, "
+                    f"see {r['logfile']} {r['error']}")
+
+    return
+
+
+def fan_out(paths, apps, processes=4, **options):
+    '''
+    Run the demo for every customer found in paths, at most processes
+    customers at a time
+
+    Parameters:
+        paths (list): Directories, glob patterns or ini filenames
+        apps (list): BloxOne Applications [ b1ddi, b1td ]
+        processes (int): Maximum number of concurrent customers
+        options: Run options passed to run_customer()
+
+    Returns:
+        exitcode (int): 0 if all customers succeeded
+    '''
+    exitcode = 0
+    results = []
+    jobs = find_jobs(paths, apps)
+    if not jobs:
+        log.error(f'No demo configs found in {" ".join(paths)}')
+        return 2
+
+    processes = max(1, min(processes, len(jobs)))
+    log.info(f'~~~~ Running {len(jobs)} customer demos using {processes} '
+             f'processes ~~~~')
+    start_timer = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {}
+        for inifile, section, app in jobs:
+            future = pool.submit(run_customer, inifile, section, app, options)
+            futures[future] = (inifile, section, app)
+        for future in concurrent.futures.as_completed(futures):
+            inifile, section, app = futures[future]
+            try:
+                result = future.result()
+            except Exception as err:
+                result = { 'inifile': inifile, 'section': section, 
+                           'app': app, 'customer': section, 'exitcode': 1,
+                           'seconds': 0, 'calls': 0, 'errors': 0,
+                           'logfile': '', 'error': str(err) }
+            results.append(result)
+            status = '+++' if result['exitcode'] == 0 else '---'
+            log.info(f"{status} {result['customer']} {app} completed in "
+                     f"{result['seconds']:0.2f}S ({len(results)}/{len(jobs)})")
+
+    log_results(results, time.perf_counter() - start_timer)
+    if any(r['exitcode'] for r in results):
+        exitcode = 1
+
+    return exitcode
+
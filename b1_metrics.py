@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    API call and phase metrics for the BloxOne automation tools
+
+    Records the endpoint, method, status, bytes sent and received and
+    latency of every API call made through an instrumented client, and
+    the wall time of each provisioning phase (IP space, subnets,
+    records, policy ...). Concurrent work in the same phase is counted
+    once. Results can be logged as a summary table or exported as JSON
+    or Prometheus text format.
+
+    Latencies are counted in a log scale histogram per endpoint, so 
+    memory use does not grow with the number of calls and p50/p99 are
+    within 1% of the exact values.
+
+ Requirements:
+   Python3 with threading module
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import contextlib
+import functools
+import json
+import logging
+import math
+import re
+import threading
+import time
+import urllib.parse
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+API_METHODS = { '_apiget': 'GET', '_apipost': 'POST', '_apidelete': 'DELETE',
+                '_apiput': 'PUT', '_apipatch': 'PATCH' }
+
+# Phase for objects created by path, used where calls are not wrapped
+# in an explicit phase
+OBJPATH_PHASES = { '/ipam/ip_space': 'ip_space',
+                   '/ipam/address_block': 'address_block',
+                   '/ipam/subnet': 'subnets',
+                   '/ipam/range': 'ranges',
+                   '/ipam/address': 'reservations',
+                   '/dns/view': 'view',
+                   '/dns/auth_zone': 'zones',
+                   '/dns/record': 'records',
+                   '/network_lists': 'network_list',
+                   '/named_lists': 'custom_lists',
+                   '/category_filters': 'filters',
+                   '/application_filters': 'filters',
+                   '/security_policies': 'policy' }
+
+# Latency histogram buckets are 2% wide, the midpoint of a bucket is
+# within 1% of any latency in it
+BUCKET_GROWTH = 1.02
+MIN_LATENCY = 1e-6
+
+ID_SEGMENT = re.compile(r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                        r'[0-9a-f]{4}-[0-9a-f]{12}|\d+)$|[^\w.-]')
+
+
+def endpoint(url):
+    '''
+    Normalise a request URL to an endpoint, removing the host, query
+    and object ids, e.g. /api/ddi/v1/ipam/subnet/{id}
+
+    Parameters:
+        url (str): Request URL
+
+    Returns:
+        str: endpoint
+    '''
+    path = urllib.parse.urlsplit(url).path
+    segments = [ '{id}' if ID_SEGMENT.search(s) else s
+                 for s in path.split('/') ]
+
+    return '/'.join(segments)
+
+
+def bucket(latency):
+    '''
+    Latency histogram bucket of a latency in seconds
+
+    Returns:
+        int: bucket index
+    '''
+    return math.floor(math.log(max(latency, MIN_LATENCY), BUCKET_GROWTH))
+
+
+def histogram_percentile(histogram, count, pct):
+    '''
+    Nearest rank percentile of a latency histogram
+
+    Parameters:
+        histogram (dict): Number of latencies keyed by bucket
+        count (int): Total number of latencies
+        pct (float): Percentile
+
+    Returns:
+        float: Latency in seconds, the midpoint of the bucket
+    '''
+    if not count:
+        return 0.0
+    rank = min(count, max(1, int(round(pct / 100 * count))))
+    seen = 0
+    for index in sorted(histogram):
+        seen += histogram[index]
+        if seen >= rank:
+            break
+
+    return BUCKET_GROWTH ** (index + 0.5)
+
+
+class Metrics:
+    '''
+    Thread safe collector of API call and phase metrics
+    '''
+
+    def __init__(self):
+        self.calls = {}
+        self.phases = {}
+        self.start = time.perf_counter()
+        self._active = {}
+        self._started = {}
+        self._lock = threading.Lock()
+
+        return
+
+
+    def record(self, method, url, status, sent, received, latency):
+        '''
+        Record an API call
+
+        Parameters:
+            method (str): HTTP method
+            url (str): Request URL or path
+            status (int): HTTP status code, 0 for connection errors
+            sent (int): Request body bytes
+            received (int): Response body bytes
+            latency (float): Seconds
+        '''
+        key = ( method, endpoint(url), status )
+        with self._lock:
+            stats = self.calls.get(key)
+            if stats is None:
+                stats = { 'count': 0, 'seconds': 0.0, 'sent': 0,
+                          'received': 0, 'max': 0.0, 'histogram': {} }
+                self.calls[key] = stats
+            stats['count'] += 1
+            stats['seconds'] += latency
+            stats['sent'] += sent
+            stats['received'] += received
+            stats['max'] = max(stats['max'], latency)
+            index = bucket(latency)
+            stats['histogram'][index] = stats['histogram'].get(index, 0) + 1
+
+        return
+
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''
+        Context manager timing a phase. Overlapping use from several 
+        threads or tasks is timed as the union of the intervals.
+
+        Parameters:
+            name (str): Phase name
+        '''
+        with self._lock:
+            if not self._active.get(name):
+                self._started[name] = time.perf_counter()
+            self._active[name] = self._active.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[name] -= 1
+                phase = self.phases.setdefault(name, { 'seconds': 0.0,
+                                                       'count': 0 })
+                phase['count'] += 1
+                if not self._active[name]:
+                    phase['seconds'] += ( time.perf_counter() 
+                                          - self._started[name] )
+
+        return
+
+
+    def summary(self):
+        '''
+        Summarise metrics
+
+        Returns:
+            dict: endpoints, phases and wall time
+        '''
+        endpoints = []
+        with self._lock:
+            for (method, path, status), stats in self.calls.items():
+                # Bucket midpoints can exceed the slowest call
+                p50, p99 = [ min(stats['max'], 
+                                 histogram_percentile(stats['histogram'],
+                                                      stats['count'], pct))
+                             for pct in [ 50, 99 ] ]
+                endpoints.append({ 'method': method,
+                                   'endpoint': path,
+                                   'status': status,
+                                   'count': stats['count'],
+                                   'seconds': round(stats['seconds'], 6),
+                                   'p50': round(p50, 6),
+                                   'p99': round(p99, 6),
+                                   'max': round(stats['max'], 6),
+                                   'bytes_sent': stats['sent'],
+                                   'bytes_received': stats['received'] })
+            phases = { name: { 'seconds': round(p['seconds'], 6),
+                               'count': p['count'] }
+                       for name, p in self.phases.items() }
+        endpoints.sort(key=lambda e: e['seconds'], reverse=True)
+
+        return { 'wall_seconds': round(time.perf_counter() - self.start, 6),
+                 'endpoints': endpoints,
+                 'phases': phases }
+
+
+    def log_summary(self, logger=None):
+        '''
+        Log a summary table of phases and endpoints
+
+        Parameters:
+            logger (obj): Logger to use, defaults to this module's
+        '''
+        log = logger or globals()['log']
+        summary = self.summary()
+        if not summary['endpoints']:
+            return
+        log.info("~~~~ API metrics ~~~~")
+        log.info(f"{'Phase':<20}{'Time (s)':>10}{'Count':>8}")
+        for name, phase in sorted(summary['phases'].items(),
+                                  key=lambda p: p[1]['seconds'], reverse=True):
+            log.info(f"{name:<20}{phase['seconds']:>10.2f}{phase['count']:>8}")
+        log.info(f"{'Method':<7}{'Endpoint':<44}{'Status':>7}{'Calls':>7}"
+                 f"{'Time (s)':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+                 f"{'KiB':>8}")
+        for e in summary['endpoints']:
+            kib = (e['bytes_sent'] + e['bytes_received']) / 1024
+            log.info(f"{e['method']:<7}{e['endpoint']:<44}{e['status']:>7}"
+                     f"{e['count']:>7}{e['seconds']:>10.2f}"
+                     f"{e['p50'] * 1000:>10.1f}{e['p99'] * 1000:>10.1f}"
+                     f"{kib:>8.1f}")
+        log.info(f"Total wall time {summary['wall_seconds']:0.2f}S")
+
+        return
+
+
+    def export(self, filename):
+        '''
+        Export metrics as Prometheus text format if filename ends in
+        .prom, otherwise as JSON
+
+        Parameters:
+            filename (str): Output filename
+        '''
+        summary = self.summary()
+        with open(filename, 'w') as f:
+            if filename.endswith('.prom'):
+                f.write(prometheus(summary))
+            else:
+                json.dump(summary, f, indent=2)
+        log.info(f'Metrics written to {filename}')
+
+        return
+
+
+def prometheus(summary):
+    '''
+    Format a metrics summary in the Prometheus text exposition format
+
+    Parameters:
+        summary (dict): Metrics.summary()
+
+    Returns:
+        str
+    '''
+    lines = []
+    metrics = [ ('b1_api_requests_total', 'counter', 
+                 'API requests', 'count'),
+                ('b1_api_request_seconds_total', 'counter',
+                 'Total API request latency in seconds', 'seconds'),
+                ('b1_api_request_bytes_sent_total', 'counter',
+                 'API request body bytes sent', 'bytes_sent'),
+                ('b1_api_request_bytes_received_total', 'counter',
+                 'API response body bytes received', 'bytes_received') ]
+    for name, type, help, key in metrics:
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {type}')
+        for e in summary['endpoints']:
+            lines.append(f'{name}{{method="{e["method"]}",'
+                         f'endpoint="{e["endpoint"]}",'
+                         f'status="{e["status"]}"}} {e[key]}')
+    name = 'b1_api_request_latency_seconds'
+    lines.append(f'# HELP {name} API request latency quantiles')
+    lines.append(f'# TYPE {name} gauge')
+    for e in summary['endpoints']:
+        for quantile, key in [ ('0.5', 'p50'), ('0.99', 'p99') ]:
+            lines.append(f'{name}{{method="{e["method"]}",'
+                         f'endpoint="{e["endpoint"]}",'
+                         f'status="{e["status"]}",'
+                         f'quantile="{quantile}"}} {e[key]}')
+    name = 'b1_phase_seconds'
+    lines.append(f'# HELP {name} Wall time per provisioning phase')
+    lines.append(f'# TYPE {name} gauge')
+    for phase, p in summary['phases'].items():
+        lines.append(f'{name}{{phase="{phase}"}} {p["seconds"]}')
+    lines.append('# HELP b1_wall_seconds Total wall time')
+    lines.append('# TYPE b1_wall_seconds gauge')
+    lines.append(f'b1_wall_seconds {summary["wall_seconds"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+# Default collector used by the automation tools
+METRICS = Metrics()
+
+
+def phase(name):
+    '''
+    Time a phase using the default collector
+    '''
+    return METRICS.phase(name)
+
+
+def timed_call(func, method, metrics, url, *args, **kwargs):
+    '''
+    Call an original bloxone _api* method and record the call
+    '''
+    body = args[0] if args else kwargs.get('body', '')
+    sent = len(body) if isinstance(body, (str, bytes)) else 0
+    start = time.perf_counter()
+    try:
+        response = func(url, *args, **kwargs)
+    except Exception:
+        metrics.record(method, url, 0, sent, 0, time.perf_counter() - start)
+        raise
+    metrics.record(method, url, response.status_code, sent,
+                   len(response.content or b''), time.perf_counter() - start)
+
+    return response
+
+
+def instrument(client, metrics=None):
+    '''
+    Wrap the low level API methods of a bloxone client to record
+    every call
+
+    Parameters:
+        client (obj): bloxone client object
+        metrics (obj): Metrics object, defaults to METRICS
+
+    Returns:
+        client (obj): The same client object
+    '''
+    metrics = metrics or METRICS
+    for name, method in API_METHODS.items():
+        func = getattr(client, name, None)
+        if func:
+            setattr(client, name,
+                    functools.partial(timed_call, func, method, metrics))
+
+    return client
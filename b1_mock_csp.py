@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Local mock of the BloxOne CSP APIs used by the automation tools,
+    for benchmarking and regression testing without a live tenant.
+
+    Implements the B1DDI (/api/ddi/v1), B1TD (/api/atcfw/v1), lookalike
+    (/api/tdlad/v1) and application catalog (/api/acs/v1/apps) endpoints
+    used by bloxone_automation_tools.py, with realistic ids, result(s)
+    envelopes, _filter/_tfilter/_fields/_limit/_offset support, duplicate (409)
+    detection, next available IP allocation on subnets and ranges and a 
+    configurable latency per request. Object counts and
+    request totals are available from /_mock/stats.
+
+    Usage:
+        ./b1_mock_csp.py --port 8080 --latency 0.05
+
+    Then point the url in the bloxone ini file at http://127.0.0.1:8080
+
+ Requirements:
+   Python3 with http.server and yaml modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import argparse
+import datetime
+import hashlib
+import http.server
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+import yaml
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+# Collections and the key used to detect duplicates
+DDI_COLLECTIONS = { 'ipam/ip_space': 'name',
+                    'ipam/address_block': 'address',
+                    'ipam/subnet': 'address',
+                    'ipam/range': 'start',
+                    'ipam/address': 'address',
+                    'dns/view': 'name',
+                    'dns/auth_zone': 'fqdn',
+                    'dns/auth_nsg': 'name',
+                    'dns/record': None }
+TD_COLLECTIONS = [ 'network_lists', 'named_lists', 'security_policies',
+                   'category_filters', 'application_filters' ]
+
+# Objects removed when their parent is deleted
+PARENT_KEYS = [ 'space', 'view', 'zone' ]
+
+DEFAULT_APPS = [ 'Microsoft 365', 'Facebook', 'TikTok', 'Dropbox',
+                 'Google Drive', 'iCloud', 'WeTransfer', 'Microsoft OneDrive' ]
+
+
+class MockCSP:
+    '''
+    In memory object store implementing the BloxOne API semantics
+    used by the automation tools
+    '''
+
+    def __init__(self, latency=0.0, jitter=0.0, nsgs=[], apps=[]):
+        '''
+        Parameters:
+            latency (float): Added latency per request in seconds
+            jitter (float): Random +/- variation of latency in seconds
+            nsgs (list): Names of DNS server groups to pre-create
+            apps (list): Application catalog names
+        '''
+        self.latency = latency
+        self.jitter = jitter
+        self.objects = { c: {} for c in
+                         list(DDI_COLLECTIONS.keys()) + TD_COLLECTIONS }
+        self.apps = apps or DEFAULT_APPS
+        self.lookalikes = []
+        self.requests = 0
+        self.created = 0
+        self.deleted = 0
+        self._unique = { c: {} for c in self.objects.keys() }
+        self._children = {}
+        self._td_ids = itertools.count(100001)
+        self._lock = threading.RLock()
+
+        for nsg in nsgs:
+            self.add('dns/auth_nsg', { 'name': nsg })
+
+        return
+
+
+    def delay(self):
+        '''
+        Simulate network and API latency
+        '''
+        wait = self.latency
+        if self.jitter:
+            wait += random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+        return
+
+
+    def unique_key(self, collection, body):
+        '''
+        Key used to detect duplicate objects in a collection
+        '''
+        if collection in DDI_COLLECTIONS:
+            key = DDI_COLLECTIONS[collection]
+            if key:
+                unique = ( body.get(key), body.get('space'), body.get('view') )
+            else:
+                unique = ( body.get('zone'), body.get('name_in_zone'),
+                           json.dumps(body.get('rdata'), sort_keys=True) )
+        else:
+            unique = body.get('name')
+
+        return unique
+
+
+    def add(self, collection, body):
+        '''
+        Add an object to a collection
+
+        Returns:
+            tuple: (status code, object or error message)
+        '''
+        unique = self.unique_key(collection, body)
+        with self._lock:
+            if unique in self._unique[collection]:
+                return 409, f'{collection} {unique} already exists'
+            if collection in DDI_COLLECTIONS:
+                id = f'{collection}/{uuid.uuid4()}'
+            else:
+                id = next(self._td_ids)
+
+            now = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            obj = dict(body, id=id, created_at=now, updated_at=now)
+            self.objects[collection][str(id)] = obj
+            self._unique[collection][unique] = str(id)
+            for key in PARENT_KEYS:
+                if obj.get(key):
+                    self._children.setdefault(obj[key], set()).add(
+                        (collection, str(id)))
+            self.created += 1
+
+        return 201, obj
+
+
+    def remove(self, collection, id):
+        '''
+        Remove an object and any children referencing it
+
+        Returns:
+            bool: True if the object existed
+        '''
+        with self._lock:
+            obj = self.objects[collection].pop(str(id), None)
+            if obj is None:
+                return False
+            self._unique[collection].pop(self.unique_key(collection, obj), None)
+            self.deleted += 1
+            for child_collection, child_id in self._children.pop(str(id), []):
+                self.remove(child_collection, child_id)
+
+        return True
+
+
+    def next_available_ip(self, collection, id, count=1):
+        '''
+        Allocate count free addresses from a subnet or range, as for 
+        POST /ipam/subnet/{id}/nextavailableip. Subnet allocations skip
+        the addresses of any ranges in the subnet.
+
+        Returns:
+            tuple: (status code, list of address objects or error message)
+        '''
+        with self._lock:
+            parent = self.objects[collection].get(id)
+            if parent is None:
+                return 404, f'{id} not found'
+            space = parent.get('space')
+            if collection == 'ipam/subnet':
+                network = ipaddress.ip_network(
+                    f"{parent['address']}/{parent['cidr']}", strict=False)
+                first = network.network_address + 1
+                last = network.broadcast_address
+                if network.version == 4:
+                    last -= 1
+                ranges = []
+                for r in self.objects['ipam/range'].values():
+                    start = ipaddress.ip_address(r['start'])
+                    if r.get('space') == space and start in network:
+                        ranges.append((start, ipaddress.ip_address(r['end'])))
+            else:
+                first = ipaddress.ip_address(parent['start'])
+                last = ipaddress.ip_address(parent['end'])
+                ranges = []
+            used = { a['address'] for a in self.objects['ipam/address'].values()
+                     if a.get('space') == space }
+
+            addresses = []
+            address = first
+            while len(addresses) < count and address <= last:
+                in_range = [ end for start, end in ranges 
+                             if start <= address <= end ]
+                if in_range:
+                    address = max(in_range) + 1
+                    continue
+                if str(address) not in used:
+                    addresses.append(str(address))
+                address += 1
+            if len(addresses) < count:
+                return 409, f'Only {len(addresses)} addresses available in {id}'
+
+            results = []
+            for address in addresses:
+                code, obj = self.add('ipam/address', 
+                                     { 'address': address, 'space': space })
+                results.append(obj)
+
+        return 201, results
+
+
+    def query(self, collection, params):
+        '''
+        List objects applying _filter, _tfilter, _fields, _limit and _offset
+
+        Returns:
+            list of dict
+        '''
+        with self._lock:
+            results = list(self.objects[collection].values())
+        filter = params.get('_filter', '')
+        for key, value in re.findall(r'(\w+)\s*==\s*[\'"]([^\'"]*)[\'"]',
+                                     filter):
+            results = [ o for o in results if str(o.get(key)) == value ]
+        tfilter = params.get('_tfilter', '')
+        for key, value in re.findall(r'(\w+)\s*==\s*[\'"]([^\'"]*)[\'"]',
+                                     tfilter):
+            results = [ o for o in results 
+                        if str((o.get('tags') or {}).get(key)) == value ]
+        offset = int(params.get('_offset', 0))
+        if '_limit' in params:
+            results = results[offset:offset + int(params['_limit'])]
+        elif offset:
+            results = results[offset:]
+        if params.get('_fields'):
+            fields = params['_fields'].split(',')
+            results = [ { k: o.get(k) for k in fields if k in o }
+                        for o in results ]
+
+        return results
+
+
+    def stats(self):
+        '''
+        Object counts and request totals
+        '''
+        with self._lock:
+            stats = { 'requests': self.requests,
+                      'created': self.created,
+                      'deleted': self.deleted,
+                      'objects': { c: len(s) for c, s in self.objects.items()
+                                   if s } }
+
+        return stats
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    HTTP/1.1 keep-alive request handler for MockCSP
+    '''
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockCSP/' + __version__
+    # Headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+    def send_json(self, code, data=None, headers={}):
+        payload = json.dumps(data).encode() if data is not None else b''
+        self.send_response(code)
+        if payload:
+            self.send_header('Content-Type', 'application/json')
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+        return
+
+
+    def send_error_json(self, code, message):
+        self.send_json(code, { 'error': [ { 'message': message } ] })
+
+        return
+
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = {}
+        if length:
+            raw = self.rfile.read(length)
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                body = None
+
+        return body
+
+
+    def route(self):
+        '''
+        Split the request path into api, collection and id
+
+        Returns:
+            tuple: (api, collection, id, params)
+        '''
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        path = urllib.parse.unquote(url.path).strip('/').split('/')
+        api = ''
+        collection = ''
+        id = ''
+        if len(path) > 2 and path[0] == 'api':
+            api = path[1]
+            rest = path[3:]
+            if api == 'ddi' and len(rest) >= 2:
+                collection = '/'.join(rest[:2])
+                id = '/'.join(rest[2:])
+            elif rest:
+                collection = rest[0]
+                id = '/'.join(rest[1:])
+
+        return api, collection, id, params
+
+
+    def handle_request(self, method):
+        '''
+        Dispatch a request
+        '''
+        mock = self.server.mock
+        body = self.read_body()
+        with mock._lock:
+            mock.requests += 1
+
+        if self.path.startswith('/_mock/stats'):
+            return self.send_json(200, mock.stats())
+
+        mock.delay()
+        if not self.headers.get('Authorization'):
+            return self.send_error_json(401, 'Missing Authorization header')
+        if body is None:
+            return self.send_error_json(400, 'Invalid JSON body')
+
+        api, collection, id, params = self.route()
+        if api == 'acs' and collection == 'apps' and method == 'GET':
+            # Supports conditional requests using the ETag
+            etag = '"' + hashlib.sha1('\n'.join(mock.apps).encode()).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                return self.send_json(304, headers={ 'ETag': etag })
+            apps = [ { 'name': a } for a in mock.apps ]
+            return self.send_json(200, { 'results': apps }, 
+                                  headers={ 'ETag': etag })
+        if api == 'tdlad' and collection == 'lookalike_targets':
+            return self.lookalike_targets(method, body)
+        if ( (api == 'ddi' and collection in DDI_COLLECTIONS) or
+             (api == 'atcfw' and collection in TD_COLLECTIONS) ):
+            return self.collection(method, api, collection, id, params, body)
+
+        return self.send_error_json(404, f'Unknown path {self.path}')
+
+
+    def collection(self, method, api, collection, id, params, body):
+        '''
+        Handle CRUD for a collection
+        '''
+        mock = self.server.mock
+        envelope = 'result' if api == 'ddi' else 'results'
+        full_id = f'{collection}/{id}' if api == 'ddi' and id else id
+
+        if method == 'GET':
+            if id:
+                obj = mock.objects[collection].get(full_id)
+                if obj is None:
+                    return self.send_error_json(404, f'{full_id} not found')
+                return self.send_json(200, { envelope: obj })
+            return self.send_json(200,
+                                  { 'results': mock.query(collection, params) })
+
+        if method == 'POST' and id.endswith('/nextavailableip'):
+            code, result = mock.next_available_ip(collection, 
+                                                  full_id.rsplit('/', 1)[0],
+                                                  int(params.get('count', 1)))
+            if code != 201:
+                return self.send_error_json(code, result)
+            return self.send_json(201, { 'results': result })
+
+        if method == 'POST' and not id:
+            code, obj = mock.add(collection, body)
+            if code != 201:
+                return self.send_error_json(code, obj)
+            return self.send_json(201, { envelope: obj })
+
+        if method in [ 'PUT', 'PATCH' ] and id:
+            with mock._lock:
+                obj = mock.objects[collection].get(full_id)
+                if obj is None:
+                    return self.send_error_json(404, f'{full_id} not found')
+                # Named list items are added and removed using PATCH
+                inserted = body.pop('inserted_items_described', None) or []
+                deleted = body.pop('deleted_items_described', None) or []
+                if inserted or deleted:
+                    items = dict.fromkeys(obj.get('items') or [])
+                    items.update(dict.fromkeys(i.get('item') for i in inserted))
+                    for i in deleted:
+                        items.pop(i.get('item'), None)
+                    obj['items'] = list(items)
+                obj.update(body)
+            return self.send_json(200, { envelope: obj })
+
+        if method == 'DELETE':
+            ids = [ full_id ] if id else [ str(i) for i in body.get('ids', []) ]
+            if not ids:
+                return self.send_error_json(400, 'No ids to delete')
+            found = [ i for i in ids if mock.remove(collection, i) ]
+            if not found:
+                return self.send_error_json(404, f'{ids} not found')
+            return self.send_json(204)
+
+        return self.send_error_json(405, f'{method} not supported')
+
+
+    def lookalike_targets(self, method, body):
+        '''
+        Handle the lookalike targets singleton
+        '''
+        mock = self.server.mock
+        if method == 'GET':
+            targets = { 'items': [ t['item'] for t in mock.lookalikes ],
+                        'items_described': mock.lookalikes }
+            return self.send_json(200, { 'results': targets })
+        if method == 'PUT' and isinstance(body, dict):
+            with mock._lock:
+                mock.lookalikes = list(body.get('items_described', []))
+            return self.send_json(200, { 'results': body })
+
+        return self.send_error_json(400, 'Invalid lookalike targets request')
+
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+
+def load_apps(cfg='filters.yml'):
+    '''
+    Build an application catalog including the apps in filters.yml,
+    so that the application filters resolve as they would in a tenant
+
+    Parameters:
+        cfg (str): filters YAML filename
+
+    Returns:
+        list of app names
+    '''
+    apps = list(DEFAULT_APPS)
+    if os.path.isfile(cfg):
+        with open(cfg, 'r') as f:
+            filters = yaml.safe_load(f) or {}
+        for filter in filters.get('application_filters', []):
+            for app in filter.get('apps', []):
+                if app not in apps:
+                    apps.append(app)
+
+    return apps
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 nsgs=[ 'b1ddi-auto-demo' ], apps=[]):
+    '''
+    Start the mock server in a background thread
+
+    Parameters:
+        host (str): Listen address
+        port (int): Listen port, 0 for any free port
+        latency (float): Added latency per request in seconds
+        jitter (float): Random +/- variation of latency in seconds
+        nsgs (list): Names of DNS server groups to pre-create
+        apps (list): Application catalog names
+
+    Returns:
+        server (obj): ThreadingHTTPServer with a mock attribute and
+                      url of the server
+    '''
+    server = http.server.ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.mock = MockCSP(latency=latency, jitter=jitter, nsgs=nsgs,
+                          apps=apps or load_apps())
+    server.url = f'http://{host}:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Parameters:
+        None
+
+    Returns:
+        Returns parsed arguments
+    '''
+    parse = argparse.ArgumentParser(description='Mock BloxOne CSP server')
+    parse.add_argument('--host', type=str, default='127.0.0.1',
+                        help="Listen address")
+    parse.add_argument('-p', '--port', type=int, default=8080,
+                        help="Listen port, 0 for any free port")
+    parse.add_argument('-l', '--latency', type=float, default=0.0,
+                        help="Added latency per request in seconds")
+    parse.add_argument('-j', '--jitter', type=float, default=0.0,
+                        help="Random +/- variation of latency in seconds")
+    parse.add_argument('-n', '--nsg', type=str, action='append',
+                        help="DNS server group to create "
+                             "(default b1ddi-auto-demo)")
+    parse.add_argument('-d', '--debug', action='store_true',
+                        help="Enable debug messages")
+
+    return parse.parse_args()
+
+
+def main():
+    '''
+    Core Logic
+    '''
+    args = parseargs()
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    server = start_server(host=args.host, port=args.port,
+                          latency=args.latency, jitter=args.jitter,
+                          nsgs=args.nsg or [ 'b1ddi-auto-demo' ])
+    # First line of output is used by the benchmarks to find the port
+    print(f'Listening on {server.url}', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+    return 0
+
+
+### Main ###
+if __name__ == '__main__':
+    exitcode = main()
+    exit(exitcode)
+## End Main ###
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Address planner for the BloxOne DDI automation demo
+
+    Computes subnets, DHCP range boundaries, IP reservations and DNS
+    record addresses using integer offsets from the network address.
+    Nothing is materialised, so memory use is independent of the size
+    of the address block or subnets for both IPv4 and IPv6.
+
+ Requirements:
+   Python3 with ipaddress module
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import ipaddress
+
+
+def subnet_count(container, prefixlen):
+    '''
+    Number of subnets of prefixlen that fit in container
+
+    Parameters:
+        container (obj): ipaddress network object
+        prefixlen (int): Subnet prefix length
+
+    Returns:
+        int: Number of subnets (0 if prefixlen is shorter than container)
+    '''
+    if prefixlen < container.prefixlen:
+        count = 0
+    else:
+        count = 1 << (prefixlen - container.prefixlen)
+
+    return count
+
+
+def nth_subnet(container, prefixlen, index):
+    '''
+    Return the index'th subnet of prefixlen within container
+
+    Parameters:
+        container (obj): ipaddress network object
+        prefixlen (int): Subnet prefix length
+        index (int): Zero based subnet index
+
+    Returns:
+        ipaddress network object
+
+    Raises:
+        IndexError
+    '''
+    if not 0 <= index < subnet_count(container, prefixlen):
+        raise IndexError(f'Subnet index {index} outside of {container}')
+    size = 1 << (container.max_prefixlen - prefixlen)
+    address = int(container.network_address) + (index * size)
+
+    return ipaddress.ip_network((address, prefixlen))
+
+
+def iter_subnets(container, prefixlen, count=None, start=0):
+    '''
+    Lazily yield subnets of prefixlen within container
+
+    Parameters:
+        container (obj): ipaddress network object
+        prefixlen (int): Subnet prefix length
+        count (int): Maximum number of subnets, None for all
+        start (int): Index of first subnet
+
+    Yields:
+        ipaddress network objects
+    '''
+    available = subnet_count(container, prefixlen) - start
+    if count is None or count > available:
+        count = max(available, 0)
+    size = 1 << (container.max_prefixlen - prefixlen)
+    address = int(container.network_address) + (start * size)
+    for n in range(count):
+        yield ipaddress.ip_network((address, prefixlen))
+        address += size
+
+    return
+
+
+def dhcp_range(network):
+    '''
+    Calculate DHCP range boundaries for the network. For IPv4 the range
+    is the top half of the subnet, for IPv6 it starts at ::ffff.
+
+    Parameters:
+        network (obj): ipaddress network object
+
+    Returns:
+        tuple: (start, end) ipaddress address objects
+    '''
+    broadcast = network.broadcast_address
+    if network.version == 6:
+        start = network.network_address + 0xffff
+    else:
+        start = broadcast - (int(network.num_addresses / 2) + 1)
+    end = broadcast - 1
+
+    return start, end
+
+
+def reservation_count(network, no_of_ips):
+    '''
+    Number of IP reservations for the network, limited to a
+    quarter of the subnet
+
+    Parameters:
+        network (obj): ipaddress network object
+        no_of_ips (int): Configured number of IPs
+
+    Returns:
+        int: Number of IPs
+    '''
+    limit = int(int(network.num_addresses / 2) / 2)
+
+    return min(int(no_of_ips), limit)
+
+
+def iter_reservations(network, no_of_ips):
+    '''
+    Lazily yield IP reservation addresses for the network. IPv4
+    reservations start at the second host address, IPv6 at the first.
+
+    Parameters:
+        network (obj): ipaddress network object
+        no_of_ips (int): Configured number of IPs
+
+    Yields:
+        ipaddress address objects
+    '''
+    if network.version == 6:
+        first = 1
+    else:
+        first = 2
+    yield from iter_hosts(network, reservation_total(network, no_of_ips), 
+                          first=first)
+
+    return
+
+
+def reservation_total(network, no_of_ips):
+    '''
+    Number of addresses yielded by iter_reservations(), IPv4 excludes
+    the first host address
+
+    Parameters:
+        network (obj): ipaddress network object
+        no_of_ips (int): Configured number of IPs
+
+    Returns:
+        int: Number of reservations
+    '''
+    count = reservation_count(network, no_of_ips)
+    if network.version == 4:
+        count -= 1
+
+    return max(count, 0)
+
+
+def iter_hosts(network, count, first=1):
+    '''
+    Lazily yield count addresses starting at offset first from the
+    network address, without passing the last usable address
+
+    Parameters:
+        network (obj): ipaddress network object
+        count (int): Number of addresses
+        first (int): Offset of first address
+
+    Yields:
+        ipaddress address objects
+    '''
+    last = network.num_addresses - 2
+    if network.version == 6 or network.prefixlen >= network.max_prefixlen - 1:
+        last = network.num_addresses - 1
+    count = max(min(count, last - first + 1), 0)
+    address = network.network_address + first
+    for n in range(count):
+        yield address
+        address += 1
+
+    return
+
+
+def reverse_network(address):
+    '''
+    IPv4 network covered by the /16 in-addr.arpa zone created for
+    address, e.g. 192.168.0.0 -> 192.168.0.0/16 (168.192.in-addr.arpa)
+
+    Parameters:
+        address (str): IPv4 base network address
+
+    Returns:
+        ipaddress.IPv4Network
+    '''
+    return ipaddress.ip_network(f'{address}/16', strict=False)
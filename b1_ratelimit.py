@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Client side rate governor for the BloxOne APIs
+
+    Wraps the low level _apiget/_apipost/_apidelete/_apiput/_apipatch
+    methods of bloxone client objects with:
+        - a token bucket per API family (ddi, atcfw, tdlad, ...)
+        - an AIMD concurrency limit per family, increased additively on
+          success and halved on a 429
+        - retries honouring Retry-After, otherwise jittered exponential
+          backoff, for 429, 502, 503, 504 and connection errors
+        - POST and PATCH requests, which may already have been applied,
+          only retried on a 429 or a connection error
+
+ Requirements:
+   Python3 with threading and requests modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import datetime
+import email.utils
+import functools
+import logging
+import random
+import threading
+import time
+import urllib.parse
+import requests
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+RETRY_CODES = [ 429, 502, 503, 504 ]
+IDEMPOTENT_METHODS = [ 'GET', 'HEAD', 'PUT', 'DELETE' ]
+API_METHODS = [ '_apiget', '_apipost', '_apidelete', '_apiput', '_apipatch' ]
+
+
+class TokenBucket:
+    '''
+    Thread safe token bucket
+    '''
+
+    def __init__(self, rate=0, burst=0):
+        '''
+        Parameters:
+            rate (float): Tokens per second, 0 for unlimited
+            burst (int): Bucket size, defaults to rate
+        '''
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        return
+
+
+    def take(self):
+        '''
+        Take a token without blocking
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds to wait
+        '''
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+
+        return (1 - self.tokens) / self.rate
+
+
+    def acquire(self):
+        '''
+        Block until a token is available
+        '''
+        wait = self.take()
+        while wait:
+            time.sleep(wait)
+            wait = self.take()
+
+        return
+
+
+class AIMDLimiter:
+    '''
+    Concurrency limit adjusted using additive increase and
+    multiplicative decrease
+    '''
+
+    def __init__(self, limit=1, max_limit=1):
+        '''
+        Parameters:
+            limit (int): Initial concurrency limit
+            max_limit (int): Maximum concurrency limit
+        '''
+        self.max_limit = max(max_limit, 1)
+        self.limit = float(min(max(limit, 1), self.max_limit))
+        self.in_flight = 0
+        # Time of the last decrease, the start of the congestion epoch
+        self.decreased = 0.0
+        self._cond = threading.Condition()
+
+        return
+
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+        return
+
+
+    def try_acquire(self):
+        '''
+        Take a slot without blocking
+
+        Returns:
+            bool: True if a slot was taken
+        '''
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+
+        return True
+
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+        return
+
+
+    def increase(self):
+        '''
+        Additive increase, approximately one per limit successes
+        '''
+        with self._cond:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self._cond.notify()
+
+        return
+
+
+    def decrease(self, started=None):
+        '''
+        Multiplicative decrease, halve the limit at most once per 
+        congestion epoch: a 429 for a request started before the last
+        decrease is part of the same burst and is ignored
+
+        Parameters:
+            started (float): time.monotonic() when the request was sent
+        '''
+        with self._cond:
+            if started is None or started >= self.decreased:
+                self.limit = max(1.0, self.limit / 2)
+                self.decreased = time.monotonic()
+                log.debug(f'Concurrency limit reduced to {int(self.limit)}')
+
+        return
+
+
+class RateGovernor:
+    '''
+    Shared rate governor for all bloxone client objects
+    '''
+
+    def __init__(self, rate=0, burst=0, max_concurrency=1, max_retries=5,
+                 base_delay=0.5, max_delay=60):
+        '''
+        Parameters:
+            rate (float): Requests per second per API family, 0 unlimited
+            burst (int): Token bucket size
+            max_concurrency (int): Maximum concurrent requests per family
+            max_retries (int): Maximum retries per request
+            base_delay (float): Initial backoff in seconds
+            max_delay (float): Maximum backoff in seconds
+        '''
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.throttled = 0
+        self._families = {}
+        self._lock = threading.Lock()
+
+        return
+
+
+    def family(self, url):
+        '''
+        Return the token bucket and limiter for the API family of url,
+        e.g. https://csp.infoblox.com/api/ddi/v1/ipam/subnet -> ddi
+
+        Returns:
+            tuple: (TokenBucket, AIMDLimiter)
+        '''
+        path = urllib.parse.urlsplit(url).path.strip('/').split('/')
+        if path and path[0] == 'api' and len(path) > 1:
+            name = path[1]
+        else:
+            name = path[0] if path else ''
+        with self._lock:
+            if name not in self._families:
+                self._families[name] = ( TokenBucket(self.rate, self.burst),
+                                         AIMDLimiter(self.max_concurrency,
+                                                     self.max_concurrency) )
+
+        return self._families[name]
+
+
+    def delay(self, attempt, response=None):
+        '''
+        Seconds to wait before retrying, using Retry-After if present
+        otherwise exponential backoff with full jitter
+
+        Parameters:
+            attempt (int): Retry attempt, starting at 0
+            response (obj): Response object
+
+        Returns:
+            float: delay in seconds
+        '''
+        delay = None
+        if response is not None:
+            retry_after = ( response.headers.get('Retry-After') or
+                            response.headers.get('retry-after') )
+            if retry_after:
+                try:
+                    delay = float(retry_after)
+                except ValueError:
+                    delay = retry_after_date(retry_after)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay,
+                                          self.base_delay * (2 ** attempt)))
+
+        return max(0, min(delay, self.max_delay))
+
+
+    def request(self, func, url, *args, method='GET', **kwargs):
+        '''
+        Make a governed API call
+
+        Parameters:
+            func (method): Original bloxone _api* method
+            url (str): Request URL
+            method (str): HTTP method, used to decide what can be retried
+
+        Returns:
+            response object
+        '''
+        bucket, limiter = self.family(url)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = func(url, *args, **kwargs)
+            except requests.exceptions.Timeout as err:
+                # A read timeout may leave the object created
+                if ( attempt >= self.max_retries or
+                     not ( method in IDEMPOTENT_METHODS or
+                           isinstance(err, requests.exceptions.ConnectTimeout) ) ):
+                    raise
+                response = None
+            except requests.exceptions.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                response = None
+            finally:
+                limiter.release()
+
+            if ( response is not None and 
+                 not retryable(method, response.status_code) ):
+                if response.status_code not in RETRY_CODES:
+                    limiter.increase()
+                break
+            if response is not None and response.status_code == 429:
+                limiter.decrease(started)
+                self.throttled += 1
+            if attempt >= self.max_retries:
+                log.warning(f'--- Giving up after {attempt} retries: {url}')
+                break
+
+            wait = self.delay(attempt, response)
+            status = response.status_code if response is not None else 'error'
+            log.debug(f'Retrying {url} in {wait:0.2f}S ({status})')
+            self.retries += 1
+            attempt += 1
+            time.sleep(wait)
+
+        return response
+
+
+def retry_after_date(retry_after):
+    '''
+    Seconds until a Retry-After HTTP date, dates without a timezone 
+    are treated as UTC
+
+    Parameters:
+        retry_after (str): Retry-After header value
+
+    Returns:
+        float: seconds, or None if the value is not a valid date
+    '''
+    try:
+        date = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+
+    return date.timestamp() - time.time()
+
+
+def retryable(method, status_code):
+    '''
+    Check whether a response should be retried. Only throttled (429)
+    requests are retried for methods that create or change objects,
+    a 502, 503 or 504 may be returned after the change was made
+
+    Parameters:
+        method (str): HTTP method
+        status_code (int): Response status code
+
+    Returns:
+        bool
+    '''
+    if method.upper() in IDEMPOTENT_METHODS:
+        status = status_code in RETRY_CODES
+    else:
+        status = status_code == 429
+
+    return status
+
+
+def govern(client, governor):
+    '''
+    Wrap the low level API methods of a bloxone client with the governor
+
+    Parameters:
+        client (obj): bloxone client object
+        governor (obj): RateGovernor object
+
+    Returns:
+        client (obj): The same client object
+    '''
+    for method in API_METHODS:
+        func = getattr(client, method, None)
+        if func:
+            setattr(client, method,
+                    functools.partial(governor.request, func,
+                                      method=method[4:].upper()))
+
+    return client
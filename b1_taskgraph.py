@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Dependency graph task scheduler
+
+    Each task declares the tasks it requires, which must succeed, and
+    the tasks it must run after, which only need to have finished.
+    Independent branches are run concurrently on a thread pool so the
+    total time approaches the longest dependency chain. Per task timings
+    and the critical path are logged once complete.
+
+ Requirements:
+   Python3 with concurrent.futures module
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import concurrent.futures
+import logging
+import time
+import traceback
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+DONE = [ 'ok', 'failed', 'skipped' ]
+
+
+class Task:
+    '''
+    A single step in a TaskGraph
+    '''
+
+    def __init__(self, name, func, args=(), kwargs={}, requires=(), 
+                 after=()):
+        '''
+        Parameters:
+            name (str): Task name
+            func (function): Function to call
+            args (tuple): Positional arguments for func
+            kwargs (dict): Keyword arguments for func
+            requires (list): Names of tasks that must succeed first
+            after (list): Names of tasks that must finish first
+        '''
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.requires = list(requires)
+        self.after = list(after)
+        self.status = 'pending'
+        self.result = None
+        self.start = 0.0
+        self.end = 0.0
+
+        return
+
+
+    @property
+    def depends(self):
+        return self.requires + self.after
+
+
+    @property
+    def seconds(self):
+        return max(self.end - self.start, 0.0)
+
+
+class TaskGraph:
+    '''
+    Run tasks concurrently in dependency order
+    '''
+
+    def __init__(self, name='tasks'):
+        '''
+        Parameters:
+            name (str): Name used when logging
+        '''
+        self.name = name
+        self.tasks = {}
+        self.wall = 0.0
+        self._start = 0.0
+
+        return
+
+
+    def add(self, name, func, *args, requires=(), after=(), **kwargs):
+        '''
+        Add a task, dependencies must already have been added so the 
+        graph is always acyclic
+
+        Parameters:
+            name (str): Unique task name
+            func (function): Function to call with *args and **kwargs,
+                             the task fails if it raises an exception
+                             or returns False or None
+            requires (list): Names of tasks that must succeed first, 
+                             the task is skipped if any fail
+            after (list): Names of tasks that must finish first,
+                          whether or not they succeed
+
+        Returns:
+            Task object
+
+        Raises:
+            ValueError
+        '''
+        if name in self.tasks:
+            raise ValueError(f'Task {name} already defined')
+        for dep in list(requires) + list(after):
+            if dep not in self.tasks:
+                raise ValueError(f'Task {name} depends on unknown task {dep}')
+        task = Task(name, func, args, kwargs, requires, after)
+        self.tasks[name] = task
+
+        return task
+
+
+    def result(self, name):
+        '''
+        Return value of a completed task, None if it did not succeed
+        '''
+        task = self.tasks.get(name)
+        return task.result if task and task.status == 'ok' else None
+
+
+    def _run(self, task):
+        '''
+        Execute a task, recording the timings and status
+        '''
+        task.start = time.perf_counter() - self._start
+        try:
+            task.result = task.func(*task.args, **task.kwargs)
+            if task.result is None or task.result is False:
+                task.status = 'failed'
+            else:
+                task.status = 'ok'
+        except Exception as err:
+            log.error(f'--- Task {task.name} raised {err!r}')
+            log.debug(traceback.format_exc())
+            task.status = 'failed'
+        task.end = time.perf_counter() - self._start
+
+        return task
+
+
+    def run(self, workers=1):
+        '''
+        Run all tasks, at most workers at a time, starting each as soon
+        as its dependencies have finished
+
+        Parameters:
+            workers (int): Maximum number of concurrent tasks
+
+        Returns:
+            bool: True if all tasks succeeded
+        '''
+        pending = list(self.tasks.values())
+        running = set()
+        self._start = time.perf_counter()
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(workers, 1)) as pool:
+            while pending or running:
+                for task in list(pending):
+                    if any(self.tasks[d].status not in DONE 
+                           for d in task.depends):
+                        continue
+                    pending.remove(task)
+                    failed = [ d for d in task.requires 
+                               if self.tasks[d].status != 'ok' ]
+                    if failed:
+                        log.warning(f'--- Skipping {task.name}, '
+                                    f'{", ".join(failed)} not completed')
+                        task.status = 'skipped'
+                    else:
+                        log.debug(f'Starting task {task.name}')
+                        running.add(pool.submit(self._run, task))
+                if running:
+                    done, running = concurrent.futures.wait(running,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+
+        self.wall = time.perf_counter() - self._start
+
+        return all(t.status == 'ok' for t in self.tasks.values())
+
+
+    def critical_path(self):
+        '''
+        Longest chain of dependent tasks by run time, the lower bound
+        on the wall time with unlimited workers
+
+        Returns:
+            tuple: (list of task names, seconds)
+        '''
+        longest = {}
+        for task in self.tasks.values():
+            # Tasks are added after their dependencies
+            prev = max(task.depends, key=lambda d: longest[d][1], default=None)
+            path, seconds = longest[prev] if prev else ([], 0.0)
+            longest[task.name] = ( path + [ task.name ], seconds + task.seconds )
+
+        return max(longest.values(), key=lambda l: l[1], default=([], 0.0))
+
+
+    def log_summary(self, logger=None):
+        '''
+        Log per task timings and the critical path
+
+        Parameters:
+            logger (obj): Logger to use, defaults to the module logger
+        '''
+        logger = logger or log
+        logger.info(f'~~~~ {self.name} task timings ~~~~')
+        logger.info(f"{'Task':<22}{'Start (s)':>10}{'Time (s)':>10}  Status")
+        for task in sorted(self.tasks.values(), key=lambda t: t.start):
+            logger.info(f'{task.name:<22}{task.start:>10.2f}'
+                        f'{task.seconds:>10.2f}  {task.status}')
+        path, seconds = self.critical_path()
+        logger.info(f"Critical path {' -> '.join(path)} {seconds:0.2f}S, "
+                    f"wall time {self.wall:0.2f}S")
+
+        return
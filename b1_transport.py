@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Shared HTTP transport for the BloxOne APIs
+
+    Replaces the low level _apiget/_apipost/_apidelete/_apiput/_apipatch
+    methods of bloxone client objects, which otherwise make every
+    request with requests.request() and therefore a new TCP connection
+    and TLS handshake, with a single shared transport:
+        - a requests.Session with a keep-alive connection pool sized to
+          the number of workers, shared by all clients in the run
+        - optional HTTP/2 multiplexing using httpx, if installed with
+          the h2 module
+        - connection reuse statistics
+
+ Requirements:
+   Python3 with threading and requests modules, optionally httpx[http2]
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import logging
+import threading
+import requests
+import requests.adapters
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+# Global Variables
+log = logging.getLogger(__name__)
+
+API_METHODS = { '_apiget': 'GET', '_apipost': 'POST', '_apidelete': 'DELETE',
+                '_apiput': 'PUT', '_apipatch': 'PATCH' }
+
+# Number of hosts to keep pools for, all BloxOne APIs share one host
+POOL_HOSTS = 4
+
+
+class Transport:
+    '''
+    Thread safe HTTP transport shared by all bloxone client objects
+    '''
+
+    def __init__(self, pool_size=10, http2=False):
+        '''
+        Parameters:
+            pool_size (int): Maximum keep-alive connections per host,
+                             typically the number of workers
+            http2 (bool): Use HTTP/2 where httpx and h2 are installed
+        '''
+        self.pool_size = max(pool_size, 1)
+        self.requests = 0
+        self.http2_requests = 0
+        self.http2_connections = 0
+        self.closed_connections = 0
+        self.client = None
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_HOSTS,
+                                                pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        if http2:
+            if httpx:
+                try:
+                    limits = httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size)
+                    self.client = httpx.Client(http2=True, limits=limits,
+                                               timeout=None)
+                except ImportError:
+                    log.warning('HTTP/2 requires the h2 module, '
+                                'using HTTP/1.1')
+            else:
+                log.warning('HTTP/2 requires the httpx module, '
+                            'using HTTP/1.1')
+
+        return
+
+
+    def _trace(self, event, info):
+        '''
+        httpx trace extension callback, counts new connections
+        '''
+        if event == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.http2_connections += 1
+
+        return
+
+
+    def request(self, method, url, headers=None, data=None, stream=False):
+        '''
+        Make an HTTP request using a pooled connection. Streamed 
+        responses always use the requests session, so that the raw 
+        response can be parsed incrementally.
+
+        Parameters:
+            method (str): HTTP method
+            url (str): Request URL
+            headers (dict): Request headers
+            data (str): Request body
+            stream (bool): Do not read the response body
+
+        Returns:
+            response object
+
+        Raises:
+            requests.exceptions.RequestException
+        '''
+        with self._lock:
+            self.requests += 1
+        if self.client and not stream:
+            try:
+                response = self.client.request(method, url, headers=headers,
+                                               content=data or None,
+                                               extensions={ 'trace': 
+                                                            self._trace })
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(str(e))
+            except httpx.TransportError as e:
+                raise requests.exceptions.ConnectionError(str(e))
+            if response.http_version == 'HTTP/2':
+                with self._lock:
+                    self.http2_requests += 1
+        else:
+            response = self.session.request(method, url, headers=headers,
+                                            data=data, stream=stream)
+
+        return response
+
+
+    def pool_connections(self):
+        '''
+        Number of connections made by the requests session pools
+
+        Returns:
+            int
+        '''
+        connections = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = getattr(getattr(adapter, 'poolmanager', None), 
+                            'pools', None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+
+        return connections
+
+
+    def stats(self):
+        '''
+        Connection reuse statistics
+
+        Returns:
+            dict: requests, connections (new connections made), reused
+                  (requests made on an existing connection), reuse
+                  (percentage), http2 (requests made using HTTP/2)
+        '''
+        connections = ( self.closed_connections + self.http2_connections +
+                        self.pool_connections() )
+        reused = max(self.requests - connections, 0)
+        stats = { 'requests': self.requests,
+                  'connections': connections,
+                  'reused': reused,
+                  'reuse': round(100 * reused / self.requests, 1) 
+                           if self.requests else 0.0,
+                  'http2': self.http2_requests }
+
+        return stats
+
+
+    def log_summary(self, logger=None):
+        '''
+        Log the connection reuse statistics
+
+        Parameters:
+            logger (obj): Logger to use, defaults to the module logger
+        '''
+        logger = logger or log
+        stats = self.stats()
+        if stats['requests']:
+            logger.info(f"Connections: {stats['connections']} opened for "
+                        f"{stats['requests']} requests, {stats['reuse']}% "
+                        f"reused, {stats['http2']} over HTTP/2, pool size "
+                        f"{self.pool_size}")
+
+        return
+
+
+    def close(self):
+        '''
+        Close all pooled connections, retaining the statistics
+        '''
+        with self._lock:
+            self.closed_connections += self.pool_connections()
+        self.session.close()
+        if self.client:
+            self.client.close()
+
+        return
+
+
+def attach(client, transport):
+    '''
+    Replace the low level API methods of a bloxone client with calls
+    using the shared transport, must be applied before instrumenting or
+    governing the client
+
+    Parameters:
+        client (obj): bloxone client object
+        transport (obj): Transport object
+
+    Returns:
+        client (obj): The same client object
+    '''
+    def api_call(method):
+        def call(url, body=None, headers=''):
+            try:
+                response = transport.request(method, url, 
+                                             headers=headers or client.headers,
+                                             data=body)
+            except requests.exceptions.RequestException as e:
+                logging.error(e)
+                logging.debug("url: {}".format(url))
+                raise
+            return response
+        return call
+
+    for name, method in API_METHODS.items():
+        if getattr(client, name, None):
+            setattr(client, name, api_call(method))
+
+    return client
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Benchmark request body building for IP reservations, comparing
+    the previous per-call string concatenation with json.dumps() of a
+    dict and the b1_bodies precompiled templates, with both the json
+    and orjson encoders. Reports bodies/sec for the best of --repeat
+    runs of each case.
+
+ Requirements:
+   Python3 with json module, optionally orjson
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import argparse
+import datetime
+import ipaddress
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import b1_bodies
+
+SPACE = 'ipam/ip_space/0f3c7b48-34a2-11ee-9c1c-0242ac120002'
+CONFIG = { 'owner': 'demo', 'location': 'Bob\'s "Lab"' }
+
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Parameters:
+        None
+
+    Returns:
+        Returns parsed arguments
+    '''
+    parse = argparse.ArgumentParser(description='Request body benchmark')
+    parse.add_argument('-n', '--reservations', type=int, default=1000000,
+                        help="Number of IP reservation bodies (default 1M)")
+    parse.add_argument('-s', '--subnet-size', type=int, default=250,
+                        help="Reservations per subnet (default 250)")
+    parse.add_argument('-r', '--repeat', type=int, default=5,
+                        help="Runs of each case, best is reported (default 5)")
+
+    return parse.parse_args()
+
+
+def tags(config):
+    '''
+    Demo tags as created by create_tag_body()
+    '''
+    now = datetime.datetime.now()
+
+    return { "Owner": config['owner'], "Location": config['location'],
+             "Usage": "AUTOMATION DEMO",
+             "Created": now.strftime('%Y-%m-%dT%H:%MZ') }
+
+
+def concatenation(subnets):
+    '''
+    Previous approach: tag body per subnet, strings glued per body
+    '''
+    for addresses in subnets:
+        tag_body = '"tags":' + json.dumps(tags(CONFIG))
+        for address in addresses:
+            body = ( '{ "address": "' + address + '", "space": "' 
+                    + SPACE + '", '  + tag_body + ' }' )
+
+    return
+
+
+def json_dict(subnets):
+    '''
+    Full json.dumps() of a dict per body
+    '''
+    run_tags = tags(CONFIG)
+    for addresses in subnets:
+        for address in addresses:
+            body = json.dumps({ 'address': address, 'space': SPACE,
+                                'tags': run_tags })
+
+    return
+
+
+def template(subnets):
+    '''
+    b1_bodies.BodyTemplate, static members serialised once per run
+    '''
+    tag_body = b1_bodies.fragment('tags', tags(CONFIG))
+    reservation = b1_bodies.ipam_templates(SPACE, tag_body)['/ipam/address']
+    for addresses in subnets:
+        for address in addresses:
+            body = reservation.build(address)
+
+    return
+
+
+def make_subnets(count, size):
+    '''
+    Pre-generate address strings so only body building is timed
+
+    Returns:
+        list: List of lists of address strings
+    '''
+    subnets = []
+    base = int(ipaddress.IPv4Address('10.0.0.0'))
+    for n in range(0, count, size):
+        subnets.append([ str(ipaddress.IPv4Address(base + ((n // size) << 8) + i))
+                         for i in range(1, min(size, count - n) + 1) ])
+
+    return subnets
+
+
+def main():
+    '''
+    Run benchmark cases and print a results table
+    '''
+    args = parseargs()
+    subnets = make_subnets(args.reservations, args.subnet_size)
+    total = sum(len(s) for s in subnets)
+
+    cases = [ ('concatenation', 'json', concatenation),
+              ('json.dumps', 'json', json_dict),
+              ('template', 'json', template) ]
+    if b1_bodies.orjson:
+        cases.append(('template', 'orjson', template))
+
+    print(f"{'Method':<16}{'Encoder':<9}{'Bodies':>10}"
+          f"{'Time (s)':>10}{'Bodies/sec':>14}")
+    for method, encoder, func in cases:
+        b1_bodies.set_encoder(encoder)
+        elapsed = None
+        for n in range(max(args.repeat, 1)):
+            start = time.perf_counter()
+            func(subnets)
+            run = time.perf_counter() - start
+            if elapsed is None or run < elapsed:
+                elapsed = run
+        print(f'{method:<16}{encoder:<9}{total:>10}'
+              f'{elapsed:>10.3f}{total / elapsed:>14.0f}')
+    b1_bodies.set_encoder()
+
+    return
+
+
+### Main ###
+if __name__ == '__main__':
+    main()
+## End Main ###
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    End-to-end throughput benchmark of the automation tools against the
+    local mock CSP server (b1_mock_csp.py). Runs b1ddi_automation_demo
+    and b1td_pov in create and remove modes, then both applications
+    through b1_fanout, and reports objects/sec, p50/p99 API call latency
+    and peak RSS. API calls made by fan-out worker processes are not
+    timed.
+
+    The mock server runs in a separate process so that its memory is
+    not included in the peak RSS.
+
+ Requirements:
+   Python3 with bloxone, requests and resource modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import requests
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+import bloxone_automation_tools
+import b1_fanout
+import b1_ratelimit
+
+DEMO_INI = '''[B1_POV]
+b1inifile = {b1ini}
+owner = bench
+location = benchmark
+customer = mock
+prefix = %(customer)s
+postfix = %(customer)s
+tld = com
+dns_view = %(owner)s-%(postfix)s-view
+dns_domain = %(customer)s.%(tld)s
+nsg = b1ddi-auto-demo
+no_of_records = {records}
+ip_space = %(owner)s-%(postfix)s-demo
+no_of_networks = {networks}
+no_of_ips = {ips}
+base_net = 10.0.0.0
+container_cidr = 12
+cidr = 24
+net_comments = Office Network, VoIP Network, POS Network
+ipv6_prefix = "2001:db8::"
+customer_domain = mockcorp.com
+policy_level = medium
+policy = %(prefix)s-policy
+allow_list = %(prefix)s-allow
+deny_list = %(prefix)s-deny
+ext_net = 203.0.113.1
+ext_cidr = 32
+ext_net_name = %(customer)s-network
+'''
+
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Parameters:
+        None
+
+    Returns:
+        Returns parsed arguments
+    '''
+    parse = argparse.ArgumentParser(description='End-to-end benchmark')
+    parse.add_argument('-l', '--latency', type=float, default=0.02,
+                        help="Mock server latency per request in seconds")
+    parse.add_argument('-j', '--jitter', type=float, default=0.0,
+                        help="Mock server latency jitter in seconds")
+    parse.add_argument('-n', '--networks', type=int, default=10,
+                        help="Number of subnets (no_of_networks)")
+    parse.add_argument('-i', '--ips', type=int, default=5,
+                        help="Number of IP reservations (no_of_ips)")
+    parse.add_argument('-r', '--records', type=int, default=100,
+                        help="Number of DNS records (no_of_records)")
+    parse.add_argument('-w', '--workers', type=int, default=1,
+                        help="Number of concurrent workers/requests")
+    parse.add_argument('-b', '--backend', type=str, default='serial',
+                        choices=[ 'serial', 'async' ],
+                        help="B1DDI provisioning backend")
+    parse.add_argument('--allocate', type=str, default='client',
+                        choices=[ 'client', 'server' ],
+                        help="IP reservation allocation")
+    parse.add_argument('-6', '--ipv6', action='store_true',
+                        help="Build IPv6 networks")
+    parse.add_argument('-a', '--app', type=str, action='append',
+                        choices=[ 'b1ddi', 'b1td' ],
+                        help="Application(s) to benchmark (default both)")
+    parse.add_argument('-p', '--processes', type=int, default=2,
+                        help="Fan-out processes, 0 to skip the fan-out phases")
+    parse.add_argument('--json', action='store_true',
+                        help="Output results as JSON")
+
+    return parse.parse_args()
+
+
+class CallTimer:
+    '''
+    Record the latency of every API call made through requests
+    '''
+
+    def __init__(self):
+        self.timings = []
+        self._lock = threading.Lock()
+        self._request = requests.request
+
+        return
+
+
+    def install(self):
+        '''
+        Wrap requests.request, as used by the bloxone module
+        '''
+        def timed_request(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return self._request(*args, **kwargs)
+            finally:
+                self.record(time.perf_counter() - start)
+        requests.request = timed_request
+
+        return
+
+
+    def record(self, elapsed):
+        with self._lock:
+            self.timings.append(elapsed)
+
+        return
+
+
+    def reset(self):
+        with self._lock:
+            timings = self.timings
+            self.timings = []
+
+        return timings
+
+
+def install_async_timer(timer):
+    '''
+    Wrap the async backend response reader with the call timer, so
+    that time queued for the concurrency semaphore is not included
+    '''
+    import b1_async
+    read_response = b1_async.AsyncB1DDI._read_response
+
+    async def timed_read_response(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await read_response(self, *args, **kwargs)
+        finally:
+            timer.record(time.perf_counter() - start)
+    b1_async.AsyncB1DDI._read_response = timed_read_response
+
+    return
+
+
+def percentile(values, pct):
+    '''
+    Nearest rank percentile of values
+    '''
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+
+    return values[index]
+
+
+def peak_rss():
+    '''
+    Peak resident set size of this process in MiB
+    '''
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    if sys.platform == 'darwin':
+        rss = rss / 1024
+
+    return rss / 1024
+
+
+def start_mock(latency, jitter):
+    '''
+    Start the mock CSP server in a subprocess
+
+    Returns:
+        tuple: (process, url)
+    '''
+    process = subprocess.Popen([ sys.executable, 
+                                 os.path.join(REPO, 'b1_mock_csp.py'),
+                                 '--port', '0',
+                                 '--latency', str(latency),
+                                 '--jitter', str(jitter) ],
+                               stdout=subprocess.PIPE, text=True, cwd=REPO)
+    line = process.stdout.readline()
+    if not line.startswith('Listening on '):
+        process.kill()
+        raise RuntimeError(f'Mock server failed to start: {line}')
+
+    return process, line.split()[-1]
+
+
+def mock_stats(url):
+    '''
+    Retrieve object counts from the mock server
+    '''
+    with urllib.request.urlopen(url + '/_mock/stats') as response:
+        stats = json.loads(response.read())
+
+    return stats
+
+
+def run_phase(name, func, url, timer, deleted=False):
+    '''
+    Run and measure a benchmark phase
+
+    Returns:
+        dict of results
+    '''
+    before = mock_stats(url)
+    timer.reset()
+    start = time.perf_counter()
+    exitcode = func()
+    elapsed = time.perf_counter() - start
+    after = mock_stats(url)
+    timings = timer.reset()
+
+    key = 'deleted' if deleted else 'created'
+    objects = after[key] - before[key]
+    result = { 'phase': name,
+               'exitcode': exitcode,
+               'objects': objects,
+               'seconds': round(elapsed, 3),
+               'objects_per_sec': round(objects / elapsed, 1) if elapsed else 0,
+               'calls': len(timings),
+               'p50_ms': round(percentile(timings, 50) * 1000, 2),
+               'p99_ms': round(percentile(timings, 99) * 1000, 2),
+               'peak_rss_mib': round(peak_rss(), 1) }
+
+    return result
+
+
+def main():
+    '''
+    Run benchmark phases and print a results table
+    '''
+    args = parseargs()
+    apps = args.app or [ 'b1ddi', 'b1td' ]
+    results = []
+    logging.basicConfig(level=logging.WARNING)
+
+    timer = CallTimer()
+    timer.install()
+    if args.backend == 'async':
+        install_async_timer(timer)
+    bloxone_automation_tools.GOVERNOR = b1_ratelimit.RateGovernor(
+        max_concurrency=args.workers)
+    bloxone_automation_tools.ALLOCATION = args.allocate
+
+    process, url = start_mock(args.latency, args.jitter)
+    # Policy and filter YAML files are read from the current directory
+    cwd = os.getcwd()
+    os.chdir(REPO)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            b1ini = os.path.join(tmpdir, 'b1.ini')
+            with open(b1ini, 'w') as f:
+                f.write(f"[BloxOne]\nurl = '{url}'\napi_version = 'v1'\n"
+                        f"api_key = '{'0' * 32}'\n")
+            inifile = os.path.join(tmpdir, 'demo.ini')
+            with open(inifile, 'w') as f:
+                f.write(DEMO_INI.format(b1ini=b1ini, records=args.records,
+                                        networks=args.networks, ips=args.ips))
+
+            if 'b1ddi' in apps:
+                config = bloxone_automation_tools.read_demo_ini(inifile, 
+                                                                app='b1ddi')
+                demo = bloxone_automation_tools.b1ddi_automation_demo
+                results.append(run_phase('b1ddi create',
+                    lambda: demo(b1ini, config, ipv6=args.ipv6,
+                                 workers=args.workers, backend=args.backend),
+                    url, timer))
+                results.append(run_phase('b1ddi remove',
+                    lambda: demo(b1ini, config, remove=True,
+                                 workers=args.workers),
+                    url, timer, deleted=True))
+            if 'b1td' in apps:
+                config = bloxone_automation_tools.read_demo_ini(inifile,
+                                                                app='b1td')
+                pov = bloxone_automation_tools.b1td_pov
+                results.append(run_phase('b1td create',
+                    lambda: pov(b1ini, config), url, timer))
+                results.append(run_phase('b1td remove',
+                    lambda: pov(b1ini, config, remove=True),
+                    url, timer, deleted=True))
+            if args.processes:
+                options = { 'workers': args.workers, 'backend': args.backend,
+                            'allocate': args.allocate, 'ipv6': args.ipv6,
+                            'logdir': tmpdir }
+                results.append(run_phase('fanout create',
+                    lambda: b1_fanout.fan_out([ inifile ], apps,
+                                              processes=args.processes,
+                                              **options),
+                    url, timer))
+                results.append(run_phase('fanout remove',
+                    lambda: b1_fanout.fan_out([ inifile ], apps,
+                                              processes=args.processes,
+                                              remove=True, **options),
+                    url, timer, deleted=True))
+    finally:
+        os.chdir(cwd)
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f'Mock latency {args.latency * 1000:0.1f}ms, '
+              f'{args.workers} workers, {args.backend} backend, '
+              f'{args.allocate} allocation')
+        print(f"{'Phase':<14}{'Exit':>5}{'Objects':>9}{'Time (s)':>10}"
+              f"{'Obj/s':>9}{'Calls':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+              f"{'RSS (MiB)':>11}")
+        for r in results:
+            print(f"{r['phase']:<14}{r['exitcode']:>5}{r['objects']:>9}"
+                  f"{r['seconds']:>10.2f}{r['objects_per_sec']:>9.1f}"
+                  f"{r['calls']:>8}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                  f"{r['peak_rss_mib']:>11.1f}")
+
+    return
+
+
+### Main ###
+if __name__ == '__main__':
+    main()
+## End Main ###
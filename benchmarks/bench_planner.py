@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Benchmark peak memory and time of the b1_planner address planner
+    against materialising list(network.subnets()) and
+    list(network.hosts()) as the demo previously did.
+
+ Requirements:
+   Python3 with ipaddress and tracemalloc modules
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20230522
+
+ Copyright (c) 2021 - 2023 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.1.0'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+import argparse
+import ipaddress
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import b1_planner
+
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Parameters:
+        None
+
+    Returns:
+        Returns parsed arguments
+    '''
+    parse = argparse.ArgumentParser(description='Address planner benchmark')
+    parse.add_argument('-n', '--networks', type=int, default=10,
+                        help="Number of subnets to plan (no_of_networks)")
+    parse.add_argument('-i', '--ips', type=int, default=5,
+                        help="Number of IP reservations (no_of_ips)")
+    parse.add_argument('--skip-baseline', action='store_true',
+                        help="Only run the planner")
+
+    return parse.parse_args()
+
+
+def measure(func, *args):
+    '''
+    Run func and return elapsed time and peak traced memory
+
+    Returns:
+        tuple: (seconds, peak bytes)
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def baseline(container, prefixlen, nets, no_of_ips):
+    '''
+    Previous approach: materialise the subnet and host lists
+    '''
+    subnet_list = list(container.subnets(new_prefix=prefixlen))
+    for n in range(min(nets, len(subnet_list))):
+        network = subnet_list[n]
+        ips = list(network.hosts())
+        for ip in range(1, no_of_ips):
+            str(ips[ip])
+
+    return
+
+
+def planner(container, prefixlen, nets, no_of_ips):
+    '''
+    Arithmetic planner
+    '''
+    for network in b1_planner.iter_subnets(container, prefixlen, nets):
+        b1_planner.dhcp_range(network)
+        for ip in b1_planner.iter_reservations(network, no_of_ips):
+            str(ip)
+
+    return
+
+
+def main():
+    '''
+    Run benchmark cases and print a results table
+    '''
+    args = parseargs()
+    cases = [ ('192.168.0.0/16', 24),
+              ('10.0.0.0/12', 24),
+              ('10.0.0.0/8', 24),
+              ('10.0.0.0/8', 16),
+              ('10.0.0.0/8', 12),
+              ('2001:db8::/32', 64) ]
+
+    print(f"{'Container':<18}{'Subnet':>7}{'Method':>10}"
+          f"{'Time (s)':>12}{'Peak (KiB)':>14}")
+    for container, prefixlen in cases:
+        network = ipaddress.ip_network(container)
+        methods = [ ('planner', planner) ]
+        # Baseline cannot materialise IPv6 /64 hosts
+        if not args.skip_baseline and network.version == 4:
+            methods.insert(0, ('baseline', baseline))
+        for name, func in methods:
+            elapsed, peak = measure(func, network, prefixlen,
+                                    args.networks, args.ips)
+            print(f'{container:<18}{"/" + str(prefixlen):>7}{name:>10}'
+                  f'{elapsed:>12.4f}{peak / 1024:>14.1f}')
+
+    return
+
+
+### Main ###
+if __name__ == '__main__':
+    main()
+## End Main ###
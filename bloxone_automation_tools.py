@@ -53,16 +53,97 @@ import sys
 import json
 import bloxone
 import argparse
+import concurrent.futures
 import configparser
 import datetime
+import gzip
 import ipaddress
+import itertools
 import random
+import re
+import threading
 import time
-import yaml
+import requests
+import b1_appcatalog
+import b1_bodies
+import b1_bulkimport
+import b1_definitions
+import b1_metrics
+import b1_planner
+import b1_ratelimit
+import b1_taskgraph
+import b1_transport
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 # Global Variables
 log = logging.getLogger(__name__)
+
+# Reverse dependency order for deleting objects from the manifest
+B1DDI_DELETE_ORDER = [ '/dns/record', '/dns/auth_zone', '/dns/view',
+                       '/ipam/address', '/ipam/range', '/ipam/subnet',
+                       '/ipam/address_block', '/ipam/ip_space' ]
+B1TD_DELETE_ORDER = [ '/security_policies', '/application_filters',
+                      '/category_filters', '/named_lists', '/network_lists' ]
+
+# Tagged collections searched by --reap in deletion order, as tuples of
+# objpath, the field naming each object and the parent field of objects
+# that are deleted with their parent
+REAP_COLLECTIONS = {
+    'b1ddi': [ ('/dns/record', 'absolute_name_spec', 'zone'),
+               ('/dns/auth_zone', 'fqdn', ''),
+               ('/dns/view', 'name', ''),
+               ('/ipam/address', 'address', 'space'),
+               ('/ipam/range', 'start', 'space'),
+               ('/ipam/subnet', 'address', 'space'),
+               ('/ipam/address_block', 'address', 'space'),
+               ('/ipam/ip_space', 'name', '') ],
+    'b1td': [ ('/security_policies', 'name', ''),
+              ('/application_filters', 'name', ''),
+              ('/category_filters', 'name', ''),
+              ('/named_lists', 'name', '') ] }
+# Parent field, by objpath, of objects deleted with their parent
+PARENT_FIELDS = { objpath: parent_field 
+                  for collections in REAP_COLLECTIONS.values()
+                  for objpath, name_field, parent_field in collections
+                  if parent_field }
+DEMO_USAGE = 'AUTOMATION DEMO'
+CREATED_FORMAT = '%Y-%m-%dT%H:%MZ'
+
+# Description of lookalike targets added, only these are removed
+LOOKALIKE_DESCRIPTION = 'Added by bloxone_automation_tools'
+
+# Maximum ids per multi-id delete request
+DELETE_BATCH_SIZE = 100
+
+# B1TD collections checked by name, fetched once per run
+B1TD_COLLECTIONS = [ '/network_lists', '/named_lists', '/category_filters',
+                     '/application_filters', '/security_policies' ]
+PREFETCH_PAGE_SIZE = 1000
+
+# Response fields holding the token for the next page, where supported
+PAGE_TOKEN_FIELDS = [ 'page_token', 'next_page_token' ]
+
+# Shared rate governor applied to all bloxone clients, set by main()
+GOVERNOR = None
+
+# Shared pooled HTTP transport used by all bloxone clients, set by main()
+TRANSPORT = None
+
+# IP reservation allocation, client or server (next available IP), 
+# set by main()
+ALLOCATION = 'client'
+
+# Created tag timestamp, set once per run by create_tag_body()
+CREATED = None
+
+# Plan file format version and average request time used for estimates
+PLAN_VERSION = 1
+PLAN_REQUEST_TIME = 0.2
 # console_handler = logging.StreamHandler(sys.stdout)
 # log.addHandler(console_handler)
 
@@ -78,7 +159,8 @@ def parseargs():
     '''
     parse = argparse.ArgumentParser(description='BloxOne Automation Tools')
     parse.add_argument('-a', '--app', type=str, required=True,
-                        help="BloxOne Application [ b1ddi, b1td ]")
+                        help="BloxOne Application [ b1ddi, b1td ], "
+                             "comma separated with --fanout")
     parse.add_argument('-c', '--config', type=str, default='demo.ini',
                         help="Overide Config file")
     parse.add_argument('-6', '--ipv6', action='store_true',
@@ -87,6 +169,48 @@ def parseargs():
                         help="Clean-up demo data")
     parse.add_argument('-o', '--output', action='store_true', 
                         help="Ouput log to file <customer>.log") 
+    parse.add_argument('-w', '--workers', type=int, default=None,
+                        help="Number of concurrent workers/requests")
+    parse.add_argument('--window', type=int, default=0,
+                        help="Maximum DNS records in flight "
+                             "(default 2 x workers)")
+    parse.add_argument('--rate', type=float, default=0,
+                        help="Maximum API requests/sec per API family "
+                             "(default unlimited)")
+    parse.add_argument('--allocate', type=str, default='client',
+                       choices=[ 'client', 'server' ],
+                       help='Allocate IP reservations client side, one ' +
+                       'request per IP, or server side using next available ' +
+                       'IP, one request per subnet')
+    parse.add_argument('--http2', action='store_true',
+                        help="Use HTTP/2 if the httpx and h2 modules are "
+                             "installed")
+    parse.add_argument('-b', '--backend', type=str, default='serial',
+                        choices=[ 'serial', 'async' ],
+                        help="B1DDI provisioning backend [ serial, async ]")
+    parse.add_argument('--plan', type=str, metavar='FILE',
+                        help="Write an offline plan to FILE, no API calls")
+    parse.add_argument('--apply', type=str, metavar='FILE',
+                        help="Apply a plan FILE created with --plan")
+    parse.add_argument('-f', '--fanout', type=str, nargs='+', metavar='PATH',
+                        help="Run for every [B1_POV*] section in the ini "
+                             "files, directories or globs given")
+    parse.add_argument('-p', '--processes', type=int, default=4,
+                        help="Maximum concurrent customers with --fanout "
+                             "(default 4)")
+    parse.add_argument('-m', '--metrics', type=str, metavar='FILE',
+                        help="Export API metrics to FILE "
+                             "(.prom for Prometheus, otherwise JSON)")
+    parse.add_argument('--reap', action='store_true',
+                        help="Remove demo objects across the tenant found "
+                             "by tag, rather than by ini file names")
+    parse.add_argument('--owner', type=str, default=None,
+                        help="Owner tag to reap, '*' for all owners "
+                             "(default owner in the ini file)")
+    parse.add_argument('--older-than', type=parse_age, default=None,
+                        metavar='AGE',
+                        help="Only reap objects created more than AGE ago, "
+                             "e.g. 12h or 7d")
     parse.add_argument('-d', '--debug', action='store_true', 
                         help="Enable debug messages")
 
@@ -157,21 +281,23 @@ def open_file(filename):
 
 
 
-def read_demo_ini(ini_filename, app=''):
+def read_demo_ini(ini_filename, app='', section='B1_POV'):
     '''
     Open and parse ini file
 
     Parameters:
         ini_filename (str): name of inifile
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        section (str): Demo section, default B1_POV
 
     Returns:
         config (dict): Dictionary of BloxOne configuration elements
 
     '''
     # Local Variables
-    section = 'B1_POV'
     cfg = configparser.ConfigParser()
     config = {}
+    optional_keys = []
 
     if app == 'b1ddi':
         ini_keys = [ 'b1inifile', 'owner', 'location', 'customer', 'prefix',
@@ -184,6 +310,10 @@ def read_demo_ini(ini_filename, app=''):
                      'customer_domain', 'prefix', 'postfix', 
                      'policy_level', 'policy', 'allow_list', 'deny_list', 
                      'ext_net', 'ext_cidr', 'ext_net_name' ]
+        # Files of domains to import into the custom lists and for
+        # lookalike targets, and of prefixes for the network list
+        optional_keys = [ 'allow_list_file', 'deny_list_file', 
+                          'ext_net_file', 'lookalike_file' ]
     else:
         log.error(f'App: {app} not supported.')
         ini_keys = None
@@ -198,6 +328,7 @@ def read_demo_ini(ini_filename, app=''):
         # Look for demo section
         if section in cfg:
             config['filename'] = ini_filename
+            config['section'] = section
             for key in ini_keys:
                 # Check for key in BloxOne section
                 if key in cfg[section]:
@@ -206,6 +337,8 @@ def read_demo_ini(ini_filename, app=''):
                 else:
                     logging.warning(f'Key {key} not found in {section} section.')
                     config[key] = ''
+            for key in optional_keys:
+                config[key] = cfg[section].get(key, '').strip("'\"")
         else:
             logging.warning(f'No {section} Section in config file: {ini_filename}')
     else:
@@ -214,41 +347,738 @@ def read_demo_ini(ini_filename, app=''):
     return config
 
 
-def create_tag_body(config, **params):
+def demo_tags(config, **params):
     '''
-    Add Owner tag and any others defined in **params
+    Owner, Location, Usage and Created tags for demo objects, plus any
+    others defined in **params
 
     Parameters:
-        owner (str): Typically username
+        config (obj): ini config object
         params (dict): Tag key/value pairs
-    
+
     Returns:
-        tags (str): JSON string to append to body
+        tags (dict)
     '''
-    now = datetime.datetime.now()  
-    # datestamp = now.isoformat()
-    datestamp = now.strftime('%Y-%m-%dT%H:%MZ')
+    global CREATED
+    if not CREATED:
+        now = datetime.datetime.now()  
+        # datestamp = now.isoformat()
+        CREATED = now.strftime(CREATED_FORMAT)
+    datestamp = CREATED
     owner = config['owner']
     location = config['location']
 
     tags = {}
     tags.update({"Owner": owner})
     tags.update({"Location": location})
-    tags.update({"Usage": "AUTOMATION DEMO"})
+    tags.update({"Usage": DEMO_USAGE})
     tags.update({"Created": datestamp})
 
-
     if params:
         tags.update(**params)
-        tag_body = '"tags":' + json.dumps(tags) 
-    else:
-        tag_body = '"tags":' + json.dumps(tags) 
+
+    return tags
+
+
+def create_tag_body(config, **params):
+    '''
+    Add Owner tag and any others defined in **params
+
+    Parameters:
+        owner (str): Typically username
+        params (dict): Tag key/value pairs
+    
+    Returns:
+        tags (str): JSON string to append to body
+    '''
+    tag_body = b1_bodies.fragment('tags', demo_tags(config, **params))
     
     log.debug("Tag body: {}".format(tag_body))
 
     return tag_body
 
 
+def b1_client(cls, b1ini):
+    '''
+    Instantiate a bloxone client using the shared transport, recording
+    metrics for every API call and applying the shared rate governor
+
+    Parameters:
+        cls (class): bloxone client class, e.g. bloxone.b1ddi
+        b1ini (str): Name of inifile for bloxone module
+
+    Returns:
+        client (obj): bloxone client object
+    '''
+    client = cls(b1ini)
+    if TRANSPORT:
+        b1_transport.attach(client, TRANSPORT)
+    b1_metrics.instrument(client)
+    if GOVERNOR:
+        b1_ratelimit.govern(client, GOVERNOR)
+
+    return client
+
+
+class APIError(Exception):
+    '''
+    Raised when an API request required to continue fails
+    '''
+    pass
+
+
+class IdCache:
+    '''
+    Per-run name to id resolution cache wrapping a bloxone client
+
+    Each collection is fetched once, paged, using _fields=name,id and
+    indexed by name. The index is updated on every successful create and delete
+    made through the wrapper, all other attributes are passed through to
+    the wrapped client. Created objects are also recorded in the
+    manifest, if provided, and the journal is available to checkpoint
+    provisioning steps using create_step().
+    '''
+
+    def __init__(self, client, manifest=None, journal=None):
+        '''
+        Parameters:
+            client (obj): bloxone.b1ddi or bloxone.b1tdc object
+            manifest (obj): Manifest object to record created objects
+            journal (obj): Journal object of completed steps
+        '''
+        self._client = client
+        self._manifest = manifest
+        self.journal = journal
+        self._index = {}
+        self._fetching = {}
+        self._lock = threading.RLock()
+
+        return
+
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
+
+
+    def prefetch(self, objpath):
+        '''
+        Fetch and index a collection by name
+
+        Parameters:
+            objpath (str): Swagger object path
+
+        Returns:
+            bool: True if collection is indexed
+        '''
+        with self._lock:
+            if objpath in self._index:
+                return True
+            fetching = self._fetching.setdefault(objpath, threading.Lock())
+
+        # Only one fetch per collection, without blocking other collections
+        with fetching:
+            with self._lock:
+                if objpath in self._index:
+                    return True
+            index = {}
+            try:
+                for obj in iter_objects(self._client, objpath, 
+                                        page_size=PREFETCH_PAGE_SIZE,
+                                        stream=True, _fields='name,id'):
+                    index[obj.get('name')] = obj.get('id')
+            except APIError as err:
+                log.debug(f'Unable to prefetch {objpath}: {err}')
+                return False
+            with self._lock:
+                self._index[objpath] = index
+            log.debug(f'Cached {len(index)} ids for {objpath}')
+
+        return True
+
+
+    def snapshot(self, objpaths, workers=4):
+        '''
+        Prefetch several collections concurrently, so that all existence
+        and id checks are answered from memory
+
+        Parameters:
+            objpaths (list): Swagger object paths
+            workers (int): Maximum concurrent requests
+
+        Returns:
+            int: Number of objects indexed
+        '''
+        start_timer = time.perf_counter()
+        workers = max(1, min(workers, len(objpaths)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            indexed = list(pool.map(self.prefetch, objpaths))
+        with self._lock:
+            count = sum(len(self._index.get(o, {})) for o in objpaths)
+        log.info(f'Inventory snapshot: {count} objects in '
+                 f'{indexed.count(True)} of {len(objpaths)} collections '
+                 f'in {time.perf_counter() - start_timer:0.2f}S')
+
+        return count
+
+
+    def get_id(self, objpath, *, key="", value="", include_path=False):
+        '''
+        Get object id using key/value pair, using the cache for names
+
+        Returns:
+            id (str): object id or ""
+        '''
+        if key == 'name' and self.prefetch(objpath):
+            id = self._index[objpath].get(value, '')
+            if id and not include_path and '/' in str(id):
+                id = id.rsplit('/', 1)[1]
+        else:
+            id = self._client.get_id(objpath, key=key, value=value,
+                                     include_path=include_path)
+
+        return id
+
+
+    def create(self, objpath, body=""):
+        '''
+        Create object and add to the index on success
+        '''
+        with b1_metrics.phase(b1_metrics.OBJPATH_PHASES.get(objpath, objpath)):
+            response = self._client.create(objpath, body=body)
+        if response.status_code in self._client.return_codes_ok:
+            try:
+                data = response.json()
+                obj = data.get('result') or data.get('results') or {}
+            except ValueError:
+                obj = {}
+            if isinstance(obj, dict) and obj.get('name') and obj.get('id'):
+                with self._lock:
+                    if objpath in self._index:
+                        self._index[objpath][obj['name']] = obj['id']
+            if self._manifest and isinstance(obj, dict) and obj.get('id'):
+                self._manifest.record(objpath, obj)
+
+        return response
+
+
+    def next_available_ip(self, objpath, id, count=1):
+        '''
+        Allocate the next available IPs in a subnet or range, adding 
+        the addresses created to the manifest
+
+        Parameters:
+            objpath (str): /ipam/subnet or /ipam/range
+            id (str): Object id, with or without the path
+            count (int): Number of IPs
+
+        Returns:
+            response object
+        '''
+        with b1_metrics.phase(b1_metrics.OBJPATH_PHASES['/ipam/address']):
+            response = self._client.post(objpath, id=str(id).rsplit('/', 1)[-1],
+                                         action='nextavailableip', 
+                                         count=count)
+        if response.status_code in self._client.return_codes_ok:
+            if self._manifest:
+                for obj in response.json().get('results') or []:
+                    if obj.get('id'):
+                        self._manifest.record('/ipam/address', obj)
+
+        return response
+
+
+    def delete(self, objpath, id="", **params):
+        '''
+        Delete object(s) and remove from the index on success. Supports
+        both a single id and a JSON body with a list of ids.
+        '''
+        phase = b1_metrics.OBJPATH_PHASES.get(objpath, objpath)
+        with b1_metrics.phase('delete ' + phase):
+            response = self._client.delete(objpath, id=id, **params)
+        if response.status_code in self._client.return_codes_ok:
+            ids = []
+            if id:
+                ids.append(str(id))
+            if params.get('body'):
+                ids += [ str(i) for i in json.loads(params['body']).get('ids', []) ]
+            with self._lock:
+                index = self._index.get(objpath, {})
+                for name, obj_id in list(index.items()):
+                    if str(obj_id).rsplit('/', 1)[-1] in ids:
+                        del index[name]
+
+        return response
+
+
+class Manifest:
+    '''
+    Append-only JSONL manifest of objects created by a run, keyed by
+    config file, customer and app. Used by --remove to delete objects
+    directly by id without discovery.
+    '''
+
+    def __init__(self, filename, config, app):
+        '''
+        Parameters:
+            filename (str): Manifest filename
+            config (obj): ini config object
+            app (str): BloxOne Application [ b1ddi, b1td ]
+        '''
+        self.filename = filename
+        self.key = { 'config': os.path.abspath(config.get('filename', '')),
+                     'customer': config.get('customer', ''),
+                     'app': app }
+        self._lock = threading.Lock()
+
+        return
+
+
+    def record(self, objpath, obj):
+        '''
+        Append a created object to the manifest
+
+        Parameters:
+            objpath (str): Swagger object path
+            obj (dict): Created object, must include id
+        '''
+        entry = dict(self.key)
+        entry.update({ 'objpath': objpath,
+                       'id': obj.get('id'),
+                       'name': ( obj.get('name') or obj.get('fqdn') 
+                                 or obj.get('address') 
+                                 or obj.get('name_in_zone') or '' ) })
+        if objpath in PARENT_FIELDS:
+            entry['parent'] = obj.get(PARENT_FIELDS[objpath]) or ''
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with open(self.filename, 'a') as manifest:
+                manifest.write(line)
+
+        return
+
+
+    def entries(self):
+        '''
+        Read manifest entries for this config, customer and app
+
+        Returns:
+            list of dict
+        '''
+        entries = []
+        if os.path.isfile(self.filename):
+            with open(self.filename, 'r') as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        log.warning(f'Skipping invalid manifest line: {line}')
+                        continue
+                    if all(entry.get(k) == v for k, v in self.key.items()):
+                        entries.append(entry)
+
+        return entries
+
+
+    def remove(self, ids):
+        '''
+        Remove entries for deleted object ids from the manifest, the file
+        is removed once empty
+
+        Parameters:
+            ids (list): Object ids
+        '''
+        ids = set(str(id) for id in ids)
+        with self._lock:
+            if os.path.isfile(self.filename):
+                keep = []
+                with open(self.filename, 'r') as manifest:
+                    for line in manifest:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if ( str(entry.get('id')) in ids and 
+                             all(entry.get(k) == v 
+                                 for k, v in self.key.items()) ):
+                            continue
+                        keep.append(line)
+                if keep:
+                    with open(self.filename, 'w') as manifest:
+                        manifest.writelines(keep)
+                else:
+                    os.remove(self.filename)
+
+        return
+
+
+class Journal:
+    '''
+    Append-only JSONL checkpoint journal of completed provisioning steps,
+    keyed by config file, customer and app. Steps found in the journal
+    are skipped when a run is repeated, so an interrupted run resumes
+    from the first incomplete step.
+    '''
+
+    def __init__(self, filename, config, app):
+        '''
+        Parameters:
+            filename (str): Journal filename
+            config (obj): ini config object
+            app (str): BloxOne Application [ b1ddi, b1td ]
+        '''
+        self.filename = filename
+        self.key = { 'config': os.path.abspath(config.get('filename', '')),
+                     'customer': config.get('customer', ''),
+                     'app': app }
+        self.steps = {}
+        self._lock = threading.Lock()
+
+        if os.path.isfile(self.filename):
+            with open(self.filename, 'r') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        log.warning(f'Skipping invalid journal line: {line}')
+                        continue
+                    if all(entry.get(k) == v for k, v in self.key.items()):
+                        self.steps[entry['step']] = entry.get('id') or True
+            if self.steps:
+                log.info(f'Resuming from journal {self.filename}, '
+                         f'{len(self.steps)} steps complete')
+
+        return
+
+
+    def completed(self, step):
+        '''
+        Check whether a step has been completed
+
+        Parameters:
+            step (str): Step key, e.g. /ipam/subnet/10.0.0.0/24
+
+        Returns:
+            id (str) of the object created by the step, True if no id
+            was recorded, or None if the step is incomplete
+        '''
+        return self.steps.get(step)
+
+
+    def object_id(self, step):
+        '''
+        Id of the object created by a completed step
+
+        Parameters:
+            step (str): Step key
+
+        Returns:
+            id (str), or '' if incomplete or no id was recorded
+        '''
+        id = self.steps.get(step)
+
+        return id if isinstance(id, str) else ''
+
+
+    def record(self, step, id=''):
+        '''
+        Record a completed step
+
+        Parameters:
+            step (str): Step key
+            id (str): Id of the object created by the step
+        '''
+        entry = dict(self.key)
+        entry.update({ 'step': step, 'id': id })
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self.steps[step] = id or True
+            with open(self.filename, 'a') as journal:
+                journal.write(line)
+
+        return
+
+
+    def clear(self):
+        '''
+        Remove the journal, e.g. once the demo data has been removed
+        '''
+        with self._lock:
+            self.steps = {}
+            if os.path.isfile(self.filename):
+                os.remove(self.filename)
+
+        return
+
+
+def manifest_filename(config, app, kind='manifest'):
+    '''
+    Manifest (or journal) filename for config, stored alongside the 
+    ini file
+
+    Parameters:
+        config (obj): ini config object
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        kind (str): File type [ manifest, journal ]
+
+    Returns:
+        filename (str)
+    '''
+    inifile = config.get('filename', 'demo.ini')
+    stem = os.path.splitext(os.path.basename(inifile))[0]
+    # Additional demo sections, e.g. [B1_POV_acme], in the same file
+    section = config.get('section', 'B1_POV')
+    if section != 'B1_POV':
+        stem = f'{stem}-{section}'
+    customer = re.sub(r'[^\w.-]+', '_', config.get('customer', ''))
+    filename = os.path.join(os.path.dirname(os.path.abspath(inifile)),
+                            f'{stem}-{customer}-{app}.{kind}.jsonl')
+
+    return filename
+
+
+def existing_id(b1ddi, objpath, body):
+    '''
+    Find the id of an object matching a create body, e.g. after a 409
+
+    Parameters:
+        b1ddi (obj): bloxone client object
+        objpath (str): Swagger object path
+        body (str): JSON formatted data payload
+
+    Returns:
+        id (str): Object id (including path) or ''
+    '''
+    id = ''
+    filter = b1_bodies.identity_filter(objpath, body)
+    if filter:
+        response = b1ddi.get(objpath, _filter=filter, _fields='id')
+        if response.status_code in b1ddi.return_codes_ok:
+            results = response.json().get('results')
+            if results:
+                id = results[0].get('id', '')
+
+    return id
+
+
+def create_step(b1ddi, objpath, body, step):
+    '''
+    Create an object as a checkpointed step. If the client has a journal
+    the step is skipped when already complete, and recorded on success.
+    When resuming, an object that already exists (409) is treated as
+    created, e.g. if the previous run stopped before recording the step.
+
+    Parameters:
+        b1ddi (obj): IdCache wrapped bloxone client
+        objpath (str): Swagger object path
+        body (str): JSON formatted data payload
+        step (str): Step key, e.g. /ipam/subnet/10.0.0.0/24
+
+    Returns:
+        response object, or None if the step was already complete
+    '''
+    journal = getattr(b1ddi, 'journal', None)
+    if journal and journal.completed(step):
+        log.info(f'~~~~ {step} already complete, skipping')
+        return None
+
+    response = b1ddi.create(objpath, body=body)
+    if journal:
+        if response.status_code in b1ddi.return_codes_ok:
+            try:
+                data = response.json()
+                obj = data.get('result') or data.get('results') or {}
+            except ValueError:
+                obj = {}
+            journal.record(step, obj.get('id', '') 
+                           if isinstance(obj, dict) else '')
+        elif response.status_code == 409 and journal.steps:
+            id = existing_id(b1ddi, objpath, body)
+            if id:
+                log.info(f'~~~~ {step} already exists, resuming')
+                journal.record(step, id)
+                response = None
+            else:
+                log.warning(f'--- {step} already exists, id not found')
+
+    return response
+
+
+def update_step(client, objpath, id, body, step):
+    '''
+    Update an object as a checkpointed step, skipped when the journal
+    shows the step is already complete and recorded on success
+
+    Parameters:
+        client (obj): IdCache wrapped bloxone client
+        objpath (str): Swagger object path
+        id (str): Object id
+        body (str): JSON formatted data payload
+        step (str): Step key, e.g. /named_lists/allow/2
+
+    Returns:
+        response object, or None if the step was already complete
+    '''
+    journal = getattr(client, 'journal', None)
+    if journal and journal.completed(step):
+        log.info(f'~~~~ {step} already complete, skipping')
+        return None
+
+    response = client.update(objpath, id=id, body=body)
+    if journal and response.status_code in client.return_codes_ok:
+        journal.record(step, '')
+
+    return response
+
+
+def delete_manifest_entry(client, entry):
+    '''
+    Delete a single object recorded in the manifest
+
+    Parameters:
+        client (obj): bloxone.b1ddi object
+        entry (dict): Manifest entry
+
+    Returns:
+        bool: True if deleted or no longer exists
+    '''
+    status = False
+    id = str(entry['id']).rsplit('/', 1)[-1]
+    response = client.delete(entry['objpath'], id=id)
+    if response.status_code in client.return_codes_ok:
+        status = True
+    elif response.status_code == 404:
+        # Already gone, e.g. removed with a parent object
+        status = True
+    else:
+        log.debug(f'Return code: {response.status_code}')
+        log.debug(f'Return body: {response.text}')
+
+    return status
+
+
+def delete_batch(client, objpath, ids):
+    '''
+    Delete objects with a single multi-id request
+
+    Parameters:
+        client (obj): bloxone.b1tdc object
+        objpath (str): Swagger object path
+        ids (list): Object ids
+
+    Returns:
+        bool: True if deleted
+    '''
+    status = False
+    body = { 'ids': ids }
+    response = client.delete(objpath, body=json.dumps(body))
+    if response.status_code in client.return_codes_ok:
+        log.info(f'+++ {len(ids)} {objpath} objects deleted')
+        status = True
+    else:
+        log.warning(f'--- Failed to delete {len(ids)} {objpath} objects')
+        log.debug(f'Return code: {response.status_code}')
+        log.debug(f'Return body: {response.text}')
+
+    return status
+
+
+def delete_objects(client, objects, order, workers=1, batch=False):
+    '''
+    Delete objects in reverse dependency order. Objects of the same type
+    are deleted concurrently, or when batch is True as concurrent 
+    multi-id requests of up to DELETE_BATCH_SIZE ids.
+
+    Parameters:
+        client (obj): bloxone.b1ddi or bloxone.b1tdc object
+        objects (dict): Lists of entries, with objpath, id and name,
+                        keyed by objpath
+        order (list): Object paths in deletion order
+        workers (int): Number of concurrent deletes
+        batch (bool): Use multi-id delete requests
+
+    Returns:
+        tuple: (list of deleted ids, exitcode)
+    '''
+    exitcode = 0
+    deleted = []
+
+    # Unknown object types are deleted first
+    paths = [ p for p in objects.keys() if p not in order ]
+    paths += [ p for p in order if p in objects.keys() ]
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(workers, 1)) as pool:
+        for objpath in paths:
+            entries = objects[objpath]
+            if not entries:
+                continue
+            log.info(f'Deleting {len(entries)} {objpath} objects')
+            if batch:
+                ids = [ entry['id'] for entry in entries ]
+                batches = [ ids[i:i + DELETE_BATCH_SIZE] 
+                            for i in range(0, len(ids), DELETE_BATCH_SIZE) ]
+                results = pool.map(lambda b: delete_batch(client, objpath, b),
+                                   batches)
+                for ids, status in zip(batches, results):
+                    if status:
+                        deleted += ids
+                    else:
+                        exitcode = 1
+            else:
+                results = pool.map(lambda e: delete_manifest_entry(client, e),
+                                   entries)
+                for entry, status in zip(entries, results):
+                    if status:
+                        deleted.append(entry['id'])
+                    else:
+                        log.warning(f"--- {objpath} {entry.get('name')} "
+                                    "not deleted")
+                        exitcode = 1
+                log.info(f'+++ {objpath} objects processed')
+
+    return deleted, exitcode
+
+
+def delete_manifest_objects(client, manifest, order, workers=1, batch=False):
+    '''
+    Delete objects recorded in the manifest in reverse dependency order.
+    Objects of the same type are deleted concurrently, or as multi-id
+    requests when batch is True. Objects whose parent is also in the
+    manifest are skipped as they are deleted with the parent.
+
+    Parameters:
+        client (obj): bloxone.b1ddi or bloxone.b1tdc object
+        manifest (obj): Manifest object
+        order (list): Object paths in deletion order
+        workers (int): Number of concurrent deletes
+        batch (bool): Use a single delete with a list of ids per type
+
+    Returns:
+        exitcode (int): 0 if all objects were deleted
+    '''
+    objects = {}
+    children = {}
+    entries = manifest.entries()
+    ids = set(str(entry.get('id')) for entry in entries)
+    for entry in entries:
+        if entry.get('parent') and str(entry['parent']) in ids:
+            children[str(entry['id'])] = str(entry['parent'])
+        else:
+            objects.setdefault(entry['objpath'], []).append(entry)
+    if children:
+        log.info(f'{len(children)} objects will be deleted with their parent')
+
+    deleted, exitcode = delete_objects(client, objects, order, 
+                                       workers=workers, batch=batch)
+    parents = set(str(id) for id in deleted)
+    deleted += [ id for id, parent in children.items() if parent in parents ]
+
+    manifest.remove(deleted)
+    log.info(f'+++ {len(deleted)} objects deleted from manifest')
+
+    return exitcode
+
+
 def ip_space(b1ddi, config):
     '''
     Create IP Space
@@ -261,36 +1091,54 @@ def ip_space(b1ddi, config):
         status (bool): True if successful
     '''
     status = False
+    journal = getattr(b1ddi, 'journal', None)
+    step = '/ipam/ip_space/' + config['ip_space']
 
     # Check for existence
-    if not b1ddi.get_id('/ipam/ip_space', key="name", value=config['ip_space']):
+    resumed = journal and journal.completed(step)
+    id = '' if resumed else b1ddi.get_id('/ipam/ip_space', key="name", 
+                                         value=config['ip_space'], 
+                                         include_path=True)
+    if resumed:
+        log.info("IP Space {} already created, resuming"
+                 .format(config['ip_space']))
+        status = True
+    elif not id:
         log.info("---- Create IP Space ----")
         tag_body = create_tag_body(config)
-        body = '{ "name": "' + config['ip_space'] + '",' + tag_body +' }'
+        body = b1_bodies.BodyTemplate((), tag_body, 
+                                      name=config['ip_space']).build()
         log.debug("Body:{}".format(body))
 
         log.info("Creating IP_Space {}".format(config['ip_space']))
-        response = b1ddi.create('/ipam/ip_space', body=body)
-        if response.status_code in b1ddi.return_codes_ok:
+        response = create_step(b1ddi, '/ipam/ip_space', body, step)
+        if response is None or response.status_code in b1ddi.return_codes_ok:
             log.info("IP_Space {} Created".format(config['ip_space']))
             status = True
         else:
             log.warning("IP Space {} not created".format(config['ip_space']))
             log.debug("Return code: {}".format(response.status_code))
             log.debug("Return body: {}".format(response.text))
+    elif journal and journal.steps:
+        # Created by the interrupted run before the step was recorded
+        log.info("IP Space {} already exists, resuming"
+                 .format(config['ip_space']))
+        journal.record(step, id)
+        status = True
     else:
         log.warning("IP Space {} already exists".format(config['ip_space']))
     
     return status
 
 
-def create_networks(b1ddi, config):
+def create_networks(b1ddi, config, workers=1):
     '''
     Create Subnets
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
+        workers (int): Number of subnets to provision concurrently
     
     Returns:
         status (bool): True if successful
@@ -310,53 +1158,38 @@ def create_networks(b1ddi, config):
 
         # Create subnets
         cidr = config['container_cidr']
-        body = ( '{ "address": "' + base_net + '", '
-                + '"cidr": "' + cidr + '", '
-                + '"space": "' + space + '", '
-                + '"comment": "Internal Address Allocation", '
-                + tag_body + ' }' )
+        body = b1_bodies.BodyTemplate((), tag_body, address=base_net,
+                                      cidr=cidr, space=space,
+                                      comment="Internal Address Allocation"
+                                      ).build()
         log.debug("Body:{}".format(body))
         log.info("~~~~ Creating Addresses block {}/{}~~~~ "
                 .format(base_net, cidr))
-        response = b1ddi.create('/ipam/address_block', body=body)
+        response = create_step(b1ddi, '/ipam/address_block', body,
+                               f'/ipam/address_block/{base_net}/{cidr}')
 
-        if response.status_code in b1ddi.return_codes_ok:
+        if response is None or response.status_code in b1ddi.return_codes_ok:
             log.info("+++ Address block {}/{} created".format(base_net, cidr))
 
             # Create subnets
             network = ipaddress.ip_network(base_net + '/' + cidr)
             # Reset cidr for subnets
             cidr = config['cidr']
-            subnet_list = list(network.subnets(new_prefix=int(cidr)))
-            if len(subnet_list) < int(config['no_of_networks']):
-                nets = len(subnet_list)
+            available = b1_planner.subnet_count(network, int(cidr))
+            if available < int(config['no_of_networks']):
+                nets = available
                 log.warning("Address block only supports {} subnets".format(nets))
             else:
                 nets = int(config['no_of_networks'])
             log.info("~~~~ Creating {} subnets ~~~~".format(nets))
-            for n in range(nets):
-                address = str(subnet_list[n].network_address)
+            subnets = []
+            for subnet in b1_planner.iter_subnets(network, int(cidr), nets):
                 comment = net_comments[random.randrange(0,len(net_comments))]
-                body = ( '{ "address": "' + address + '", '
-                        + '"cidr": "' + cidr + '", '
-                        + '"space": "' + space + '", '
-                        + '"comment": "' + comment + '", '
-                        + tag_body + ' }' )
-                log.debug("Body:{}".format(body))
-                log.info("Creating Subnet {}/{}".format(address, cidr))
-                response = b1ddi.create('/ipam/subnet', body=body)
-
-                if response.status_code in b1ddi.return_codes_ok:
-                    log.info("+++ Subnet {}/{} successfully created".format(address, cidr))
-                    if populate_network(b1ddi, config, space, subnet_list[n]):
-                        log.info("+++ Network populated.")
-                        status = True
-                    else:
-                        log.warning("--- Issues populating network")
-                else:
-                    log.warning("--- Subnet {}/{} not created".format(network, cidr))
-                    log.debug("Return code: {}".format(response.status_code))
-                    log.debug("Return body: {}".format(response.text))
+                subnets.append((subnet, comment))
+            results = provision_subnets(b1ddi, config, space, subnets, 
+                                        tag_body, workers=workers)
+            if any(results.values()):
+                status = True
 
         else:
             log.warning("--- Address Block {}/{} not created".format(base_net, cidr))
@@ -368,13 +1201,14 @@ def create_networks(b1ddi, config):
     return status
 
 
-def create_ipv6_networks(b1ddi, config):
+def create_ipv6_networks(b1ddi, config, workers=1):
     '''
     Create IPv6 Subnets
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
+        workers (int): Number of subnets to provision concurrently
     
     Returns:
         status (bool): True if successful
@@ -397,53 +1231,36 @@ def create_ipv6_networks(b1ddi, config):
 
         # Create subnets
         cidr = '32'
-        body = ( '{ "address": "' + base_net + '", '
-                + '"cidr": "' + cidr + '", '
-                + '"space": "' + space + '", '
-                + '"comment": "Internal Address Allocation", '
-                + tag_body + ' }' )
+        body = b1_bodies.BodyTemplate((), tag_body, address=base_net,
+                                      cidr=cidr, space=space,
+                                      comment="Internal Address Allocation"
+                                      ).build()
         log.debug("Body:{}".format(body))
         log.info("~~~~ Creating IPv6 Addresses block {}/{}~~~~ "
                 .format(base_net, cidr))
-        response = b1ddi.create('/ipam/address_block', body=body)
+        response = create_step(b1ddi, '/ipam/address_block', body,
+                               f'/ipam/address_block/{base_net}/{cidr}')
 
-        if response.status_code in b1ddi.return_codes_ok:
+        if response is None or response.status_code in b1ddi.return_codes_ok:
             log.info("+++ IPv6 Address block {}/{} created".format(base_net, cidr))
 
             # Create subnets
             network = ipaddress.ip_network(base_net + '/' + cidr)
             # Reset cidr for subnets
             new_cidr = '64'
-            subnets = network.subnets(new_prefix=int(new_cidr))
             if int(new_cidr) > int(cidr) and int(new_cidr) < 127:
                 nets = int(config['no_of_networks'])
                 log.info("~~~~ Creating {} IPv6 subnets ~~~~".format(nets))
-
-                for n in range(nets):
-                    subnet = next(subnets)
-                    address = str(subnet.network_address)
+                ipv6_subnets = []
+                for subnet in b1_planner.iter_subnets(network, int(new_cidr), 
+                                                      nets):
                     comment = net_comments[random.randrange(0,len(net_comments))]
-                    body = ( '{ "address": "' + address + '", '
-                            + '"cidr": "' + new_cidr + '", '
-                            + '"space": "' + space + '", '
-                            + '"comment": "' + comment + '", '
-                            + tag_body + ' }' )
-                    log.debug("Body:{}".format(body))
-                    log.info("Creating IPv6 Subnet {}/{}".format(address, new_cidr))
-                    response = b1ddi.create('/ipam/subnet', body=body)
-
-                    if response.status_code in b1ddi.return_codes_ok:
-                        log.info("+++ IPv6 Subnet {}/{} successfully created".format(address, cidr))
-                        if populate_ipv6_network(b1ddi, config, space, subnet):
-                            log.info("+++ IPv6 Network populated.")
-                            status = True
-                        else:
-                            log.warning("--- Issues populating IPv6 network")
-
-                    else:
-                        log.warning("--- IPv6 Subnet {}/{} not created".format(network, cidr))
-                        log.debug("Return code: {}".format(response.status_code))
-                        log.debug("Return body: {}".format(response.text))
+                    ipv6_subnets.append((subnet, comment))
+                results = provision_subnets(b1ddi, config, space, ipv6_subnets,
+                                            tag_body, ipv6=True, 
+                                            workers=workers)
+                if any(results.values()):
+                    status = True
             else:
                 log.warning(f"IPv6 network block cannot support {new_cidr} subnets")
 
@@ -457,7 +1274,195 @@ def create_ipv6_networks(b1ddi, config):
     return status
 
 
-def populate_network(b1ddi, config, space, network):
+def create_subnet(b1ddi, config, space, subnet, comment, tag_body,
+                  ipv6=False, templates=None):
+    '''
+    Create a subnet and, once it exists, populate it with a range
+    and IP reservations
+
+    Parameters:
+        b1ddi (obj): bloxone.b1ddi object
+        config (obj): ini config object
+        space (str): IP Space id (including path)
+        subnet (obj): ipaddress network object
+        comment (str): Subnet comment/description
+        tag_body (str): JSON tag string to append to body
+        ipv6 (bool): Populate as an IPv6 network
+        templates (dict): Precompiled templates from 
+                          b1_bodies.ipam_templates()
+
+    Returns:
+        status (bool): True if successful
+    '''
+    status = False
+    address = str(subnet.network_address)
+    cidr = str(subnet.prefixlen)
+    if ipv6:
+        label = 'IPv6 Subnet'
+    else:
+        label = 'Subnet'
+    if not templates:
+        templates = b1_bodies.ipam_templates(space, tag_body)
+
+    body = templates['/ipam/subnet'].build(address, cidr, comment)
+    log.debug("Body:{}".format(body))
+    log.info("Creating {} {}/{}".format(label, address, cidr))
+    response = create_step(b1ddi, '/ipam/subnet', body,
+                           f'/ipam/subnet/{address}/{cidr}')
+
+    if response is None or response.status_code in b1ddi.return_codes_ok:
+        log.info("+++ {} {}/{} successfully created".format(label, address, cidr))
+        # Subnet id for next available IP
+        if response is not None:
+            subnet_id = (response.json().get('result') or {}).get('id', '')
+        elif ALLOCATION == 'server':
+            step = f'/ipam/subnet/{address}/{cidr}'
+            subnet_id = ( b1ddi.journal.object_id(step) or
+                          existing_id(b1ddi, '/ipam/subnet', body) )
+        else:
+            subnet_id = ''
+        if ipv6:
+            populated = populate_ipv6_network(b1ddi, config, space, subnet,
+                                              templates=templates,
+                                              subnet_id=subnet_id)
+        else:
+            populated = populate_network(b1ddi, config, space, subnet,
+                                         templates=templates,
+                                         subnet_id=subnet_id)
+        if populated:
+            log.info("+++ Network {} populated.".format(subnet))
+            status = True
+        else:
+            log.warning("--- Issues populating network {}".format(subnet))
+    else:
+        log.warning("--- {} {}/{} not created".format(label, address, cidr))
+        log.debug("Return code: {}".format(response.status_code))
+        log.debug("Return body: {}".format(response.text))
+
+    return status
+
+
+def provision_subnets(b1ddi, config, space, subnets, tag_body,
+                      ipv6=False, workers=1):
+    '''
+    Create and populate a set of subnets, either serially or using a
+    bounded pool of worker threads. Each worker creates its subnet
+    before the associated range and reservations.
+
+    Parameters:
+        b1ddi (obj): bloxone.b1ddi object
+        config (obj): ini config object
+        space (str): IP Space id (including path)
+        subnets (list): List of (ipaddress network, comment) tuples
+        tag_body (str): JSON tag string to append to body
+        ipv6 (bool): Populate as IPv6 networks
+        workers (int): Maximum number of concurrent subnets
+
+    Returns:
+        results (dict): Status (bool) keyed by subnet
+    '''
+    results = {}
+    templates = b1_bodies.ipam_templates(space, tag_body)
+
+    if workers > 1 and len(subnets) > 1:
+        log.info("Provisioning {} subnets using {} workers"
+                 .format(len(subnets), workers))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for subnet, comment in subnets:
+                future = pool.submit(create_subnet, b1ddi, config, space,
+                                     subnet, comment, tag_body, ipv6=ipv6,
+                                     templates=templates)
+                futures[future] = str(subnet)
+            for future in concurrent.futures.as_completed(futures):
+                subnet = futures[future]
+                try:
+                    results[subnet] = future.result()
+                except Exception as err:
+                    log.error("--- Subnet {} failed: {}".format(subnet, err))
+                    results[subnet] = False
+    else:
+        for subnet, comment in subnets:
+            results[str(subnet)] = create_subnet(b1ddi, config, space,
+                                                 subnet, comment, tag_body,
+                                                 ipv6=ipv6, 
+                                                 templates=templates)
+
+    succeeded = list(results.values()).count(True)
+    log.info("~~~~ {} of {} subnets provisioned ~~~~"
+             .format(succeeded, len(results)))
+    for subnet, status in results.items():
+        if not status:
+            log.warning("--- Subnet {} incomplete".format(subnet))
+
+    return results
+
+
+def allocate_reservations(b1ddi, network, subnet_id, no_of_ips):
+    '''
+    Reserve the IPs for a subnet server side using next available IP,
+    requesting all of the IPs at once and the remainder if fewer are 
+    returned. The next available IP action does not take a body, so 
+    the addresses have no tags or comment; they are recorded in the
+    manifest and removed with the subnet
+
+    Parameters:
+        b1ddi (obj): IdCache wrapped bloxone client
+        network (obj): ipaddress network object
+        subnet_id (str): Subnet id, '' if unknown
+        no_of_ips (int): Configured number of IPs
+
+    Returns:
+        bool: True if successful, None if no IPs could be allocated and
+              the client side allocation should be used
+    '''
+    status = None
+    step = f'/ipam/subnet/{network}/nextavailableip'
+    journal = getattr(b1ddi, 'journal', None)
+    if journal and journal.completed(step):
+        log.info(f'~~~~ {step} already complete, skipping')
+        return True
+    if not subnet_id:
+        log.warning("--- Subnet id for {} not found, allocating client "
+                    "side".format(network))
+        return None
+
+    count = b1_planner.reservation_total(network, no_of_ips)
+    log.info("~~~~ Allocating {} IPs in {} ~~~~".format(count, network))
+    allocated = 0
+    while allocated < count:
+        response = b1ddi.next_available_ip('/ipam/subnet', subnet_id, 
+                                           count=count - allocated)
+        if response.status_code in b1ddi.return_codes_ok:
+            addresses = response.json().get('results') or []
+            log.debug("Allocated: {}".format(
+                [ a.get('address') for a in addresses ]))
+            if not addresses:
+                break
+            allocated += len(addresses)
+        else:
+            log.debug("Return code: {}".format(response.status_code))
+            log.debug("Return body: {}".format(response.text))
+            break
+
+    if allocated == count:
+        log.info("+++ {} IPs allocated in {}".format(count, network))
+        if journal:
+            journal.record(step)
+        status = True
+    elif allocated:
+        log.warning("--- Only {} of {} IPs allocated in {}"
+                    .format(allocated, count, network))
+        status = False
+    else:
+        log.warning("--- Next available IP failed for {}, allocating "
+                    "client side".format(network))
+
+    return status
+
+
+def populate_network(b1ddi, config, space, network, templates=None,
+                     subnet_id=''):
     '''
     Create DHCP Range and IPs
 
@@ -465,6 +1470,9 @@ def populate_network(b1ddi, config, space, network):
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
         network (str): Network base address
+        templates (dict): Precompiled templates from 
+                          b1_bodies.ipam_templates()
+        subnet_id (str): Subnet id, used for server side allocation
     
     Returns:
         status (bool): True if successful
@@ -472,21 +1480,18 @@ def populate_network(b1ddi, config, space, network):
     status = False
 
     log.info("~~~~ Creating Range ~~~~")
-    tag_body = create_tag_body(config)
+    if not templates:
+        templates = b1_bodies.ipam_templates(space, create_tag_body(config))
 
-    net_size = network.num_addresses
-    range_size = int(net_size / 2)
-    broadcast = network.broadcast_address
-    start_ip = str(broadcast - (range_size + 1))
-    end_ip = str(broadcast - 1)
+    start_ip, end_ip = [ str(ip) for ip in b1_planner.dhcp_range(network) ]
 
-    body = ( '{ "start": "' + start_ip + '", "end": "' + end_ip +
-            '", "space": "' + space + '", '  + tag_body + ' }' )
+    body = templates['/ipam/range'].build(start_ip, end_ip)
     log.debug("Body:{}".format(body))
 
     log.info("Creating Range start: {}, end: {}".format(start_ip, end_ip))
-    response = b1ddi.create('/ipam/range', body=body)
-    if response.status_code in b1ddi.return_codes_ok:
+    response = create_step(b1ddi, '/ipam/range', body,
+                           f'/ipam/range/{start_ip}-{end_ip}')
+    if response is None or response.status_code in b1ddi.return_codes_ok:
         log.info("+++ Range created in network {}".format(str(network)))
         status = True
     else:
@@ -495,22 +1500,24 @@ def populate_network(b1ddi, config, space, network):
         log.debug("Return body: {}".format(response.text))
 
     # Add reservations
+    if ALLOCATION == 'server':
+        allocated = allocate_reservations(b1ddi, network, subnet_id,
+                                          config['no_of_ips'])
+        if allocated is not None:
+            return status and allocated
 
-    no_of_ips = int(range_size / 2)
-    # If number requested is lt than caluculated use configured
-    if int(config['no_of_ips']) < no_of_ips:
-        no_of_ips = int(config['no_of_ips'])
+    no_of_ips = b1_planner.reservation_count(network, config['no_of_ips'])
     log.info("~~~~ Creating {} IPs ~~~~".format(no_of_ips))
-    ips = list(network.hosts())
-    for ip in range(1, no_of_ips):
-        address = str(ips[ip])
-        body = ( '{ "address": "' + address + '", "space": "' 
-                + space + '", '  + tag_body + ' }' )
+    reservation = templates['/ipam/address']
+    for ip in b1_planner.iter_reservations(network, config['no_of_ips']):
+        address = str(ip)
+        body = reservation.build(address)
         log.debug("Body:{}".format(body))
 
         log.info("Creating IP Reservation: {}".format(address))
-        response = b1ddi.create('/ipam/address', body=body)
-        if response.status_code in b1ddi.return_codes_ok:
+        response = create_step(b1ddi, '/ipam/address', body,
+                               f'/ipam/address/{address}')
+        if response is None or response.status_code in b1ddi.return_codes_ok:
             log.info("+++ IP {} created".format(address))
             status = True
         else:
@@ -522,7 +1529,8 @@ def populate_network(b1ddi, config, space, network):
     return status
 
 
-def populate_ipv6_network(b1ddi, config, space, network):
+def populate_ipv6_network(b1ddi, config, space, network, templates=None,
+                          subnet_id=''):
     '''
     Create DHCP Range and IPs
 
@@ -530,6 +1538,9 @@ def populate_ipv6_network(b1ddi, config, space, network):
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
         network (str): Network base address
+        templates (dict): Precompiled templates from 
+                          b1_bodies.ipam_templates()
+        subnet_id (str): Subnet id, used for server side allocation
     
     Returns:
         status (bool): True if successful
@@ -537,21 +1548,18 @@ def populate_ipv6_network(b1ddi, config, space, network):
     status = False
 
     log.info("~~~~ Creating IPv6 Range ~~~~")
-    tag_body = create_tag_body(config)
+    if not templates:
+        templates = b1_bodies.ipam_templates(space, create_tag_body(config))
 
-    net_size = network.num_addresses
-    range_size = int(net_size / 2)
-    broadcast = network.broadcast_address
-    start_ip = str(network.network_address) + 'ffff'
-    end_ip = str(broadcast - 1)
+    start_ip, end_ip = [ str(ip) for ip in b1_planner.dhcp_range(network) ]
 
-    body = ( '{ "start": "' + start_ip + '", "end": "' + end_ip +
-            '", "space": "' + space + '", '  + tag_body + ' }' )
+    body = templates['/ipam/range'].build(start_ip, end_ip)
     log.debug("Body:{}".format(body))
 
     log.info("Creating IPv6 Range start: {}, end: {}".format(start_ip, end_ip))
-    response = b1ddi.create('/ipam/range', body=body)
-    if response.status_code in b1ddi.return_codes_ok:
+    response = create_step(b1ddi, '/ipam/range', body,
+                           f'/ipam/range/{start_ip}-{end_ip}')
+    if response is None or response.status_code in b1ddi.return_codes_ok:
         log.info("+++ IPv6 Range created in network {}".format(str(network)))
         status = True
     else:
@@ -560,22 +1568,24 @@ def populate_ipv6_network(b1ddi, config, space, network):
         log.debug("Return body: {}".format(response.text))
 
     # Add reservations
+    if ALLOCATION == 'server':
+        allocated = allocate_reservations(b1ddi, network, subnet_id,
+                                          config['no_of_ips'])
+        if allocated is not None:
+            return status and allocated
 
-    no_of_ips = int(range_size / 2)
-    # If number requested is lt than caluculated use configured
-    if int(config['no_of_ips']) < no_of_ips:
-        no_of_ips = int(config['no_of_ips'])
+    no_of_ips = b1_planner.reservation_count(network, config['no_of_ips'])
     log.info("~~~~ Creating {} IPs ~~~~".format(no_of_ips))
-    ips = network.hosts()
-    for ip in range(no_of_ips):
-        address = str(next(ips))
-        body = ( '{ "address": "' + address + '", "space": "' 
-                + space + '", '  + tag_body + ' }' )
+    reservation = templates['/ipam/address']
+    for ip in b1_planner.iter_reservations(network, config['no_of_ips']):
+        address = str(ip)
+        body = reservation.build(address)
         log.debug("Body:{}".format(body))
 
         log.info("Creating IPv6 Reservation: {}".format(address))
-        response = b1ddi.create('/ipam/address', body=body)
-        if response.status_code in b1ddi.return_codes_ok:
+        response = create_step(b1ddi, '/ipam/address', body,
+                               f'/ipam/address/{address}')
+        if response is None or response.status_code in b1ddi.return_codes_ok:
             log.info("+++ IP {} created".format(address))
             status = True
         else:
@@ -587,21 +1597,24 @@ def populate_ipv6_network(b1ddi, config, space, network):
     return status
 
 
-def populate_dns(b1ddi, config):
+def populate_dns(b1ddi, config, ipv6=False, workers=1, window=0):
     '''
     Populate DNS View with zones/records
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
-        view (str): Network base address
+        ipv6 (bool): Also create AAAA records
+        workers (int): Number of concurrent record senders
+        window (int): Maximum number of records in flight
     
     Returns:
         bool: True if successful
     '''
     status = False
 
-    if create_zones(b1ddi, config):
+    if create_zones(b1ddi, config, ipv6=ipv6, workers=workers, 
+                    window=window):
         status = True
     else:
         status = False
@@ -626,13 +1639,16 @@ def create_hosts(b1ddi, config):
     return status
 
 
-def create_zones(b1ddi, config):
+def create_zones(b1ddi, config, ipv6=False, workers=1, window=0):
     '''
     Create DNS Zones
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
+        ipv6 (bool): Also create AAAA records
+        workers (int): Number of concurrent record senders
+        window (int): Maximum number of records in flight
     
     Returns:
         status (bool): True if successful
@@ -653,14 +1669,15 @@ def create_zones(b1ddi, config):
         if nsg:
             # Prepare Body
             tag_body = create_tag_body(config)
+            zone_template = b1_bodies.BodyTemplate(('fqdn',), tag_body,
+                                                   view=view, nsgs=[ nsg ],
+                                                   primary_type='cloud')
             zone = config['dns_domain']
-            body = ( '{ "fqdn": "' + zone + '", "view": "' + view + '", ' 
-                    + '"nsgs": ["' + nsg + '"], '
-                    + '"primary_type": "cloud", '
-                    + tag_body + ' }' )
+            body = zone_template.build(zone)
             # Create zone
-            response = b1ddi.create('/dns/auth_zone', body)
-            if response.status_code in b1ddi.return_codes_ok:
+            response = create_step(b1ddi, '/dns/auth_zone', body,
+                                   f'/dns/auth_zone/{zone}')
+            if response is None or response.status_code in b1ddi.return_codes_ok:
                 log.info("+++ Zone {} created in view".format(zone))
             else:
                 # Log error
@@ -674,14 +1691,12 @@ def create_zones(b1ddi, config):
             # Remove "last" two octets
             r_network = bloxone.utils.get_domain(r_network, no_of_labels=2)
             zone = r_network + '.in-addr.arpa.'
-            body = ( '{ "fqdn": "' + zone + '", "view": "' + view + '", ' 
-                    + '"nsgs": ["' + nsg + '"], '
-                    + '"primary_type": "cloud", '
-                    + tag_body + ' }' )
+            body = zone_template.build(zone)
 
             # Create reverse zone
-            response = b1ddi.create('/dns/auth_zone', body)
-            if response.status_code in b1ddi.return_codes_ok:
+            response = create_step(b1ddi, '/dns/auth_zone', body,
+                                   f'/dns/auth_zone/{zone}')
+            if response is None or response.status_code in b1ddi.return_codes_ok:
                 log.info("+++ Zone {} created in view".format(zone))
             else:
                 # Log error
@@ -691,7 +1706,8 @@ def create_zones(b1ddi, config):
                 log.debug("Return body: {}".format(response.text))
 
             # Add Records to zones
-            if add_records(b1ddi, config):
+            if add_records(b1ddi, config, ipv6=ipv6, workers=workers,
+                           window=window):
                 log.info("+++ Records added to zones")
                 status = True
             else:
@@ -717,9 +1733,19 @@ def create_dnsview(b1ddi, config):
         bool: True if successful
     '''
     status = False
+    journal = getattr(b1ddi, 'journal', None)
+    step = '/dns/view/' + config['dns_view']
 
     # Check for existence
-    if not b1ddi.get_id('/dns/view', key="name", value=config['dns_view']):
+    resumed = journal and journal.completed(step)
+    id = '' if resumed else b1ddi.get_id('/dns/view', key="name", 
+                                         value=config['dns_view'],
+                                         include_path=True)
+    if resumed:
+        log.info("DNS View {} already created, resuming"
+                 .format(config['dns_view']))
+        status = True
+    elif not id:
         log.info("---- Create DNS View ----")
 
         tag_body = create_tag_body(config)
@@ -729,77 +1755,224 @@ def create_dnsview(b1ddi, config):
                                 value=config['ip_space'],
                                 include_path=True)
         if ip_space:
-            ip_spaces = '"ip_spaces": [ "' + ip_space + '"]'
-            body = ( '{ "name": "' + config['dns_view'] + '",' 
-                    + ip_spaces + ',' + tag_body +' }' )
+            body = b1_bodies.BodyTemplate((), tag_body,
+                                          name=config['dns_view'],
+                                          ip_spaces=[ ip_space ]).build()
         else:
-            body = '{ "name": "' + config['dns_view'] + '",' + tag_body +' }'
+            body = b1_bodies.BodyTemplate((), tag_body,
+                                          name=config['dns_view']).build()
 
         log.debug("Body:{}".format(body))
         log.info("Creating DNS View {}".format(config['dns_view']))
-        response = b1ddi.create('/dns/view', body=body)
-        if response.status_code in b1ddi.return_codes_ok:
+        response = create_step(b1ddi, '/dns/view', body, step)
+        if response is None or response.status_code in b1ddi.return_codes_ok:
             log.info("DNS View {} Created".format(config['dns_view']))
             status = True
         else:
             log.warning("DNS View {} not created".format(config['dns_view']))
             log.debug("Return code: {}".format(response.status_code))
             log.debug("Return body: {}".format(response.text))
+    elif journal and journal.steps:
+        # Created by the interrupted run before the step was recorded
+        log.info("DNS View {} already exists, resuming"
+                 .format(config['dns_view']))
+        journal.record(step, id)
+        status = True
     else:
         log.warning("DNS View {} already exists".format(config['dns_view']))
    
     return status
 
 
-def add_records(b1ddi, config):
+def iter_record_bodies(zone_id, network, no_of_records, tag_body,
+                       create_ptr=True, ptr_network=None):
     '''
-    Add records to zone
+    Generate host records for the zone, A or AAAA depending on the
+    address family of network
+
+    Parameters:
+        zone_id (str): Zone id (including path)
+        network (obj): ipaddress network object for record addresses
+        no_of_records (int): number of records to create
+        tag_body (str): JSON tag string to append to body
+        create_ptr (bool): Request creation of the PTR record
+        ptr_network (obj): If set, only request PTRs for addresses in
+                           this network, i.e. the reverse zone
+
+    Yields:
+        tuple: (hostname, address, body)
+    '''
+    if network.version == 6:
+        rtype = 'AAAA'
+    else:
+        rtype = 'A'
+    template = b1_bodies.record_template(zone_id, rtype, create_ptr, tag_body)
+    no_ptr = b1_bodies.record_template(zone_id, rtype, False, tag_body)
+
+    addresses = b1_planner.iter_hosts(network, no_of_records)
+    for n, ip in enumerate(addresses, start=1):
+        hostname = "host" + str(n)
+        address = str(ip)
+        if ptr_network and ip not in ptr_network:
+            body = no_ptr.build(hostname, { "address": address })
+        else:
+            body = template.build(hostname, { "address": address })
+        yield hostname, address, body
+
+    return
+
+
+def create_record(b1ddi, zone, hostname, address, body):
+    '''
+    Create a single DNS record
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         zone (str): Name of zone
-        view
-        no_of_records (int): number of records to create
-        type (str): Record type
-    
+        hostname (str): Name in zone
+        address (str): Record address
+        body (str): JSON formatted data payload
+
     Returns:
         bool: True if successful
     '''
     status = False
-    zone_id = ''
+    log.debug("Body: {}".format(body))         
+    response = create_step(b1ddi, '/dns/record', body,
+                           f'/dns/record/{zone}/{hostname}/{address}')
+    if response is None or response.status_code in b1ddi.return_codes_ok:
+        log.info("Created record: {}.{} with IP {}"
+                 .format(hostname, zone, address))
+        status = True
+    else:
+        log.warning("Failed to create record {}.{}"
+                    .format(hostname, zone))
+        log.debug("Return code: {}".format(response.status_code))
+        log.debug("Return body: {}".format(response.text))
+
+    return status
+
+
+def send_records(b1ddi, zone, records, total=0, workers=1, window=0):
+    '''
+    Create records from a generator using a bounded pool of senders. At
+    most window records are in flight, so records are only generated as
+    capacity becomes available. Progress is reported in records/sec.
+
+    Parameters:
+        b1ddi (obj): bloxone.b1ddi object
+        zone (str): Name of zone
+        records (iter): Iterable of (hostname, address, body) tuples
+        total (int): Expected number of records for progress reporting
+        workers (int): Number of concurrent senders
+        window (int): Maximum number of records in flight, 
+                      defaults to twice the number of workers
+
+    Returns:
+        record_count (int): Number of records created
+    '''
+    record_count = 0
+    processed = 0
+    workers = max(workers, 1)
+    window = max(window or (workers * 2), workers)
+    report_every = max(int(total / 10), 100)
+    in_flight = set()
+    start_timer = time.perf_counter()
+
+    log.info("~~~~ Creating {} DNS Records ({} workers, window {}) ~~~~"
+             .format(total, workers, window))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            if len(in_flight) >= window:
+                done, in_flight = concurrent.futures.wait(in_flight,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    processed += 1
+                    record_count += future.result()
+                    if processed % report_every == 0:
+                        log_rate('records', processed, total, start_timer)
+            in_flight.add(pool.submit(create_record, b1ddi, zone, *record))
+
+        for future in concurrent.futures.as_completed(in_flight):
+            processed += 1
+            record_count += future.result()
+            if processed % report_every == 0:
+                log_rate('records', processed, total, start_timer)
+
+    if processed % report_every:
+        log_rate('records', processed, total, start_timer)
+
+    return record_count
+
+
+def log_rate(label, count, total, start_timer):
+    '''
+    Log progress and rate
+
+    Parameters:
+        label (str): Object description, e.g. records
+        count (int): Number processed
+        total (int): Expected total
+        start_timer (float): time.perf_counter() at start
+    '''
+    elapsed = time.perf_counter() - start_timer
+    rate = count / elapsed if elapsed else 0
+    log.info(f'~~~~ {count}/{total} {label} in {elapsed:0.2f}S, '
+             f'{rate:0.1f} {label}/sec ~~~~')
+
+    return
+
+
+def add_records(b1ddi, config, ipv6=False, workers=1, window=0):
+    '''
+    Add records to zone
+
+    Parameters:
+        b1ddi (obj): bloxone.b1ddi object
+        config (obj): ini config object
+        ipv6 (bool): Also create AAAA records
+        workers (int): Number of concurrent senders
+        window (int): Maximum number of records in flight
+    
+    Returns:
+        bool: True if successful
+    '''
+    status = False
+    zone_id = ''
     zone = config['dns_domain']
 
     view = b1ddi.get_id('/dns/view', key="name", 
                         value=config['dns_view'], include_path=True)
     if view:
         filter = ( '(fqdn=="' + zone + '")and(view=="' + view + '")' )
-        # Get zone id
-        response  = b1ddi.get('/dns/auth_zone', 
-                                _filter=filter, 
-                                _fields="fqdn,id") 
-        if response.status_code in b1ddi.return_codes_ok:
-            if 'results' in response.json().keys():
-                zones = response.json()['results']
-                if len(zones) == 1:
-                    zone_id = zones[0]['id']
-                    log.debug("Zone ID: {} Found".format(zone_id))
-                else:
-                    log.warning("Too many results returned for zone {}"
-                                .format(zone))
+        # Get zone id, two results are enough to detect duplicates
+        try:
+            zones = list(itertools.islice(iter_objects(b1ddi, 
+                                                       '/dns/auth_zone', 
+                                                       page_size=2,
+                                                       _filter=filter,
+                                                       _fields="fqdn,id"), 
+                                          2))
+            if len(zones) == 1:
+                zone_id = zones[0]['id']
+                log.debug("Zone ID: {} Found".format(zone_id))
+            elif zones:
+                log.warning("Too many results returned for zone {}"
+                            .format(zone))
             else:
                 log.warning("No results returned for zone {}"
                             .format(zone))
-                log.debug("Return code: {}".format(response.status_code))
-                log.debug("Return body: {}".format(response.text))
-        else:
+        except APIError as err:
             log.error("--- Request for zone {} failed".format(zone))
-            log.debug("Return code: {}".format(response.status_code))
-            log.debug("Return body: {}".format(response.text))
+            log.debug(err)
 
         # Create Records
         if zone_id:
-            record_count = 0
             network = ipaddress.ip_network(config['base_net'] + '/' + config['cidr'])
+            # Use the address block for more records than fit in a subnet
+            if int(config['no_of_records']) > int(network.num_addresses) - 2:
+                network = ipaddress.ip_network(config['base_net'] + '/' 
+                                               + config['container_cidr'])
             net_size = int(network.num_addresses) - 2
             # Check we can fit no_of_records in network
             if int(config['no_of_records']) > net_size:
@@ -810,28 +1983,22 @@ def add_records(b1ddi, config):
             tag_body = create_tag_body(config)
 
             # Generate records and add to zone
-            for n in range(1, (no_of_records + 1)):
-                hostname = "host" + str(n)
-                address = str(network.network_address + n)
-                body = ( '{"name_in_zone":"' + hostname + '",' +
-                         '"zone": "' + zone_id + '",' +
-                         '"type": "A", ' +
-                         '"rdata": {"address": "' + address + '"}, ' +
-                         '"options": {"create_ptr": true},' + 
-                         '"inheritance_sources": ' +
-                         '{"ttl": {"action": "inherit"}}, ' +
-                         tag_body + ' }' )
-                log.debug("Body: {}".format(body))         
-                response = b1ddi.create('/dns/record', body)
-                if response.status_code in b1ddi.return_codes_ok:
-                    log.info("Created record: {}.{} with IP {}"
-                             .format(hostname, zone, address))
-                    record_count += 1
-                else:
-                    log.warning("Failed to create record {}.{}"
-                                .format(hostname, zone))
-                    log.debug("Return code: {}".format(response.status_code))
-                    log.debug("Return body: {}".format(response.text))
+            # PTRs only for addresses in the reverse zone
+            ptr_network = b1_planner.reverse_network(config['base_net'])
+            records = iter_record_bodies(zone_id, network, no_of_records, 
+                                         tag_body, ptr_network=ptr_network)
+            if ipv6:
+                # No ip6.arpa zone is created so AAAA records have no PTR
+                prefix = config.get('ipv6_prefix') or '2001:db8::'
+                v6_network = ipaddress.ip_network(prefix + '/64')
+                records = itertools.chain(records,
+                            iter_record_bodies(zone_id, v6_network, 
+                                               no_of_records, tag_body,
+                                               create_ptr=False))
+                no_of_records *= 2
+            record_count = send_records(b1ddi, zone, records, 
+                                        total=no_of_records,
+                                        workers=workers, window=window)
             if record_count == no_of_records:
                 log.info("+++ Successfully created {} DNS Records"
                          .format(record_count))
@@ -851,14 +2018,19 @@ def add_records(b1ddi, config):
     return status
 
 
-def create_demo(b1ddi, config, ipv6=False):
+def create_demo(b1ddi, config, ipv6=False, workers=1, window=0):
     '''
-    Create the demo data
+    Create the demo data. The IPv4 and IPv6 networks and the DNS view
+    only depend on the IP Space, so are created concurrently, as are
+    the zones and records once the view exists.
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
         ipv6 (bool): Build IPv6 networks
+        workers (int): Number of concurrent tasks, and subnets to
+                       provision concurrently
+        window (int): Maximum number of DNS records in flight
     
     Returns:
         status (bool): True if successful
@@ -866,47 +2038,38 @@ def create_demo(b1ddi, config, ipv6=False):
     '''
     exitcode = 0
 
-    # Create IP Space
-    if ip_space(b1ddi, config):
-        # Create network structure
-        if create_networks(b1ddi, config):
-            log.info("+++ Successfully Populated IP Space")
-            if ipv6:
-                log.info("~~~ Creating IPv6 Networks ~~~")
-                if create_ipv6_networks(b1ddi, config):
-                    log.info("+++ Successfully Populated IPv6 in IP Space")
-                else:
-                    log.error("--- Failed to create IPv6 networks in {}"
-                            .format(config['ip_space']))
-                    exitcode = 1
-        else:
-            log.error("--- Failed to create networks in {}"
-                    .format(config['ip_space']))
-            exitcode = 1
-    else:
-        exitcode = 1
-
-    # Create DNS View 
-    if create_dnsview(b1ddi, config):
-        if populate_dns(b1ddi, config):
-            log.info("+++ Successfully Populated DNS View")
-        else:
-            log.error("--- Failed to create zones in {}"
-                    .format(config['dns_view']))
-            exitcode = 1
+    graph = b1_taskgraph.TaskGraph('B1DDI demo')
+    graph.add('ip_space', ip_space, b1ddi, config)
+    graph.add('networks', create_networks, b1ddi, config, workers=workers,
+              requires=[ 'ip_space' ])
+    if ipv6:
+        graph.add('ipv6_networks', create_ipv6_networks, b1ddi, config,
+                  workers=workers, requires=[ 'ip_space' ])
+    # The view is associated with the IP Space if it exists
+    graph.add('dns_view', create_dnsview, b1ddi, config, after=[ 'ip_space' ])
+    graph.add('dns', populate_dns, b1ddi, config, ipv6=ipv6, workers=workers,
+              window=window, requires=[ 'dns_view' ])
+
+    if graph.run(workers=workers):
+        log.info("+++ Successfully Populated IP Space and DNS View")
     else:
+        failed = [ t.name for t in graph.tasks.values() if t.status != 'ok' ]
+        log.error("--- Demo data incomplete, failed: {}"
+                  .format(', '.join(failed)))
         exitcode = 1
+    graph.log_summary(logger=log)
     
     return exitcode
 
 
-def clean_up(b1ddi, config):
+def clean_up(b1ddi, config, workers=1):
     '''
     Clean Up Demo Data
 
     Parameters:
         b1ddi (obj): bloxone.b1ddi object
         config (obj): ini config object
+        workers (int): Number of concurrent zone deletes
     
     Returns:
         bool: True if successful
@@ -917,7 +2080,7 @@ def clean_up(b1ddi, config):
     id = b1ddi.get_id('/dns/view', key="name", value=config['dns_view'])
     if id:
         log.info("Cleaning up Zones for DNS View {}".format(config['dns_view']))
-        if clean_up_zones(b1ddi, id):
+        if clean_up_zones(b1ddi, id, workers=workers):
             log.info("Deleting DNS View {}".format(config['dns_view']))
             response = b1ddi.delete('/dns/view', id=id)
             if response.status_code in b1ddi.return_codes_ok:
@@ -934,6 +2097,12 @@ def clean_up(b1ddi, config):
         log.warning("DNS View {} not fonud.".format(config['dns_view'])) 
         exitcode = 1 
 
+    # The IP Space is referenced by the view so only delete once it is gone
+    if exitcode and id:
+        log.warning("DNS View {} still present, IP Space {} not deleted"
+                    .format(config['dns_view'], config['ip_space']))
+        return exitcode
+
     # Check for existence
     id = b1ddi.get_id('/ipam/ip_space', key="name", value=config['ip_space'])
     if id:
@@ -953,48 +2122,286 @@ def clean_up(b1ddi, config):
     return exitcode
 
 
-def clean_up_zones(b1ddi, view_id):
+def object_url(client, objpath, **params):
     '''
-    Clean up zones for specified view id
+    Build the full URL for objpath using the API of the client
 
     Parameters:
+        client (obj): bloxone.b1ddi or bloxone.b1tdc object
+        objpath (str): Swagger object path
+        params: Query parameters
 
     Returns:
-        bool: True if successful
+        url (str)
     '''
-    status = False
-    filter = 'view=="' + view_id + '"'
-    response = b1ddi.get('/dns/auth_zone', _filter=filter, _fields="fqdn,id")
+    client = getattr(client, '_client', client)
+    if isinstance(client, bloxone.b1tdc):
+        url = client.tdc_url + objpath
+    else:
+        url = client.ddi_url + objpath
 
-    if response.status_code in b1ddi.return_codes_ok:
-        if 'results' in response.json().keys():
-            zones = response.json()['results']
-            if len(zones):
-                for zone in zones:
-                    id = zone['id'].split('/')[2]
-                    log.info("Deleting zone {}".format(zone['fqdn']))
-                    r = b1ddi.delete('/dns/auth_zone', id=id)
-                    if r.status_code in b1ddi.return_codes_ok:
-                        log.info("+++ Zone {} deleted successfully"
-                                 .format(zone['fqdn']))
-                        status = True
-                    else:
-                        log.info("--- Zone {} not deleted".format(zone['fqdn']))
-                        log.debug("Return code: {}"
-                                  .format(response.status_code))
-                        log.debug("Return body: {}".format(response.text))
-                        status = False
+    return client._add_params(url, **params)
+
+
+def stream_get(client, url):
+    '''
+    GET url without reading the response body, using the rate
+    governor and recording the call in the API metrics
+
+    Parameters:
+        client (obj): bloxone client object
+        url (str): Request URL
+
+    Returns:
+        response object, the caller must close the response
+    '''
+    def get(url):
+        start = time.perf_counter()
+        try:
+            if TRANSPORT:
+                response = TRANSPORT.request('GET', url, headers=client.headers,
+                                             stream=True)
             else:
-                log.info("No zones present")
-                status = True
+                response = requests.request('GET', url, headers=client.headers,
+                                            stream=True)
+        except requests.exceptions.RequestException:
+            b1_metrics.METRICS.record('GET', url, 0, 0, 0,
+                                      time.perf_counter() - start)
+            raise
+        b1_metrics.METRICS.record('GET', url, response.status_code, 0,
+                                  int(response.headers.get('Content-Length') 
+                                      or 0),
+                                  time.perf_counter() - start)
+        return response
+
+    if GOVERNOR:
+        response = GOVERNOR.request(get, url)
+    else:
+        response = get(url)
+
+    return response
+
+
+def iter_stream(response):
+    '''
+    Incrementally parse a collection response using ijson, so that
+    only one object is held in memory at a time
+
+    Parameters:
+        response (obj): Streamed response object
+
+    Yields:
+        tuple: ('result', object) for each result, or 
+               ('page_token', token)
+    '''
+    builder = None
+    response.raw.decode_content = True
+    for prefix, event, value in ijson.parse(response.raw):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'results.item' and event == 'end_map':
+                yield 'result', builder.value
+                builder = None
+        elif prefix == 'results.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix in PAGE_TOKEN_FIELDS and event == 'string':
+            yield 'page_token', value
+
+    return
+
+
+def get_page(client, objpath, stream=False, **params):
+    '''
+    Retrieve a single page of a collection
+
+    Parameters:
+        client (obj): bloxone client object
+        objpath (str): Swagger object path
+        stream (bool): Parse the page incrementally
+        params: Query parameters
+
+    Yields:
+        tuple: ('result', object) for each result, or 
+               ('page_token', token)
+
+    Raises:
+        APIError
+    '''
+    if stream:
+        response = stream_get(client, object_url(client, objpath, **params))
+        try:
+            if response.status_code not in client.return_codes_ok:
+                log.debug("Return code: {}".format(response.status_code))
+                log.debug("Return body: {}".format(response.text))
+                raise APIError(f'Request for {objpath} failed: '
+                               f'{response.status_code}')
+            yield from iter_stream(response)
+        finally:
+            response.close()
+    else:
+        response = client.get(objpath, **params)
+        if response.status_code not in client.return_codes_ok:
+            log.debug("Return code: {}".format(response.status_code))
+            log.debug("Return body: {}".format(response.text))
+            raise APIError(f'Request for {objpath} failed: '
+                           f'{response.status_code}')
+        data = response.json()
+        for obj in data.get('results', []):
+            yield 'result', obj
+        for field in PAGE_TOKEN_FIELDS:
+            if data.get(field):
+                yield 'page_token', data[field]
+
+    return
+
+
+def iter_objects(client, objpath, page_size=100, stream=False, **params):
+    '''
+    Lazily yield objects from a collection, a page at a time, using 
+    _limit/_offset paging, or _page_token where the API returns a page
+    token. Callers can stop early, e.g. once a match is found, and no
+    further pages are requested.
+
+    Parameters:
+        client (obj): bloxone client object
+        objpath (str): Swagger object path
+        page_size (int): Number of objects per request
+        stream (bool): Parse each page incrementally if the optional
+                       ijson module is installed, so peak memory is
+                       independent of the page size
+        params: Additional query parameters, e.g. _filter, _fields
+
+    Yields:
+        dict: API object
+
+    Raises:
+        APIError
+    '''
+    stream = bool(stream and ijson)
+    offset = 0
+    token = ''
+    while True:
+        if token:
+            paging = { '_limit': page_size, '_page_token': token }
         else:
-            log.info("No results for view")
+            paging = { '_limit': page_size, '_offset': offset }
+        count = 0
+        token = ''
+        for kind, value in get_page(client, objpath, stream=stream,
+                                    **paging, **params):
+            if kind == 'result':
+                count += 1
+                yield value
+            else:
+                token = value
+        if token and count:
+            continue
+        # Stop on a short page, or if paging is not supported
+        if token or count != page_size:
+            break
+        offset += page_size
+
+    return
+
+
+def delete_zone(b1ddi, zone):
+    '''
+    Delete an authoritative zone and time the request
+
+    Parameters:
+        b1ddi (obj): bloxone.b1ddi object
+        zone (dict): Zone object with fqdn and id
+
+    Returns:
+        tuple: (status (bool), elapsed seconds)
+    '''
+    status = False
+    id = zone['id'].rsplit('/', 1)[-1]
+    start_timer = time.perf_counter()
+    response = b1ddi.delete('/dns/auth_zone', id=id)
+    elapsed = time.perf_counter() - start_timer
+    if response.status_code in b1ddi.return_codes_ok:
+        log.info("+++ Zone {} deleted successfully in {:0.2f}S"
+                 .format(zone['fqdn'], elapsed))
+        status = True
+    elif response.status_code == 404:
+        log.info("+++ Zone {} already deleted".format(zone['fqdn']))
+        status = True
     else:
-        log.info("--- Unable to retrieve zones for view id = {}"
-                 .format(view_id))
+        log.info("--- Zone {} not deleted".format(zone['fqdn']))
         log.debug("Return code: {}".format(response.status_code))
         log.debug("Return body: {}".format(response.text))
-        status = False
+
+    return status, elapsed
+
+
+def clean_up_zones(b1ddi, view_id, workers=1, page_size=100):
+    '''
+    Clean up zones for specified view id. Zones are paged from the API and
+    deleted using a bounded pool of workers. Passes are repeated until the
+    view is confirmed to have no zones, or no further progress is made.
+
+    Parameters:
+        b1ddi (obj): bloxone.b1ddi object
+        view_id (str): DNS View id
+        workers (int): Number of concurrent deletes
+        page_size (int): Number of zones retrieved per request
+
+    Returns:
+        bool: True if successful
+    '''
+    status = False
+    filter = 'view=="' + view_id + '"'
+    timings = {}
+    failed = set()
+    start_timer = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        while True:
+            # Deletes shift later pages, so repeat until a pass finds nothing
+            futures = {}
+            listed = 0
+            try:
+                for zone in iter_objects(b1ddi, '/dns/auth_zone', 
+                                         page_size=page_size,
+                                         _filter=filter, 
+                                         _fields="fqdn,id"):
+                    listed += 1
+                    if zone['id'] in failed or zone['id'] in timings:
+                        continue
+                    log.info("Deleting zone {}".format(zone['fqdn']))
+                    futures[pool.submit(delete_zone, b1ddi, zone)] = zone
+            except APIError as err:
+                log.info("--- Unable to retrieve zones for view id = {}"
+                         .format(view_id))
+                log.debug(err)
+                break
+
+            if not futures:
+                if listed:
+                    log.warning("--- {} zones could not be deleted"
+                                .format(listed))
+                else:
+                    log.info("No zones present")
+                    status = True
+                break
+
+            for future in concurrent.futures.as_completed(futures):
+                zone = futures[future]
+                deleted, elapsed = future.result()
+                if deleted:
+                    timings[zone['id']] = (zone['fqdn'], elapsed)
+                else:
+                    failed.add(zone['id'])
+
+    end_timer = time.perf_counter() - start_timer
+    if timings:
+        slowest = max(timings.values(), key=lambda t: t[1])
+        log.info("~~~~ {} zones deleted in {:0.2f}S, {} failed, "
+                 "slowest {} {:0.2f}S ~~~~"
+                 .format(len(timings), end_timer, len(failed), 
+                         slowest[0], slowest[1]))
     
     return status
 
@@ -1034,16 +2441,34 @@ def check_config(config):
     return config_ok
 
 
-def b1ddi_automation_demo(b1ini, config={}, ipv6=False, remove=False):
+def b1ddi_automation_demo(b1ini, config={}, ipv6=False, remove=False, 
+                          workers=1, backend='serial', window=0):
     '''
+    Create or remove the B1DDI demo data
+
+    Parameters:
+        b1ini (str): Name of inifile for bloxone module
+        config (obj): ini config object
+        ipv6 (bool): Build IPv6 networks
+        remove (bool): Clean-up demo data
+        workers (int): Number of concurrent workers/requests
+        backend (str): Provisioning backend, 'serial' or 'async'
+        window (int): Maximum number of DNS records in flight
+
+    Returns:
+        status (int): exitcode
     '''
     status = 0
     log.info("====== B1DDI Automation Demo Version {} ======"
             .format(__version__))
 
 
-    # Instatiate bloxone 
-    b1ddi = bloxone.b1ddi(b1ini)
+    # Instatiate bloxone with per-run id cache, manifest and journal
+    manifest = Manifest(manifest_filename(config, 'b1ddi'), config, 'b1ddi')
+    journal = Journal(manifest_filename(config, 'b1ddi', kind='journal'),
+                      config, 'b1ddi')
+    b1ddi = IdCache(b1_client(bloxone.b1ddi, b1ini), manifest=manifest,
+                    journal=journal)
 
     if not remove:
         log.info("Checking config...")
@@ -1051,7 +2476,19 @@ def b1ddi_automation_demo(b1ini, config={}, ipv6=False, remove=False):
             log.info("Config checked out proceeding...")
             log.info("------ Creating Demo Data ------")
             start_timer = time.perf_counter()
-            status = create_demo(b1ddi, config, ipv6=ipv6)
+            if backend == 'async':
+                import b1_async
+                status = b1_async.create_demo(b1ini, config, 
+                                              create_tag_body(config),
+                                              ipv6=ipv6,
+                                              concurrency=workers,
+                                              manifest=manifest,
+                                              journal=journal,
+                                              governor=GOVERNOR,
+                                              allocation=ALLOCATION)
+            else:
+                status = create_demo(b1ddi, config, ipv6=ipv6, 
+                                     workers=workers, window=window)
             end_timer = time.perf_counter() - start_timer
             log.info("---------------------------------------------------")
             log.info(f'Demo data created in {end_timer:0.2f}S')
@@ -1064,7 +2501,19 @@ def b1ddi_automation_demo(b1ini, config={}, ipv6=False, remove=False):
     elif remove:
         log.info("------ Cleaning Up Demo Data ------")
         start_timer = time.perf_counter()
-        status = clean_up(b1ddi, config)
+        # Completed steps are no longer valid once objects are removed
+        journal.clear()
+        if manifest.entries():
+            log.info(f'Deleting objects using manifest {manifest.filename}')
+            status = delete_manifest_objects(b1ddi, manifest, 
+                                             B1DDI_DELETE_ORDER,
+                                             workers=workers)
+            if status:
+                log.warning('Manifest clean-up incomplete, ' 
+                            'falling back to discovery')
+                status = clean_up(b1ddi, config, workers=workers)
+        else:
+            status = clean_up(b1ddi, config, workers=workers)
         end_timer = time.perf_counter() - start_timer
         log.info("---------------------------------------------------")
         log.info(f'Demo data removed in {end_timer:0.2f}S')
@@ -1086,7 +2535,7 @@ def check_org(b1ini):
         bool: True if Org/Tenant is an Infoblox Org
     '''
     infoblox_org = False
-    b1p = bloxone.b1platform(b1ini)
+    b1p = b1_client(bloxone.b1platform, b1ini)
     if 'infoblox' in b1p.get_current_tenant().casefold():
         infoblox_org = True
 
@@ -1095,19 +2544,34 @@ def check_org(b1ini):
 
 def create_network_list(b1tdc, config={}):
     '''
-    Create External Network
+    Create External Network, importing the prefixes in ext_net_file 
+    if defined
 
     Parameters:
         b1tdc (obj): bloxone.b1tdc object
         config (obj): ini config object
 
+    Returns:
+        list of network list ids, or None on failure
     '''
     net_id = ''
     network = f"{config.get('ext_net')}/{config.get('ext_cidr')}"
     net_name = config.get('ext_net_name') 
+    filename = config.get('ext_net_file')
     
     if not b1tdc.get_id('/network_lists', key="name", value=net_name):
         log.info("---- Create Network List ----")
+        if filename:
+            net_ids = b1_bulkimport.import_network_lists(
+                b1tdc, net_name, os.path.expanduser(filename), 
+                extra=[ network ])
+            if net_ids:
+                log.info(f'+++ Network List {net_name} created, '
+                         f'{len(net_ids)} list(s)')
+            else:
+                log.warning(f'--- Network List {net_name} not created')
+            return net_ids
+
         # tag_body = create_tag_body(config)
         body = { "description": "Network list",
                  "items": [ network ], 
@@ -1128,7 +2592,7 @@ def create_network_list(b1tdc, config={}):
         log.warning(f'Network List {net_name} already exists')
         net_id = None
 
-    return net_id
+    return [ net_id ] if net_id else None
 
 
 def delete_network_list(b1tdc, config={}):
@@ -1145,10 +2609,17 @@ def delete_network_list(b1tdc, config={}):
     status = False
     net_name = config.get('ext_net_name')
     if net_name:
+        # Include the additional lists of a chunked import, name-2, ...
+        ids = []
         id = b1tdc.get_id('/network_lists', key="name", value=net_name)
-        if id:
+        while id:
+            ids.append(str(id))
+            list_name = b1_bulkimport.network_list_name(net_name, 
+                                                        len(ids) + 1)
+            id = b1tdc.get_id('/network_lists', key="name", value=list_name)
+        if ids:
             log.info(f'Network list {net_name} found.')
-            body = { 'ids': [ str(id) ] }
+            body = { 'ids': ids }
             log.debug("Body:{}".format(body))
             response = b1tdc.delete('/network_lists', body=json.dumps(body))
             if response.status_code in b1tdc.return_codes_ok:
@@ -1160,15 +2631,18 @@ def delete_network_list(b1tdc, config={}):
                 log.debug(f'Return body: {response.text}')
         else:
             log.info(f'Network list {net_name} not found.')
+            status = True
     else:
         log.info('No network name provided, no actions taken.')
+        status = True
 
     return status
 
 
 def create_custom_lists(b1tdc, config={}):
     '''
-    Create allow and deny custom lists
+    Create allow and deny custom lists, importing the items from the
+    allow_list_file and deny_list_file if defined
 
     Parameters:
         b1tdc (obj): bloxone.b1tdc object
@@ -1179,54 +2653,42 @@ def create_custom_lists(b1tdc, config={}):
     '''
     cust_lists = {}
 
-    allow_list = config.get('allow_list')
-    deny_list = config.get('deny_list')
-
-    # Create Allow List
-    if not b1tdc.get_id('/named_lists', key="name", value=allow_list):
-        log.info("---- Create Allow List ----")
-        body = { "name": allow_list,
-                    "type": "custom_list",
-                    "confidence_level": "HIGH",
-                    "items": [ "www.infoblox.com" ] }
-        log.debug("Body:{}".format(body))
-
-        log.info(f'Creating Allow List {allow_list}')
-        response = b1tdc.create('/named_lists', body=json.dumps(body))
-        if response.status_code in b1tdc.return_codes_ok:
-            log.info(f'+++ Allow List {allow_list} created')
-            cust_lists['allow_list'] = response.json()['results']['id']
-        else:
-            log.warning(f'--- Allow List {allow_list} not created')
-            log.debug(f'Return code: {response.status_code}')
-            log.warning(f'Return body: {response.text}')
-            cust_lists['allow_list'] = None
-    else:
-        log.warning(f'Allow list {allow_list} already exists')
-        cust_lists['allow_list'] = None
-
-    # Create Deny List
-    if not b1tdc.get_id('/named_lists', key="name", value=deny_list):
-        log.info("---- Create Deny List ----")
-        body = { "name": deny_list,
-                    "type": "custom_list",
-                    "confidence_level": "HIGH",
-                    "items": [ "blockme.infoblox.com" ] }
-        log.debug("Body:{}".format(body))
+    for key, label, item in [ ('allow_list', 'Allow', 'www.infoblox.com'),
+                              ('deny_list', 'Deny', 'blockme.infoblox.com') ]:
+        name = config.get(key)
+        filename = config.get(f'{key}_file')
+        if not b1tdc.get_id('/named_lists', key="name", value=name):
+            log.info(f"---- Create {label} List ----")
+            if filename:
+                cust_lists[key] = b1_bulkimport.import_custom_list(
+                    b1tdc, name, os.path.expanduser(filename),
+                    tags=demo_tags(config))
+                if cust_lists[key]:
+                    log.info(f'+++ {label} List {name} created')
+                else:
+                    log.warning(f'--- {label} List {name} not created')
+                continue
+
+            body = { "name": name,
+                        "type": "custom_list",
+                        "confidence_level": "HIGH",
+                        "items": [ item ],
+                        "tags": demo_tags(config) }
+            log.debug("Body:{}".format(body))
 
-        log.info(f'Creating Deny List {deny_list}')
-        response = b1tdc.create('/named_lists', body=json.dumps(body))
-        if response.status_code in b1tdc.return_codes_ok:
-            log.info(f'+++ Deny List {deny_list} created')
-            cust_lists['deny_list'] = response.json()['results']['id']
+            log.info(f'Creating {label} List {name}')
+            response = b1tdc.create('/named_lists', body=json.dumps(body))
+            if response.status_code in b1tdc.return_codes_ok:
+                log.info(f'+++ {label} List {name} created')
+                cust_lists[key] = response.json()['results']['id']
+            else:
+                log.warning(f'--- {label} List {name} not created')
+                log.debug(f'Return code: {response.status_code}')
+                log.warning(f'Return body: {response.text}')
+                cust_lists[key] = None
         else:
-            log.warning(f'--- Deny List {deny_list} not created')
-            log.debug(f'Return code: {response.status_code}')
-            log.warning(f'Return body: {response.text}')
-            cust_lists['deny_list'] = None
-    else:
-        log.warning(f'Deny list {deny_list} already exists')
-        cust_lists['deny_list'] = None
+            log.warning(f'{label} list {name} already exists')
+            cust_lists[key] = None
 
     return cust_lists
 
@@ -1243,52 +2705,35 @@ def delete_custom_lists(b1tdc, config={}):
         bool: True on success
     '''
     status = False
-    allow_list = config.get('allow_list')
-    deny_list = config.get('deny_list')
-
-    # Have actioned as separate API calls, they could be combined into
-    # single delete action
+    ids = []
+    names = []
 
-    # Delete allow_list
-    if allow_list:
-        id = b1tdc.get_id('/named_lists', key="name", value=allow_list)
-        if id:
-            log.info(f'Allow list {allow_list} found.')
-            body = { 'ids': [ str(id) ] }
-            log.debug("Body:{}".format(body))
-            response = b1tdc.delete('/named_lists', body=json.dumps(body))
-            if response.status_code in b1tdc.return_codes_ok:
-                log.info(f'+++ Allow list {allow_list} deleted.')
-                status = True
-            else:
-                log.info(f'--- Failed to delete Allow list {allow_list}.')
-                log.debug(f'Return code: {response.status_code}')
-                log.debug(f'Return body: {response.text}')
-    
-    else:
-        log.info("No allow_list name provided, no action taken.")
+    # Both lists are deleted with a single request
+    for label, list_name in [ ('Allow', config.get('allow_list')),
+                              ('Deny', config.get('deny_list')) ]:
+        if list_name:
+            id = b1tdc.get_id('/named_lists', key="name", value=list_name)
+            if id:
+                log.info(f'{label} list {list_name} found.')
+                ids.append(str(id))
+                names.append(list_name)
+        else:
+            log.info(f"No {label.lower()}_list name provided, no action taken.")
 
-    # Delete deny_list
-    if deny_list:
-        id = b1tdc.get_id('/named_lists', key="name", value=deny_list)
-        if id:
-            log.info(f'Deny list {deny_list} found.')
-            body = { 'ids': [ str(id) ] }
-            log.debug("Body:{}".format(body))
-            response = b1tdc.delete('/named_lists', body=json.dumps(body))
-            if response.status_code in b1tdc.return_codes_ok:
-                log.info(f'+++ Deny list {deny_list} deleted.')
-                if status:
-                    status = True
-                else:
-                    status = False
-            else:
-                log.info(f'--- Failed to delete Deny list {deny_list}.')
-                log.debug(f'Return code: {response.status_code}')
-                log.debug(f'Return body: {response.text}')
-    
+    if ids:
+        body = { 'ids': ids }
+        log.debug("Body:{}".format(body))
+        response = b1tdc.delete('/named_lists', body=json.dumps(body))
+        if response.status_code in b1tdc.return_codes_ok:
+            log.info(f"+++ Custom lists {', '.join(names)} deleted.")
+            status = True
+        else:
+            log.info(f"--- Failed to delete custom lists {', '.join(names)}.")
+            log.debug(f'Return code: {response.status_code}')
+            log.debug(f'Return body: {response.text}')
     else:
-        log.info("No deny_list name provided, no action taken.")
+        log.info('No custom lists found.')
+        status = True
 
     return status
 
@@ -1303,57 +2748,32 @@ def get_policies(cfg='policy_definitions.yml'):
     Returns:
         Policy ruleset list
     '''
-    policies = {}
-
-    # Check for inifile and raise exception if not found
-    if os.path.isfile(cfg):
-        # Attempt to open policy definitions yaml file
-        try:
-            policies = yaml.safe_load(open(cfg, 'r'))
-        except yaml.YAMLError as err:
-            logging.error(err)
-            raise
-    else:
-        logging.error('No such file {}'.format(cfg))
-        raise FileNotFoundError(f'YAML policy file "{cfg}" not found.')
+    # Parsed once per process and cached on disk
+    policies = b1_definitions.load(cfg, 'policies')['data'] or {}
 
     return policies
 
 
-def get_ruleset(policy_level):
+def get_ruleset(policy_level, cfg='policy_definitions.yml'):
     '''
     Build ruleset from the policy definition yaml file
 
     Parameters:
         level(str): 'high', 'medium', 'low'
+        cfg(str): filename
     
     Returns:
         Policy ruleset dictionary by action
     '''
-    policies = {}
-    ruleset = {}
-    level = f'policy_{policy_level}'
-    allowed_actions = [ 'action_block', 
-                        'action_redirect', 
-                        'action_log',
-                        'action_allow' ]
-
-    policies = get_policies()
+    compiled = b1_definitions.load(cfg, 'policies')['compiled']
 
     log.info(f'Retrieving ruleset for policy {policy_level}')
 
-    # Build ruleset
-    # Need to check policy_level exists
-    for action in policies[level]:
-        if action in allowed_actions:
-            ruleset[action] = []
-            for feed in policies[level][action]:
-                rule =  { 'action': action,
-                        'data': feed.get('name'),
-                        'type': feed.get('type') }
-                ruleset[action].append(rule)
-        else:
-            log.warning(f'- Action {action} not supported.')
+    # Rules are pre-computed per policy level and action
+    ruleset = { action: list(rules) for action, rules in
+                compiled['levels'][policy_level].items() }
+    for action in compiled['unsupported'].get(policy_level, []):
+        log.warning(f'- Action {action} not supported.')
     
     return ruleset
 
@@ -1369,27 +2789,15 @@ def get_filter_rules(config={}, cfg='filters.yml'):
         List of filter rules
     '''
     filter_rules = {}
-    filters = get_filters()
-    allowed_actions = [ 'action_block', 
-                        'action_redirect', 
-                        'action_log',
-                        'action_allow',
-                        'action_allow_with_local_resolution' ]
-
-    for filter_type in filters.keys():
-        type = filter_type[:-1]
-        for filter in filters[filter_type]:
-            filter_name = f"{config.get('prefix')}-{filter.get('name')}"
-            action = filter.get('action')
-            if action in allowed_actions:
-                rule = { 'action': action,
-                        'data': filter_name,
-                        'type': type }
-                if action not in filter_rules.keys():
-                    filter_rules[action] = []
-                filter_rules[action].append(rule)
-            else:
-                log.warning(f'- Action {action} not supported')
+    compiled = b1_definitions.load(cfg, 'filters')['compiled']
+
+    for action, rules in compiled['rules'].items():
+        filter_rules[action] = [ { 'action': action,
+                                   'data': f"{config.get('prefix')}-{name}",
+                                   'type': type }
+                                 for name, type in rules ]
+    for action in compiled['unsupported']:
+        log.warning(f'- Action {action} not supported')
         
     return filter_rules
 
@@ -1451,9 +2859,10 @@ def create_policy(b1tdc, config={}, ids={}):
 
         # Create body
         body = { 'name': policy_name,
-                'network_lists': [ ids.get('net_id') ], 
+                'network_lists': ids.get('net_ids') or [ ids.get('net_id') ], 
                 # 'roaming_device_groups': [ ids.get('roaming_groups') ]
-                'rules': rules }
+                'rules': rules,
+                'tags': demo_tags(config) }
         log.debug("Body:{}".format(body))
         log.info(f'Creating Security Policy {policy_name}')
         response = b1tdc.create('/security_policies', body=json.dumps(body))
@@ -1503,8 +2912,10 @@ def delete_policy(b1tdc, config={}):
                 log.debug(f'Return body: {response.text}')
         else:
             log.info(f'Security policy {policy_name} not found.')
+            status = True
     else:
         log.info('No network name provided, no actions taken.')
+        status = True
 
     return status
 
@@ -1519,20 +2930,8 @@ def get_filters(cfg='filters.yml'):
     Returns:
         Dictionary of category filters and app filters
     '''
-    filters = {}
-
-    # Check for inifile and raise exception if not found
-    if os.path.isfile(cfg):
-        # Attempt to open policy definitions yaml file
-        try:
-            filters = yaml.safe_load(open(cfg, 'r'))
-        except yaml.YAMLError as err:
-            logging.error(err)
-            raise
-
-    else:
-        logging.error('No such file {}'.format(cfg))
-        raise FileNotFoundError(f'YAML policy file "{cfg}" not found.')
+    # Parsed once per process and cached on disk
+    filters = b1_definitions.load(cfg, 'filters')['data'] or {}
 
     return filters
 
@@ -1562,7 +2961,8 @@ def create_content_filters(b1tdc, config={}):
             categories = filter.get('categories')
             body = { 'name': filter_name, 
                     'categories': categories,
-                    'description': filter.get('description') }
+                    'description': filter.get('description'),
+                    'tags': demo_tags(config) }
             log.info(f'Creating category filter: {filter_name}')
             log.debug(f'body: {body}')
             response = b1tdc.create('/category_filters', body=json.dumps(body))
@@ -1612,35 +3012,34 @@ def delete_content_filters(b1tdc, config={}):
         response = b1tdc.delete('/category_filters', body=json.dumps(body))
         if response.status_code in b1tdc.return_codes_ok:
             log.info(f'+++ {len(ids)} Web Category Filters deleted.')
-            if status:
-                status = True
-            else:
-                status = False
+            status = True
         else:
             log.info(f'--- Failed to delete {len(ids)} Category Filters.')
             log.debug(f'Return code: {response.status_code}')
             log.debug(f'Return body: {response.text}')
     else:
         log.info('No web category filters found.')
+        status = True
 
     return status
 
 
 def get_supported_apps(b1tdc):
     '''
-    '''
-    supported_apps = []
-    url = f'{b1tdc.base_url}/api/acs/v1/apps?_fields=name'
+    Get the application catalog, cached on disk and refreshed 
+    conditionally once older than b1_appcatalog.CATALOG_TTL, with
+    any app_aliases defined in filters.yml
 
-    response = b1tdc._apiget(url)
-    if response.status_code in b1tdc.return_codes_ok:
-        for app in response.json().get('results'):
-            supported_apps.append(app.get('name'))
-    else:
-        supported_apps = []
-        log.warning(f'--- Could not get support apps')
-        log.debug(f'Return code: {response.status_code}')
-        log.warning(f'Return body: {response.text}')
+    Parameters:
+        b1tdc (obj): bloxone.b1tdc object
+
+    Returns:
+        b1_appcatalog.AppCatalog indexed by name, case insensitive
+    '''
+    aliases = get_filters().get('app_aliases')
+    supported_apps = b1_appcatalog.get_catalog(b1tdc, governor=GOVERNOR,
+                                              transport=TRANSPORT,
+                                              aliases=aliases)
     
     return supported_apps
 
@@ -1661,9 +3060,10 @@ def create_application_filters(b1tdc, config={}):
             apps = filter.get('apps')
             criteria = []
             for app in apps:
-                # Check whether app is supported
-                if app in supported_apps:
-                    criteria.append({ 'name': app })
+                # Check whether app is supported, using the catalog name
+                name = supported_apps.lookup(app)
+                if name:
+                    criteria.append({ 'name': name })
                 else:
                     log.warning(f'App: {app} in filter {filter_name} not supported.')
 
@@ -1671,11 +3071,13 @@ def create_application_filters(b1tdc, config={}):
             if criteria:
                 body = { 'name': filter_name, 
                         'criteria': criteria,
-                        'description': filter.get('description')}
+                        'description': filter.get('description'),
+                        'tags': demo_tags(config) }
             else:
                 log.warning(f'No supported apps found in filter {filter_name}')
                 body = { 'name': filter_name, 
-                        'description': filter.get('description')}
+                        'description': filter.get('description'),
+                        'tags': demo_tags(config) }
 
             log.info(f'Creating application filter: {filter_name}')
             log.debug(f'body: {body}')
@@ -1727,44 +3129,141 @@ def delete_application_filters(b1tdc, config={}):
         response = b1tdc.delete('/application_filters', body=json.dumps(body))
         if response.status_code in b1tdc.return_codes_ok:
             log.info(f'+++ {len(ids)} Application filters deleted.')
-            if status:
-                status = True
-            else:
-                status = False
+            status = True
         else:
             log.info(f'--- Failed to delete {len(ids)} Application filters.')
             log.debug(f'Return code: {response.status_code}')
             log.debug(f'Return body: {response.text}')
     else:
         log.info('No applications filters found.')
+        status = True
 
     return status
 
 
-def add_lookalike_targets(b1tdlad, domain):
+def valid_lookalike(domain):
     '''
+    Check a domain meets the lookalike target requirements: a minimum
+    of two labels and a left most label of 5 or more characters
+
+    Parameters:
+        domain (str): Domain name
+
+    Returns:
+        bool: True if valid
+    '''
+    status = False
+    if bloxone.utils.count_labels(domain) > 1:
+        labels = domain.split('.')
+        if len(labels[0]) > 4:
+            status = True
+        else:
+            log.info(f'--- {domain}: label too small (must be >4 characters)')
+    else:
+        log.info(f'--- {domain}: must contain a minimum of two labels')
+
+    return status
+
+
+def lookalike_domains(config):
+    '''
+    Domains for lookalike targets from the customer_domain key, which 
+    may list several domains separated by commas or spaces, and the
+    optional lookalike_file
+
+    Parameters:
+        config (obj): ini config object
+
+    Returns:
+        list of valid domains
+    '''
+    domains = []
+    host_regex, url_regex = bloxone.utils.buildregex()
+
+    for domain in re.split(r'[,\s]+', config.get('customer_domain', '')):
+        if domain:
+            if bloxone.utils.validate_fqdn(hostname=domain, 
+                                           regex=host_regex):
+                domains.append(domain.casefold())
+            else:
+                log.info(f'--- Customer domain {domain} for lookalikes '
+                         'not valid')
+
+    filename = config.get('lookalike_file')
+    if filename:
+        try:
+            domains += b1_bulkimport.iter_domains(os.path.expanduser(filename))
+        except OSError as err:
+            log.error(f'--- Unable to read {filename}: {err}')
+
+    return list(dict.fromkeys(domains))
+
+
+def update_lookalike_targets(b1tdlad, add=[], remove=[]):
+    '''
+    Add and remove lookalike targets using a single GET and, if there
+    are changes, a single PUT. Only targets added by this script are
+    removed
+
+    Parameters:
+        b1tdlad (obj): bloxone.b1tdlad object
+        add (list): Domains to add
+        remove (list): Domains to remove
+
+    Returns:
+        bool: True if the targets are as requested
     '''
     status = False
 
     response = b1tdlad.get('/lookalike_targets')
     if response.status_code in b1tdlad.return_codes_ok:
-        results = response.json().get('results')
-        if not domain in results.get('items'):
-            # Add domain to items
-            items_described = results.get('items_described') 
-            item = { "item": domain, 
-                     "description": "Added by bloxone_automation_tools" }
-            items_described.append(item)
-            response = b1tdlad.update(json.dumps(items_described))
+        results = response.json().get('results', {})
+        items_described = results.get('items_described') or []
+        current = { item.get('item') for item in items_described }
+        to_remove = set(remove)
+
+        # Build the new list rather than modifying the one being read
+        new_items = []
+        removed = []
+        for item in items_described:
+            domain = item.get('item')
+            if domain not in to_remove:
+                new_items.append(item)
+            elif LOOKALIKE_DESCRIPTION in (item.get('description') or ''):
+                removed.append(domain)
+            else:
+                log.info(f'--- Lookalike target {domain} not added by this '
+                         'script, not removed')
+                new_items.append(item)
+        for domain in to_remove - current:
+            log.info(f'--- Domain {domain} not found in lookalike targets')
+
+        added = []
+        for domain in dict.fromkeys(add):
+            if domain in current:
+                log.debug(f'Domain {domain} already listed')
+            else:
+                added.append(domain)
+                new_items.append({ 'item': domain, 
+                                   'description': LOOKALIKE_DESCRIPTION })
+
+        if added or removed:
+            body = { 'items_described': new_items }
+            response = b1tdlad.update('/lookalike_targets', 
+                                      body=json.dumps(body))
             if response.status_code in b1tdlad.return_codes_ok:
-                log.info(f'+++ Domain {domain} added to lookalike targets')
+                log.debug(f'Added: {added}, removed: {removed}')
+                log.info(f'+++ {len(added)} domain(s) added to and '
+                         f'{len(removed)} removed from lookalike targets')
                 status = True
             else:
-                log.info(f'--- Failed to add {domain} to lookalike targets')
+                log.info(f'--- Failed to update lookalike targets, '
+                         f'{len(added)} additions, {len(removed)} removals')
                 log.debug(f'Return code: {response.status_code}')
                 log.debug(f'Return body: {response.text}')
         else:
-            log.info(f'+++ Domain {domain} already listed')
+            log.info('No changes to lookalike targets required')
+            status = True
     else:
         log.info(f'--- Failed to retrieve lookalike_targets')
         log.debug(f'Return code: {response.status_code}')
@@ -1773,148 +3272,157 @@ def add_lookalike_targets(b1tdlad, domain):
     return status
 
 
-def create_lookalike(b1ini, domain):
+def add_lookalike_targets(b1tdlad, domains):
     '''
-    '''
-    status = False
+    Add one or more domains to the lookalike targets
 
-    # Instatiate bloxone 
-    b1tdlad = bloxone.b1tdlad(b1ini)
+    Parameters:
+        b1tdlad (obj): bloxone.b1tdlad object
+        domains (str or list): Domain(s) to add
 
-    log.info('=== Attempting to add lookalike target')
-    if bloxone.utils.count_labels(domain) > 1:
-        labels = domain.split('.')
-        if len(labels[0]) > 4:
-            # Try and add domain
-            if add_lookalike_targets(b1tdlad, domain):
-                status = True
-        else:
-            log.info('--- customer domain label too small (must be >4 characters)')
-    else:
-        log.info('--- Customer domain must contain a minimum of two labels')
-    
-    return status
+    Returns:
+        bool: True on success
+    '''
+    if isinstance(domains, str):
+        domains = [ domains ]
 
+    return update_lookalike_targets(b1tdlad, add=domains)
 
-def remove_lookalike_target(b1tdlad, domain):
+
+def create_lookalike(b1ini, domains):
     '''
+    Add one or more valid domains to the lookalike targets
+
+    Parameters:
+        b1ini (str): Filename of the bloxone inifile
+        domains (str or list): Domain(s) to add
+
+    Returns:
+        bool: True on success
     '''
     status = False
-    found = False
-    items_described = []
-    new_items_desc = []
 
-	# Get lookalike_targets
-    response = b1tdlad.get('/lookalike_targets')
-    if response.status_code in b1tdlad.return_codes_ok:
-        results = response.json().get('results')
-        if domain in results.get('items'):
-            log.info('+++ domain found')
-            items_described = results.get('items_described')
-            for item in items_described:
-                if item.get('item') == domain:
-                    # Check description to ensure it was added by this
-                    if 'bloxone_automation_tools' in item.get('description'):
-                        log.info(f'+++ Lookalike target {domain} found')
-                        found = True
-                    else:
-                        log.info(f'--- Lookalike target {domain} not added by this script')
-                        items_described.append(item)
-                else:
-                    items_described.append(item)
+    # Instatiate bloxone 
+    b1tdlad = b1_client(bloxone.b1tdlad, b1ini)
+
+    if isinstance(domains, str):
+        domains = [ domains ]
+    log.info(f'=== Attempting to add {len(domains)} lookalike target(s)')
+    domains = [ domain for domain in domains if valid_lookalike(domain) ]
+    if domains:
+        status = add_lookalike_targets(b1tdlad, domains)
+    
+    return status
 
-            # Remove domain 
-            if found:
-                response = b1tdlad.update(json.dumps(items_described))
-                if response.status_code in b1tdlad.return_codes_ok:
-                    log.info(f'+++ Lookalike {domain} removed from lookalike targets')
-                    status = True
-                else:
-                    log.info(f'--- Failed to remove {domain} from lookalike targets')
-                    log.debug(f'Return code: {response.status_code}')
-                    log.debug(f'Return body: {response.text}')
 
-            else:
-                log.info(f'--- Removal not attempted')
+def remove_lookalike_target(b1tdlad, domains):
+    '''
+    Remove one or more domains, added by this script, from the 
+    lookalike targets
 
-        else:
-            log.info(f'--- Domain {domain} not found in lookalike targets')
-            log.info(f'--- Removal not attempted')
+    Parameters:
+        b1tdlad (obj): bloxone.b1tdlad object
+        domains (str or list): Domain(s) to remove
 
-    else:
-        log.info(f'--- Failed to get lookalikes')
-        log.debug(f'Return code: {response.status_code}')
-        log.debug(f'Return body: {response.text}')
+    Returns:
+        bool: True on success
+    '''
+    if isinstance(domains, str):
+        domains = [ domains ]
 
-    return status
+    return update_lookalike_targets(b1tdlad, remove=domains)
 
 
-def remove_lookalike(b1ini, domain):
+def remove_lookalike(b1ini, domains):
     '''
+    Remove one or more domains from the lookalike targets
+
+    Parameters:
+        b1ini (str): Filename of the bloxone inifile
+        domains (str or list): Domain(s) to remove
+
+    Returns:
+        bool: True on success
     '''
     status = False
 
     # Instatiate bloxone 
-    b1tdlad = bloxone.b1tdlad(b1ini)
-
-    log.info('=== Attempting to remove lookalike target')
-    if bloxone.utils.count_labels(domain) > 1:
-        labels = domain.split('.')
-        if len(labels[0]) > 4:
-            # Try and add domain
-            if remove_lookalike_target(b1tdlad, domain):
-                log.info('+++ Lookalike target removed successfully')
-                status = True
-        else:
-            log.info('--- customer domain label too small (must be >4 characters)')
-            log.info(f'--- Removal not attempted')
+    b1tdlad = b1_client(bloxone.b1tdlad, b1ini)
+
+    if isinstance(domains, str):
+        domains = [ domains ]
+    log.info(f'=== Attempting to remove {len(domains)} lookalike target(s)')
+    domains = [ domain for domain in domains if valid_lookalike(domain) ]
+    if domains:
+        if remove_lookalike_target(b1tdlad, domains):
+            log.info('+++ Lookalike targets removed successfully')
+            status = True
     else:
-        log.info('--- Customer domain must contain a minimum of two labels')
         log.info(f'--- Removal not attempted')
     
     return status
 
 
-def create_b1td_pov(b1ini, config):
+def create_b1td_pov(b1ini, config, workers=1):
     '''
-    '''
-    status = False
-    ids = {}
-    custom_lists = {}
+    Create the B1TD PoV environment. The lists, filters and lookalike
+    target are independent so are created concurrently, the security
+    policy once the objects it references exist.
 
-    # Instatiate bloxone 
-    b1tdc = bloxone.b1tdc(b1ini)
+    Parameters:
+        b1ini (str): Name of inifile for bloxone module
+        config (obj): ini config object
+        workers (int): Number of concurrent tasks
 
-    # Create External Network
-    ids['net_id'] = create_network_list(b1tdc, config=config)
-    if ids['net_id']:
+    Returns:
+        status (bool): True if all objects were created
+    '''
+    status = False
 
-        # Create allow and deny lists
-        custom_lists = create_custom_lists(b1tdc, config=config)
-        if len(custom_lists) == 2:
-            ids.update(custom_lists)
+    # Instatiate bloxone with per-run id cache and manifest
+    manifest = Manifest(manifest_filename(config, 'b1td'), config, 'b1td')
+    b1tdc = IdCache(b1_client(bloxone.b1tdc, b1ini), manifest=manifest)
+    b1tdc.snapshot(B1TD_COLLECTIONS)
 
-            # Create content filter
-            ids['cat_filters'] = create_content_filters(b1tdc, config=config)
+    def policy():
+        ids = { 'net_ids': graph.result('network_list') }
+        ids.update(graph.result('custom_lists') or {})
+        return create_policy(b1tdc, config=config, ids=ids)
 
-            # Create App filter
-            ids['application_filters'] = create_application_filters(b1tdc, config=config)
+    def lookalike():
+        with b1_metrics.phase('lookalike'):
+            return create_lookalike(b1ini, domains)
 
-            # Create Security Policy
-            create_policy(b1tdc, config=config, ids=ids)
+    graph = b1_taskgraph.TaskGraph('B1TD PoV')
+    # Create External Network
+    graph.add('network_list', create_network_list, b1tdc, config=config)
+    # Create allow and deny lists
+    graph.add('custom_lists', create_custom_lists, b1tdc, config=config)
+    # Create content and App filters
+    graph.add('category_filters', create_content_filters, b1tdc, 
+              config=config)
+    graph.add('application_filters', create_application_filters, b1tdc, 
+              config=config)
+    # Create Security Policy, the rules reference the lists and filters
+    graph.add('policy', policy, requires=[ 'network_list' ],
+              after=[ 'custom_lists', 'category_filters', 
+                      'application_filters' ])
         
-        # Create lookalike entry
-        customer_domain = config.get('customer_domain')
-        if customer_domain:
-            host_regex, url_regex = bloxone.utils.buildregex()
-            valid_host = bloxone.utils.validate_fqdn(hostname=customer_domain, 
-                                        regex=host_regex)
-            if valid_host:
-                create_lookalike(b1ini, config.get('customer_domain'))
-            else:
-                logging.info('--- Customer domain for lookalikes not valid')
-        else:
-            logging.info('--- customer_domain not defined for lookalikes')
+    # Create lookalike entries
+    domains = lookalike_domains(config)
+    if domains:
+        graph.add('lookalike', lookalike)
+    else:
+        logging.info('--- customer_domain not defined for lookalikes')
+
+    status = graph.run(workers=workers)
+    if status:
+        log.info("+++ Successfully created B1TD PoV environment")
+    else:
+        failed = [ t.name for t in graph.tasks.values() if t.status != 'ok' ]
+        log.error("--- B1TD PoV environment incomplete, failed: {}"
+                  .format(', '.join(failed)))
+    graph.log_summary(logger=log)
 
     return status
 
@@ -1924,36 +3432,44 @@ def b1td_clean_up(b1ini, config):
     '''
     status = False
 
-    # Instatiate bloxone 
-    b1tdc = bloxone.b1tdc(b1ini)
-
-    # Delete External Network
-    status = delete_policy(b1tdc, config=config)
-    status = delete_network_list(b1tdc, config=config)
-    status = delete_custom_lists(b1tdc, config=config)
-    status - delete_content_filters(b1tdc, config=config)
-    status - delete_application_filters(b1tdc, config=config)
-
-    # Cleanup lookalike entry
-    customer_domain = config.get('customer_domain')
-    if customer_domain:
-        host_regex, url_regex = bloxone.utils.buildregex()
-        valid_host = bloxone.utils.validate_fqdn(hostname=customer_domain, 
-                                    regex=host_regex)
-        if valid_host:
-            status = remove_lookalike(b1ini, config.get('customer_domain'))
-        else:
-            logging.info('--- Customer domain for lookalikes not valid')
+    # Instatiate bloxone with per-run id cache and manifest
+    manifest = Manifest(manifest_filename(config, 'b1td'), config, 'b1td')
+    b1tdc = IdCache(b1_client(bloxone.b1tdc, b1ini), manifest=manifest)
+
+    if manifest.entries():
+        log.info(f'Deleting objects using manifest {manifest.filename}')
+        if delete_manifest_objects(b1tdc, manifest, B1TD_DELETE_ORDER, 
+                                   batch=True) == 0:
+            status = True
+
+    if not status:
+        b1tdc.snapshot(B1TD_COLLECTIONS)
+        # Policy first, it references the lists and filters
+        status = all([ delete_policy(b1tdc, config=config),
+                       delete_network_list(b1tdc, config=config),
+                       delete_custom_lists(b1tdc, config=config),
+                       delete_content_filters(b1tdc, config=config),
+                       delete_application_filters(b1tdc, config=config) ])
+
+    # Cleanup lookalike entries
+    domains = lookalike_domains(config)
+    if domains:
+        with b1_metrics.phase('delete lookalike'):
+            status = remove_lookalike(b1ini, domains) and status
     else:
         logging.info('--- customer_domain not defined for lookalikes')
 
     return status
 
 
-def b1td_pov(b1ini, config={}, remove=False):
+def b1td_pov(b1ini, config={}, remove=False, workers=1):
     '''
+    Create or remove the B1TD PoV environment
+
+    Returns:
+        exitcode (int): 0 if successful
     '''
-    status = True
+    status = False
     log.info(f"====== B1TD PoV Automation Version {__version__} ======")
 
 
@@ -1963,7 +3479,7 @@ def b1td_pov(b1ini, config={}, remove=False):
             # log.info("Config checked out proceeding...")
         log.info("------ Creating PoV Environment ------")
         start_timer = time.perf_counter()
-        status = create_b1td_pov(b1ini, config)
+        status = create_b1td_pov(b1ini, config, workers=workers)
         end_timer = time.perf_counter() - start_timer
         log.info("---------------------------------------------------")
         log.info(f'B1TD PoV environment data created in {end_timer:0.2f}S')
@@ -1983,13 +3499,816 @@ def b1td_pov(b1ini, config={}, remove=False):
     else:
         log.error("Script Error - something seriously wrong")
 
-    return status
+    if status:
+        exitcode = 0
+    else:
+        exitcode = 1
+
+    return exitcode
+
+
+def tag_created(obj):
+    '''
+    Parse the Created tag of an object
+
+    Parameters:
+        obj (dict): API object
+
+    Returns:
+        datetime object, or None if not tagged or not parsable
+    '''
+    created = None
+    tags = obj.get('tags') or {}
+    try:
+        created = datetime.datetime.strptime(tags.get('Created', ''),
+                                             CREATED_FORMAT)
+    except (TypeError, ValueError):
+        log.debug(f"Unable to parse Created tag for {obj.get('id')}")
+
+    return created
+
+
+def parse_age(value):
+    '''
+    Parse an age such as 30m, 12h, 7d or 2w, a number alone is days
+
+    Parameters:
+        value (str): Age
+
+    Returns:
+        datetime.timedelta object
+
+    Raises:
+        argparse.ArgumentTypeError
+    '''
+    units = { 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks' }
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([mhdw]?)', value.strip().casefold())
+    if not match:
+        raise argparse.ArgumentTypeError(f'Invalid age {value}, '
+                                         'e.g. 30m, 12h, 7d or 2w')
+
+    return datetime.timedelta(**{ units[match.group(2) or 'd']: 
+                                  float(match.group(1)) })
+
+
+def find_tagged(client, collections, tfilter, cutoff=None, fields=True,
+                workers=1):
+    '''
+    Find objects using a server side tag filter, querying the collections
+    concurrently. Objects whose parent is also found are skipped as they
+    are deleted with the parent.
+
+    Parameters:
+        client (obj): bloxone client object
+        collections (list): (objpath, name field, parent field) tuples
+        tfilter (str): Tag filter expression for _tfilter
+        cutoff (obj): datetime, only objects Created before cutoff
+        fields (bool): Request only the fields required using _fields
+        workers (int): Number of concurrent queries
+
+    Returns:
+        tuple: (dict of lists of objects keyed by objpath,
+                dict of parent ids keyed by skipped object id)
+
+    Raises:
+        APIError
+    '''
+    def query(collection):
+        objpath, name_field, parent_field = collection
+        params = { '_tfilter': tfilter }
+        if fields:
+            params['_fields'] = ','.join(f for f in [ 'id', 'tags', name_field,
+                                                      parent_field ] if f)
+        found = []
+        for obj in iter_objects(client, objpath, page_size=PREFETCH_PAGE_SIZE,
+                                stream=True, **params):
+            if cutoff:
+                created = tag_created(obj)
+                if not created or created >= cutoff:
+                    continue
+            found.append(obj)
+        return found
+
+    objects = {}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(min(workers, len(collections)), 1)) as pool:
+        for collection, found in zip(collections, pool.map(query, collections)):
+            objects[collection[0]] = found
+
+    children = {}
+    ids = set(str(obj.get('id')) for found in objects.values() for obj in found)
+    for objpath, name_field, parent_field in collections:
+        if parent_field:
+            found = objects[objpath]
+            objects[objpath] = []
+            for obj in found:
+                parent = str(obj.get(parent_field))
+                if parent in ids:
+                    children[str(obj.get('id'))] = parent
+                else:
+                    objects[objpath].append(obj)
+            skipped = len(found) - len(objects[objpath])
+            if skipped:
+                log.info(f'{skipped} {objpath} objects will be deleted '
+                         'with their parent')
+
+    return objects, children
+
+
+def policy_network_lists(b1tdc, policies):
+    '''
+    Network lists cannot be tagged, so find those only used by the
+    security policies being removed
+
+    Parameters:
+        b1tdc (obj): bloxone.b1tdc object
+        policies (list): Security policy objects
+
+    Returns:
+        list of network list objects
+
+    Raises:
+        APIError
+    '''
+    network_lists = []
+    ids = set()
+    for policy in policies:
+        ids.update(policy.get('network_lists') or [])
+
+    if ids:
+        # Keep lists still referenced by other policies
+        reaped = set(policy.get('id') for policy in policies)
+        for policy in iter_objects(b1tdc, '/security_policies', 
+                                   page_size=PREFETCH_PAGE_SIZE, stream=True):
+            if policy.get('id') not in reaped:
+                ids.difference_update(policy.get('network_lists') or [])
+    if ids:
+        network_lists = [ obj for obj in iter_objects(b1tdc, '/network_lists',
+                                                      page_size=PREFETCH_PAGE_SIZE,
+                                                      stream=True)
+                          if obj.get('id') in ids ]
+
+    return network_lists
+
+
+def reap(b1ini, config, app, owner='', older_than=None, workers=1):
+    '''
+    Find demo objects across the tenant using the Usage, Owner and 
+    Created tags, rather than the names in the ini file, and delete them
+    in dependency order
+
+    Parameters:
+        b1ini (str): Name of inifile for bloxone module
+        config (obj): ini config object
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        owner (str): Owner tag to match, any owner if empty
+        older_than (obj): datetime.timedelta, only delete objects 
+                          created longer ago than this
+        workers (int): Number of concurrent queries and deletes
+
+    Returns:
+        exitcode (int)
+    '''
+    exitcode = 0
+    deleted = []
+    log.info(f"====== Reaping {app} Demo Data Version {__version__} ======")
+
+    if app == 'b1ddi':
+        client = IdCache(b1_client(bloxone.b1ddi, b1ini))
+        order = B1DDI_DELETE_ORDER
+    else:
+        client = IdCache(b1_client(bloxone.b1tdc, b1ini))
+        order = B1TD_DELETE_ORDER
+    collections = REAP_COLLECTIONS[app]
+    names = { objpath: name_field for objpath, name_field, _ in collections }
+
+    tfilter = f'Usage=="{DEMO_USAGE}"'
+    if owner:
+        tfilter += f' and Owner=="{owner}"'
+    cutoff = None
+    if older_than:
+        cutoff = datetime.datetime.now() - older_than
+    log.info(f'Searching for objects tagged {tfilter}'
+             + (f' created before {cutoff.strftime(CREATED_FORMAT)}' 
+                if cutoff else ''))
+
+    start_timer = time.perf_counter()
+    try:
+        objects, children = find_tagged(client, collections, tfilter, cutoff=cutoff,
+                              fields=(app == 'b1ddi'), workers=workers)
+        if objects.get('/security_policies'):
+            objects['/network_lists'] = policy_network_lists(
+                client, objects['/security_policies'])
+    except APIError as err:
+        log.error(f'--- Search failed: {err}')
+        return 1
+
+    entries = {}
+    for objpath, found in objects.items():
+        if found:
+            log.info(f'Found {len(found)} {objpath} objects')
+            entries[objpath] = [ { 'objpath': objpath, 'id': obj.get('id'),
+                                   'name': obj.get(names.get(objpath, 'name')) }
+                                 for obj in found ]
+    total = sum(len(e) for e in entries.values())
+
+    if total:
+        deleted, exitcode = delete_objects(client, entries, order, 
+                                           workers=workers,
+                                           batch=(app == 'b1td'))
+        # Objects reaped from this config are no longer in the tenant
+        manifest = Manifest(manifest_filename(config, app), config, app)
+        reaped = set(str(id) for id in deleted)
+        reaped.update(id for id, parent in children.items() 
+                      if parent in reaped)
+        if any(str(e['id']) in reaped for e in manifest.entries()):
+            manifest.remove(reaped)
+            Journal(manifest_filename(config, app, kind='journal'), 
+                    config, app).clear()
+    else:
+        log.info('No matching objects found')
+
+    end_timer = time.perf_counter() - start_timer
+    log.info("---------------------------------------------------")
+    log.info(f'{len(deleted)} of {total} objects removed in {end_timer:0.2f}S')
+
+    return exitcode
+
+
+def plan_tags(config):
+    '''
+    Tags for planned objects, the Created timestamp is set when the
+    plan is applied
+
+    Parameters:
+        config (obj): ini config object
+
+    Returns:
+        tags (dict)
+    '''
+    tags = demo_tags(config)
+    tags['Created'] = '${created}'
+
+    return tags
+
+
+def plan_b1ddi(config, ipv6=False):
+    '''
+    Expand the B1DDI demo configuration into an ordered set of
+    operations, without making any API calls. Ids that are only known
+    at apply time are referenced as "${ref}".
+
+    Parameters:
+        config (obj): ini config object
+        ipv6 (bool): Build IPv6 networks
+
+    Yields:
+        dict: Plan operation
+    '''
+    tags = plan_tags(config)
+    net_comments = config['net_comments'].split(',')
+    space = config['ip_space']
+
+    yield { 'op': 'create', 'objpath': '/ipam/ip_space',
+            'body': { 'name': space, 'tags': tags },
+            'step': f'/ipam/ip_space/{space}', 'refs': [ 'created' ],
+            'ref': 'space', 'key': 'name', 'value': space }
+
+    blocks = [ (config['base_net'], config['container_cidr'], 
+                int(config['cidr'])) ]
+    if ipv6:
+        blocks.append((config.get('ipv6_prefix') or '2001:db8::', '32', 64))
+    for base_net, cidr, prefixlen in blocks:
+        yield { 'op': 'create', 'objpath': '/ipam/address_block',
+                'body': { 'address': base_net, 'cidr': cidr,
+                          'space': '${space}',
+                          'comment': 'Internal Address Allocation',
+                          'tags': tags },
+                'step': f'/ipam/address_block/{base_net}/{cidr}',
+                'refs': [ 'space', 'created' ] }
+        yield { 'op': 'barrier' }
+
+        network = ipaddress.ip_network(base_net + '/' + cidr)
+        nets = min(int(config['no_of_networks']),
+                   b1_planner.subnet_count(network, prefixlen))
+        for subnet in b1_planner.iter_subnets(network, prefixlen, nets):
+            address = str(subnet.network_address)
+            comment = net_comments[random.randrange(0,len(net_comments))]
+            yield { 'op': 'create', 'objpath': '/ipam/subnet',
+                    'body': { 'address': address, 'cidr': str(prefixlen),
+                              'space': '${space}', 'comment': comment,
+                              'tags': tags },
+                    'step': f'/ipam/subnet/{address}/{prefixlen}',
+                    'refs': [ 'space', 'created' ] }
+        yield { 'op': 'barrier' }
+
+        for subnet in b1_planner.iter_subnets(network, prefixlen, nets):
+            start_ip, end_ip = [ str(ip) for ip in 
+                                 b1_planner.dhcp_range(subnet) ]
+            yield { 'op': 'create', 'objpath': '/ipam/range',
+                    'body': { 'start': start_ip, 'end': end_ip,
+                              'space': '${space}', 'tags': tags },
+                    'step': f'/ipam/range/{start_ip}-{end_ip}',
+                    'refs': [ 'space', 'created' ] }
+            for ip in b1_planner.iter_reservations(subnet, config['no_of_ips']):
+                address = str(ip)
+                yield { 'op': 'create', 'objpath': '/ipam/address',
+                        'body': { 'address': address, 'space': '${space}',
+                                  'tags': tags },
+                        'step': f'/ipam/address/{address}',
+                        'refs': [ 'space', 'created' ] }
+
+    view = config['dns_view']
+    yield { 'op': 'create', 'objpath': '/dns/view',
+            'body': { 'name': view, 'ip_spaces': [ '${space}' ],
+                      'tags': tags },
+            'step': f'/dns/view/{view}', 'refs': [ 'space', 'created' ],
+            'ref': 'view', 'key': 'name', 'value': view }
+    yield { 'op': 'lookup', 'objpath': '/dns/auth_nsg', 'key': 'name',
+            'value': config['nsg'], 'ref': 'nsg' }
+
+    zone = config['dns_domain']
+    r_network = bloxone.utils.reverse_labels(config['base_net'])
+    r_network = bloxone.utils.get_domain(r_network, no_of_labels=2)
+    r_zone = r_network + '.in-addr.arpa.'
+    for fqdn in [ zone, r_zone ]:
+        op = { 'op': 'create', 'objpath': '/dns/auth_zone',
+               'body': { 'fqdn': fqdn, 'view': '${view}',
+                         'nsgs': [ '${nsg}' ], 'primary_type': 'cloud',
+                         'tags': tags },
+               'step': f'/dns/auth_zone/{fqdn}',
+               'refs': [ 'view', 'nsg', 'created' ] }
+        if fqdn == zone:
+            op.update({ 'ref': 'zone', 'key': 'fqdn', 'value': fqdn })
+        yield op
+    # Reverse zone must exist for PTR creation
+    yield { 'op': 'barrier' }
+
+    network = ipaddress.ip_network(config['base_net'] + '/' + config['cidr'])
+    if int(config['no_of_records']) > int(network.num_addresses) - 2:
+        network = ipaddress.ip_network(config['base_net'] + '/' 
+                                       + config['container_cidr'])
+    no_of_records = min(int(config['no_of_records']),
+                        int(network.num_addresses) - 2)
+    tag_body = b1_bodies.fragment('tags', tags)
+    records = iter_record_bodies('${zone}', network, no_of_records, tag_body,
+                ptr_network=b1_planner.reverse_network(config['base_net']))
+    if ipv6:
+        prefix = config.get('ipv6_prefix') or '2001:db8::'
+        records = itertools.chain(records,
+                    iter_record_bodies('${zone}', 
+                                       ipaddress.ip_network(prefix + '/64'),
+                                       no_of_records, tag_body,
+                                       create_ptr=False))
+    for hostname, address, body in records:
+        yield { 'op': 'create', 'objpath': '/dns/record',
+                'body': json.loads(body),
+                'step': f'/dns/record/{zone}/{hostname}/{address}',
+                'refs': [ 'zone', 'created' ] }
+
+    return
+
+
+def plan_b1td(config):
+    '''
+    Expand the B1TD PoV configuration and YAML files into an ordered 
+    set of operations, without making any API calls
+
+    Parameters:
+        config (obj): ini config object
+
+    Yields:
+        dict: Plan operation
+    '''
+    tags = plan_tags(config)
+    net_name = config.get('ext_net_name')
+    network = f"{config.get('ext_net')}/{config.get('ext_cidr')}"
+    filename = config.get('ext_net_file')
+    if filename:
+        # Aggregated and split across name, name-2, ... as for an import
+        networks = list(b1_bulkimport.iter_prefixes(
+                            os.path.expanduser(filename)))
+        networks += [ n for n in [ b1_bulkimport.parse_prefix(network) ] if n ]
+        chunks = b1_bulkimport.iter_chunks(b1_bulkimport.aggregate(networks))
+    else:
+        chunks = [ [ network ] ]
+    net_refs = []
+    for number, items in enumerate(chunks, start=1):
+        list_name = b1_bulkimport.network_list_name(net_name, number)
+        ref = 'net_id' if number == 1 else f'net_id_{number}'
+        net_refs.append(ref)
+        yield { 'op': 'create', 'objpath': '/network_lists',
+                'body': { 'description': 'Network list',
+                          'items': items,
+                          'name': list_name },
+                'step': f'/network_lists/{list_name}',
+                'ref': ref, 'key': 'name', 'value': list_name }
+
+    for key, item in [ ('allow_list', 'www.infoblox.com'),
+                       ('deny_list', 'blockme.infoblox.com') ]:
+        name = config.get(key)
+        filename = config.get(f'{key}_file')
+        if not filename:
+            yield { 'op': 'create', 'objpath': '/named_lists',
+                    'body': { 'name': name, 'type': 'custom_list',
+                              'confidence_level': 'HIGH', 'items': [ item ],
+                              'tags': tags },
+                    'step': f'/named_lists/{name}', 'refs': [ 'created' ] }
+            continue
+
+        # One create and as many PATCH requests as needed, as for an import
+        ref = f'{key}_id'
+        chunks = b1_bulkimport.iter_chunks(b1_bulkimport.iter_domains(
+                                           os.path.expanduser(filename)))
+        yield { 'op': 'create', 'objpath': '/named_lists',
+                'body': { 'name': name, 'type': 'custom_list',
+                          'confidence_level': 'HIGH', 
+                          'description': 'Custom list',
+                          'items': next(chunks, []), 'tags': tags },
+                'step': f'/named_lists/{name}', 'refs': [ 'created' ],
+                'ref': ref, 'key': 'name', 'value': name }
+        for number, chunk in enumerate(chunks, start=2):
+            yield { 'op': 'update', 'objpath': '/named_lists', 'id_ref': ref,
+                    'body': { 'inserted_items_described': 
+                              [ { 'item': item, 'description': '' } 
+                                for item in chunk ] },
+                    'step': f'/named_lists/{name}/{number}' }
+
+    filters = get_filters()
+    for filter in filters['category_filters']:
+        filter_name = f"{config.get('prefix')}-{filter.get('name')}"
+        yield { 'op': 'create', 'objpath': '/category_filters',
+                'body': { 'name': filter_name, 
+                          'categories': filter.get('categories'),
+                          'description': filter.get('description'),
+                          'tags': tags },
+                'step': f'/category_filters/{filter_name}',
+                'refs': [ 'created' ] }
+    for filter in filters['application_filters']:
+        filter_name = f"{config.get('prefix')}-{filter.get('name')}"
+        yield { 'op': 'create', 'objpath': '/application_filters',
+                'body': { 'name': filter_name,
+                          'criteria': [ { 'name': app } 
+                                        for app in filter.get('apps') ],
+                          'description': filter.get('description'),
+                          'tags': tags },
+                'step': f'/application_filters/{filter_name}',
+                'refs': [ 'created' ], 'check_apps': True }
+    # Policy rules reference the lists and filters by name
+    yield { 'op': 'barrier' }
+
+    rules = []
+    threat_rules = get_ruleset(config.get('policy_level'))
+    filter_rules = get_filter_rules(config=config)
+    rules += filter_rules.get('action_allow_with_local_resolution', [])
+    rules += [ { 'action': 'action_allow', 
+                 'data': config.get('allow_list'),
+                 'type': 'custom_list' }, 
+               { 'action': 'action_block', 
+                 'data': config.get('deny_list'),
+                 'type': 'custom_list' } ]
+    for action in [ 'action_block', 'action_redirect', 
+                    'action_log', 'action_allow' ]:
+        rules += threat_rules.get(action, [])
+        rules += filter_rules.get(action, [])
+    policy_name = config.get('policy')
+    yield { 'op': 'create', 'objpath': '/security_policies',
+            'body': { 'name': policy_name,
+                      'network_lists': [ '${' + ref + '}' 
+                                         for ref in net_refs ],
+                      'rules': rules, 'tags': tags },
+            'step': f'/security_policies/{policy_name}',
+            'refs': net_refs + [ 'created' ] }
+
+    domains = lookalike_domains(config)
+    if domains:
+        yield { 'op': 'lookalike', 'domains': domains }
+
+    return
+
+
+def plan_operations(config, app, ipv6=False):
+    '''
+    Plan operations for app
+
+    Parameters:
+        config (obj): ini config object
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        ipv6 (bool): Build IPv6 networks
+
+    Returns:
+        Generator of plan operations
+    '''
+    if app == 'b1ddi':
+        operations = plan_b1ddi(config, ipv6=ipv6)
+    else:
+        operations = plan_b1td(config)
+
+    return operations
+
+
+def open_plan(filename, mode='r'):
+    '''
+    Open plan file, gzip compressed if filename ends .gz
+    '''
+    if filename.endswith('.gz'):
+        plan = gzip.open(filename, mode + 't')
+    else:
+        plan = open(filename, mode)
+
+    return plan
+
+
+def write_plan(filename, config, app, ipv6=False, workers=1):
+    '''
+    Write an offline plan file. The first line is a header with the
+    object counts and estimated run time, followed by one operation 
+    per line.
+
+    Parameters:
+        filename (str): Plan filename (JSONL, .gz for compressed)
+        config (obj): ini config object
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        ipv6 (bool): Build IPv6 networks
+        workers (int): Number of concurrent workers for the estimate
+
+    Returns:
+        exitcode (int)
+    '''
+    counts = {}
+    serial = 0
+    total = 0
+
+    # Count pass, plans are generated lazily so this is cheap
+    try:
+        for op in plan_operations(config, app, ipv6=ipv6):
+            if op['op'] == 'barrier':
+                continue
+            key = op.get('objpath', op['op'])
+            if op['op'] == 'update':
+                key = f'{key} (update)'
+            counts[key] = counts.get(key, 0) + 1
+            total += 1
+            if op.get('ref') or op['op'] != 'create':
+                serial += 1
+    except OSError as err:
+        log.error(f'--- Unable to plan {app}: {err}')
+        return 1
+    estimate = ( serial + (total - serial) / max(workers, 1) ) * PLAN_REQUEST_TIME
+
+    header = { 'plan': PLAN_VERSION,
+               'app': app,
+               'config': os.path.abspath(config.get('filename', '')),
+               'customer': config.get('customer', ''),
+               'ipv6': ipv6,
+               'generated': datetime.datetime.now().isoformat(),
+               'operations': total,
+               'counts': counts,
+               'workers': workers,
+               'estimated_seconds': round(estimate, 1) }
+    with open_plan(filename, 'w') as plan:
+        plan.write(json.dumps(header) + '\n')
+        for op in plan_operations(config, app, ipv6=ipv6):
+            plan.write(b1_bodies.dumps(op) + '\n')
+
+    log.info(f'+++ Plan written to {filename}')
+    for objpath, count in counts.items():
+        log.info(f'    {objpath}: {count}')
+    log.info(f'~~~~ {total} operations, estimated {estimate:0.1f}S '
+             f'with {workers} workers ~~~~')
+
+    return 0
+
+
+def read_plan(filename):
+    '''
+    Stream a plan file
+
+    Parameters:
+        filename (str): Plan filename
+
+    Yields:
+        dict: Header, then each operation
+    '''
+    with open_plan(filename) as plan:
+        for line in plan:
+            if line.strip():
+                yield json.loads(line)
+
+    return
+
+
+def apply_operation(client, op, refs, supported_apps=None):
+    '''
+    Execute a single planned create or update, substituting 
+    referenced ids
+
+    Parameters:
+        client (obj): IdCache wrapped bloxone client
+        op (dict): Plan operation
+        refs (dict): Ids (and Created timestamp) by reference
+        supported_apps (obj): b1_appcatalog.AppCatalog for application
+                              filters
+
+    Returns:
+        id (str) of the object created, True if the step was already
+        complete and no id is known, or None on failure
+    '''
+    id = None
+    if op.get('check_apps') and supported_apps is not None:
+        criteria = []
+        for c in op['body'].get('criteria', []):
+            name = supported_apps.lookup(c['name'])
+            if name:
+                criteria.append({ 'name': name })
+            else:
+                log.warning(f"App: {c['name']} in filter "
+                            f"{op['body']['name']} not supported.")
+        if criteria:
+            op['body']['criteria'] = criteria
+        else:
+            log.warning(f"No supported apps found in filter {op['body']['name']}")
+            op['body'].pop('criteria', None)
+    body = b1_bodies.dumps(op['body'])
+    for ref in op.get('refs', []):
+        body = body.replace('"${' + ref + '}"', b1_bodies.dumps(refs[ref]))
+
+    if op['op'] == 'update':
+        response = update_step(client, op['objpath'], refs[op['id_ref']], 
+                               body, op['step'])
+    else:
+        response = create_step(client, op['objpath'], body, op['step'])
+    if response is None:
+        id = client.journal.completed(op['step'])
+        if id is True and op.get('ref'):
+            id = client.get_id(op['objpath'], key=op['key'], 
+                               value=op['value'], include_path=True) or None
+    elif response.status_code in client.return_codes_ok:
+        data = response.json()
+        obj = data.get('result') or data.get('results') or {}
+        id = obj.get('id') or True
+        log.debug(f"+++ {op['step']} {op['op']}d")
+    else:
+        log.warning(f"--- {op['step']} not {op['op']}d")
+        log.debug(f'Return code: {response.status_code}')
+        log.debug(f'Return body: {response.text}')
+
+    return id
+
+
+def apply_plan(b1ini, config, app, filename, workers=1):
+    '''
+    Stream and execute a plan file. Operations between barriers are 
+    executed concurrently, operations that define a reference are
+    executed on their own once all previous operations are complete.
+
+    Parameters:
+        b1ini (str): Name of inifile for bloxone module
+        config (obj): ini config object
+        app (str): BloxOne Application [ b1ddi, b1td ]
+        filename (str): Plan filename
+        workers (int): Number of concurrent requests
+
+    Returns:
+        exitcode (int)
+    '''
+    exitcode = 0
+    processed = 0
+    failed = 0
+    workers = max(workers, 1)
+    window = workers * 2
+    in_flight = set()
+    supported_apps = None
+    refs = { 'created': datetime.datetime.now().strftime(CREATED_FORMAT) }
+
+    operations = read_plan(filename)
+    header = next(operations, {})
+    if header.get('plan') != PLAN_VERSION or header.get('app') != app:
+        log.error(f'{filename} is not a version {PLAN_VERSION} {app} plan')
+        return 4
+    if header.get('customer') != config.get('customer'):
+        log.warning(f"Plan customer {header.get('customer')} does not match "
+                    f"{config.get('customer')}")
+    total = header.get('operations', 0)
+    log.info(f"====== Applying plan {filename}: {total} operations, "
+             f"estimated {header.get('estimated_seconds')}S ======")
+
+    manifest = Manifest(manifest_filename(config, app), config, app)
+    journal = Journal(manifest_filename(config, app, kind='journal'),
+                      config, app)
+    if app == 'b1ddi':
+        cls = bloxone.b1ddi
+    else:
+        cls = bloxone.b1tdc
+    client = IdCache(b1_client(cls, b1ini), manifest=manifest, 
+                     journal=journal)
+    start_timer = time.perf_counter()
+
+    def collect(futures):
+        nonlocal processed, failed
+        for future in futures:
+            processed += 1
+            if not future.result():
+                failed += 1
+            if processed % 100 == 0:
+                log_rate('operations', processed, total, start_timer)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for op in operations:
+            if op['op'] == 'create' and not op.get('ref'):
+                if op.get('check_apps') and supported_apps is None:
+                    supported_apps = get_supported_apps(client)
+                if len(in_flight) >= window:
+                    done, in_flight = concurrent.futures.wait(in_flight,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(pool.submit(apply_operation, client, op, refs,
+                                          supported_apps))
+                continue
+
+            # Barriers, lookups and references wait for all in flight
+            collect(concurrent.futures.as_completed(in_flight))
+            in_flight = set()
+            if op['op'] == 'barrier':
+                continue
+
+            if op['op'] == 'lookup':
+                id = client.get_id(op['objpath'], key=op['key'], 
+                                   value=op['value'], include_path=True)
+            elif op['op'] == 'lookalike':
+                with b1_metrics.phase('lookalike'):
+                    id = create_lookalike(b1ini, op.get('domains') or 
+                                                 op['domain'])
+            else:
+                id = apply_operation(client, op, refs)
+            processed += 1
+            if not id:
+                failed += 1
+                if op.get('ref'):
+                    log.error(f"--- Unable to resolve {op['ref']} "
+                              f"from {op.get('objpath')}, stopping")
+                    break
+            elif op.get('ref'):
+                refs[op['ref']] = id
+
+        collect(concurrent.futures.as_completed(in_flight))
+
+    if processed % 100:
+        log_rate('operations', processed, total, start_timer)
+    if failed or processed < total:
+        log.error(f'--- {failed} operations failed, '
+                  f'{total - processed} not attempted')
+        exitcode = 1
+    else:
+        log.info(f'+++ Plan {filename} applied successfully')
+
+    return exitcode
+
+
+def fanout(args):
+    '''
+    Run the demo for many customers using b1_fanout
+
+    Parameters:
+        args (obj): Parsed arguments
+
+    Returns:
+        exitcode (int)
+    '''
+    import b1_fanout
+
+    log.setLevel(logging.DEBUG if args.debug else logging.INFO)
+    setup_logging(debug=args.debug)
+    logging.getLogger('b1_fanout').setLevel(logging.INFO)
+
+    apps = [ a.strip() for a in args.app.casefold().split(',') if a.strip() ]
+    unsupported = [ a for a in apps if a not in [ 'b1ddi', 'b1td' ] ]
+    if unsupported or not apps:
+        log.error(f'{args.app} application not supported.')
+        return 5
+    if args.plan or args.apply or args.reap:
+        log.error('--plan, --apply and --reap are not supported with --fanout')
+        return 5
+
+    workers = args.workers
+    if not workers:
+        workers = 10 if args.backend == 'async' else 1
+
+    return b1_fanout.fan_out(args.fanout, apps, processes=args.processes,
+                             remove=args.remove, ipv6=args.ipv6,
+                             workers=workers, backend=args.backend,
+                             window=args.window, rate=args.rate,
+                             http2=args.http2, allocate=args.allocate,
+                             metrics=args.metrics, debug=args.debug)
 
 
 def main():
     '''
     Core Logic
     '''
+    global GOVERNOR
+    global TRANSPORT
+    global ALLOCATION
     exitcode = 0
     usefile = False
 
@@ -1998,6 +4317,9 @@ def main():
     debug = args.debug
     app = args.app.casefold()
 
+    if args.fanout:
+        return fanout(args)
+
     # Read inifile
     config = read_demo_ini(inifile, app=app)
 
@@ -2025,20 +4347,64 @@ def main():
             log.setLevel(logging.INFO)
             setup_logging(debug=False, usefile=usefile)
         
+        # Default concurrency depends on backend
+        workers = args.workers
+        if not workers:
+            if args.backend == 'async':
+                workers = 10
+            else:
+                workers = 1
+
+        # Shared rate governor for all API calls
+        GOVERNOR = b1_ratelimit.RateGovernor(rate=args.rate, 
+                                             max_concurrency=workers)
+        # Keep-alive connections shared by all clients
+        TRANSPORT = b1_transport.Transport(pool_size=workers, 
+                                           http2=args.http2)
+        ALLOCATION = args.allocate
+
         # Select Application for POV and execute
-        if app == 'b1ddi':
+        if args.plan and app in [ 'b1ddi', 'b1td' ]:
+            if app == 'b1ddi' and not check_config(config):
+                log.error("Config {} contains errors".format(inifile))
+                exitcode = 3
+            else:
+                exitcode = write_plan(args.plan, config, app, 
+                                      ipv6=args.ipv6, workers=workers)
+        elif args.reap and app in [ 'b1ddi', 'b1td' ]:
+            owner = args.owner
+            if owner is None:
+                owner = config.get('owner', '')
+            elif owner == '*':
+                owner = ''
+            exitcode = reap(b1inifile, config, app, owner=owner,
+                            older_than=args.older_than, workers=workers)
+        elif args.apply and app in [ 'b1ddi', 'b1td' ]:
+            exitcode = apply_plan(b1inifile, config, app, args.apply,
+                                  workers=workers)
+        elif app == 'b1ddi':
             exitcode = b1ddi_automation_demo(b1inifile,
                                              config=config, 
                                              ipv6=args.ipv6,
-                                             remove=args.remove)
+                                             remove=args.remove,
+                                             workers=workers,
+                                             backend=args.backend,
+                                             window=args.window)
         elif app == 'b1td':
             exitcode = b1td_pov(b1inifile, 
                                 config=config, 
-                                remove=args.remove)
+                                remove=args.remove,
+                                workers=workers)
         else:
             log.error(f'{args.app} application not supported.')
             exitcode = 5
 
+        b1_metrics.METRICS.log_summary(logger=log)
+        TRANSPORT.log_summary(logger=log)
+        TRANSPORT.close()
+        if args.metrics:
+            b1_metrics.METRICS.export(args.metrics)
+
     else:
         logging.error("No config found in {}".format(inifile))
         exitcode = 2